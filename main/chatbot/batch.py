@@ -0,0 +1,225 @@
+# batch.py
+"""
+카드 명세서 일괄 분석 (main/chatbot 에서 실행)
+
+    python batch.py ./statements --out ./batch_out --workers 8 --profiles profiles.json
+
+디렉터리 안의 CSV/XLSX 명세서를 프로세스 풀에서 병렬로
+정규화(normalize_cards) → 카테고리 분류(CAT_KEYWORDS) → 분석(AnalysisNode) 하고,
+성향 분류(EgenTetoClassifierNode)는 모은 뒤 classify_batch로 한 번에 처리한다.
+
+출력 (--out)
+- transactions/month=YYYY-MM/<user>.parquet : 정규화 거래 (user, date, merchant, amount, category), 월 파티션
+  <user> = 입력 기준 상대 경로(확장자 포함)에서 '%', '/'를 %25, %2F로 바꾼 값 (a/b.csv → a%2Fb.csv, 파일마다 고유)
+- analysis.parquet : 파일(사용자)별 분석 요약 1행
+- manifest.json    : 파일별 sha256/급여/상태/출력 경로 → 재실행 시 해시와 급여가 같은 파일은 건너뜀 (중단 후 이어서 실행)
+- summary.json     : 처리/건너뜀/실패 수, 거래 수, 성향 분포, 카테고리 합계, 처리 시간
+
+--profiles (선택) : {"<상대 경로 또는 파일명 stem>": {"answers": {"2": "O", ...}, "salary": 3000000}} — 없으면 NEUTRAL / 급여 0
+pandas + pyarrow(Parquet) 필요.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+from node.analysis import AnalysisNode, _infer_category
+from node.egen_teto_classifier import classify_batch, normalize_answers
+from node.get_user_data import normalize_cards
+
+EXTS = (".csv", ".xlsx", ".xls")
+MANIFEST = "manifest.json"
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def _write_json(path: str, obj: Any):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f, ensure_ascii=False, indent=2, default=str)
+    os.replace(tmp, path)   # 중간에 죽어도 이전 manifest는 온전
+
+def _user_of(rel: str) -> str:
+    """상대 경로 → 출력 파일명으로 쓸 사용자 id. '%'와 '/'만 이스케이프 → 서로 다른 경로는 다른 id."""
+    return rel.replace(os.sep, "/").replace("%", "%25").replace("/", "%2F")
+
+def _profile(profiles: Dict[str, Any], rel: str) -> Dict[str, Any]:
+    """--profiles 항목: 상대 경로("sub/x.csv") 우선, 없으면 예전 형식의 stem("sub__x")."""
+    return profiles.get(rel.replace(os.sep, "/")) or \
+        profiles.get(os.path.splitext(rel)[0].replace(os.sep, "__")) or {}
+
+# -----------------------------------------------------------------------------
+# 워커: 파일 하나 처리 (프로세스 풀에서 실행)
+# -----------------------------------------------------------------------------
+def process_file(src: str, rel: str, out_dir: str, salary: int, old_outputs: List[str]) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    user = _user_of(rel)
+    with open(src, "rb") as f:
+        raw = f.read()
+    records = normalize_cards(raw, os.path.basename(src))
+    history = [r.model_dump() for r in records]
+    analysis = AnalysisNode()({"user_data": {"salary": salary, "card_history": history}})["analysis_result"]
+
+    for p in old_outputs:           # 파일이 바뀌어 월 구성이 달라졌을 수 있으니 이전 파티션 파일 제거
+        try:
+            os.remove(os.path.join(out_dir, p))
+        except FileNotFoundError:
+            pass
+    outputs: List[str] = []
+    if history:
+        df = pd.DataFrame(history)
+        cats: Dict[str, str] = {}
+        df["category"] = [cats.get(m) or cats.setdefault(m, _infer_category(m)) for m in df["merchant"]]
+        df.insert(0, "user", user)
+        for month, part in df.groupby(df["date"].str.slice(0, 7), sort=True):
+            p = os.path.join("transactions", f"month={month}", f"{user}.parquet")
+            os.makedirs(os.path.join(out_dir, os.path.dirname(p)), exist_ok=True)
+            part.to_parquet(os.path.join(out_dir, p), index=False)
+            outputs.append(p)
+    return {
+        "user": user,
+        "rows": len(history),
+        "outputs": outputs,
+        "analysis": analysis,
+        "sec": round(time.perf_counter() - t0, 3),
+    }
+
+# -----------------------------------------------------------------------------
+# 드라이버
+# -----------------------------------------------------------------------------
+def _scan(in_dir: str) -> List[str]:
+    out = []
+    for root, _, fns in os.walk(in_dir):
+        for fn in fns:
+            if fn.lower().endswith(EXTS) and not fn.startswith("~$"):
+                out.append(os.path.relpath(os.path.join(root, fn), in_dir))
+    return sorted(out)
+
+def _summary(manifest: Dict[str, Dict[str, Any]], counts: Dict[str, int], elapsed: float) -> Dict[str, Any]:
+    ok = [e for e in manifest.values() if e.get("status") == "ok"]
+    personas: Dict[str, int] = {}
+    cat_sum: Dict[str, int] = {}
+    for e in ok:
+        personas[e.get("persona", "NEUTRAL-중립형")] = personas.get(e.get("persona", "NEUTRAL-중립형"), 0) + 1
+        for c, a in (e["analysis"].get("category_sum") or {}).items():
+            cat_sum[c] = cat_sum.get(c, 0) + a
+    rows = sum(e.get("rows", 0) for e in ok)
+    processed_rows = counts.pop("processed_rows", 0)
+    return {
+        **counts,
+        "users": len(ok),
+        "rows": rows,
+        "elapsed_sec": round(elapsed, 2),
+        "rows_per_sec": round(processed_rows / elapsed) if elapsed and processed_rows else None,
+        "personas": personas,
+        "category_sum": dict(sorted(cat_sum.items(), key=lambda x: x[1], reverse=True)),
+        "total_spent": sum(e["analysis"].get("total_spent", 0) for e in ok),
+    }
+
+def run(in_dir: str, out_dir: str, workers: int = 0, profiles: Optional[Dict[str, Any]] = None,
+        force: bool = False) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    os.makedirs(out_dir, exist_ok=True)
+    man_path = os.path.join(out_dir, MANIFEST)
+    manifest: Dict[str, Dict[str, Any]] = {}
+    if os.path.exists(man_path):
+        with open(man_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    profiles = profiles or {}
+
+    files = _scan(in_dir)
+    seen: Dict[str, str] = {}
+    for rel in files:   # 대소문자만 다른 경로도 같은 파일시스템에선 같은 출력 파일이 되므로 함께 검사
+        other = seen.setdefault(_user_of(rel).casefold(), rel)
+        if other != rel:
+            raise SystemExit(f"[batch] {other!r} and {rel!r} map to the same user id; rename one of them")
+    for gone in set(manifest) - set(files):         # 원본이 사라진 파일은 출력도 정리
+        for p in manifest.pop(gone).get("outputs", []):
+            try:
+                os.remove(os.path.join(out_dir, p))
+            except FileNotFoundError:
+                pass
+
+    counts = {"files": len(files), "processed": 0, "skipped": 0, "failed": 0, "processed_rows": 0}
+    todo = []
+    for rel in files:
+        src = os.path.join(in_dir, rel)
+        digest = _sha256(src)
+        salary = int(_profile(profiles, rel).get("salary") or 0)
+        prev = manifest.get(rel)
+        # 분석 결과(spend_ratio 등)는 급여에도 의존하므로 급여가 바뀌면 다시 처리
+        if prev and not force and prev.get("sha256") == digest and prev.get("status") == "ok" and \
+                prev.get("user") == _user_of(rel) and prev.get("salary") == salary and \
+                all(os.path.exists(os.path.join(out_dir, p)) for p in prev.get("outputs", [])):
+            counts["skipped"] += 1
+            continue
+        todo.append((rel, src, digest, salary, (prev or {}).get("outputs", [])))
+    print(f"[batch] {len(files)} files, {counts['skipped']} unchanged, {len(todo)} to process", file=sys.stderr)
+
+    with ProcessPoolExecutor(max_workers=workers or None) as pool:
+        futs = {}
+        for rel, src, digest, salary, old in todo:
+            futs[pool.submit(process_file, src, rel, out_dir, salary, old)] = (rel, digest, salary, old)
+        for fut in as_completed(futs):
+            rel, digest, salary, old = futs[fut]
+            try:
+                res = fut.result()
+            except Exception as e:
+                counts["failed"] += 1
+                # 이전 출력 경로는 남겨 둬서 다음 실행(또는 원본 삭제 시) 정리되게 한다
+                manifest[rel] = {"sha256": digest, "status": "error", "error": f"{type(e).__name__}: {e}",
+                                 "outputs": old}
+                print(f"[batch] FAIL {rel}: {e}", file=sys.stderr)
+            else:
+                counts["processed"] += 1
+                counts["processed_rows"] += res["rows"]
+                manifest[rel] = {"sha256": digest, "salary": salary, "status": "ok", **res}
+            _write_json(man_path, manifest)    # 파일마다 기록 → 중단돼도 끝난 파일은 다음 실행에서 건너뜀
+
+    # 성향 분류: 전체 사용자를 한 번에 (테이블 조회 배치)
+    ok = [(rel, e) for rel, e in manifest.items() if e.get("status") == "ok"]
+    answers = [normalize_answers(_profile(profiles, rel).get("answers") or {}) for rel, e in ok]
+    for (rel, e), label in zip(ok, classify_batch(answers) if answers else []):
+        e["persona"] = label
+    _write_json(man_path, manifest)
+
+    if ok:
+        pd.DataFrame([{
+            "user": e["user"], "file": rel, "persona": e["persona"], "rows": e["rows"],
+            **{k: v for k, v in e["analysis"].items() if not isinstance(v, (dict, list))},
+            "top_category": (e["analysis"].get("category_rank") or [["", 0]])[0][0],
+        } for rel, e in ok]).to_parquet(os.path.join(out_dir, "analysis.parquet"), index=False)
+
+    summary = _summary(manifest, counts, time.perf_counter() - t0)
+    _write_json(os.path.join(out_dir, "summary.json"), summary)
+    return summary
+
+def main(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(description="Batch card statement analysis")
+    ap.add_argument("in_dir", help="명세서(CSV/XLSX) 디렉터리 (하위 폴더 포함)")
+    ap.add_argument("--out", default="batch_out")
+    ap.add_argument("--workers", type=int, default=0, help="프로세스 수 (0=CPU 수)")
+    ap.add_argument("--profiles", default="", help='{"<stem>": {"answers": {...}, "salary": int}} JSON')
+    ap.add_argument("--force", action="store_true", help="해시가 같아도 전부 다시 처리")
+    args = ap.parse_args(argv)
+
+    profiles = None
+    if args.profiles:
+        with open(args.profiles, encoding="utf-8") as f:
+            profiles = json.load(f)
+    summary = run(args.in_dir, args.out, args.workers, profiles, args.force)
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    return summary
+
+if __name__ == "__main__":
+    main()
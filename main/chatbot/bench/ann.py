@@ -0,0 +1,113 @@
+# bench/ann.py
+"""
+ANN 인덱스 recall@k / 지연 벤치마크 (exact 대비, main/chatbot 에서 실행)
+
+    python -m bench.ann --sizes 10000,100000 --ef 16,32,64,128 --nprobe 1,4,8,16
+
+군집 구조가 있는 합성 KB(bench.synth.gen_clustered_kb)와 KB 근처 질의로
+ExactIndex 결과를 정답으로 두고, HNSW(ef_search 스윕)와 IVF(nprobe 스윕)의
+recall@k, 단건 질의 p50/p95 지연, 빌드 시간, 인덱스 크기를 비교한다.
+KB_HNSW_* / KB_IVF_* 환경변수 값을 고를 때 이 결과를 근거로 쓴다.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from bench.synth import gen_clustered_kb, near_queries
+from util.vector_index import ExactIndex, build_index
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+def recall_at_k(truth: np.ndarray, got: np.ndarray, k: int) -> float:
+    hits = [len(set(t[:k].tolist()) & set(g[:k].tolist())) / k for t, g in zip(truth, got)]
+    return float(np.mean(hits))
+
+def evaluate(label: str, index, queries: np.ndarray, truth: np.ndarray, k: int,
+             build_s: float = 0.0, extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    # rag_search와 같은 조건: 질의 1건씩 검색
+    lat, got = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        _, ids = index.search(q, k)
+        lat.append(time.perf_counter() - t0)
+        got.append(np.asarray(ids))
+    lat.sort()
+    return {
+        "index": label,
+        "recall_at_k": round(recall_at_k(truth, np.stack(got), k), 4),
+        "p50_ms": round(lat[len(lat) // 2] * 1000, 4),
+        "p95_ms": round(lat[int(len(lat) * 0.95) - 1] * 1000, 4),
+        "qps": round(len(lat) / sum(lat), 1),
+        "build_s": round(build_s, 3),
+        "index_mb": round(index.nbytes / 2**20, 2),
+        **(extra or {}),
+    }
+
+def _ints(s: str) -> List[int]:
+    return [int(x) for x in s.split(",") if x.strip()]
+
+def run_size(n: int, args) -> List[Dict[str, Any]]:
+    chunks, embs = gen_clustered_kb(n, args.dim)
+    queries = near_queries(embs, args.queries)
+    exact = ExactIndex(embs)
+    _, truth = exact.search(queries, args.k)
+    rows = [evaluate("exact", exact, queries, truth, args.k)]
+
+    for m in _ints(args.hnsw_m):
+        t0 = time.perf_counter()
+        idx = build_index("hnsw", embs, m=m, ef_construction=args.ef_construction)
+        build_s = time.perf_counter() - t0
+        for ef in _ints(args.ef):
+            idx.set_ef_search(ef)
+            rows.append(evaluate(f"hnsw(M={m},ef={ef})", idx, queries, truth, args.k, build_s,
+                                 {"m": m, "ef_search": ef}))
+
+    t0 = time.perf_counter()
+    idx = build_index("ivf", embs, nlist=args.nlist)
+    build_s = time.perf_counter() - t0
+    for p in _ints(args.nprobe):
+        idx.set_nprobe(p)
+        rows.append(evaluate(f"ivf(nlist={idx.params['nlist']},nprobe={p})", idx, queries, truth, args.k,
+                             build_s, {"nlist": idx.params["nlist"], "nprobe": p}))
+    for r in rows:
+        r["size"] = n
+    return rows
+
+def main(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(description="ANN recall/latency benchmark vs exact search")
+    ap.add_argument("--sizes", default="10000,100000")
+    ap.add_argument("--dim", type=int, default=1536)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", type=int, default=4)
+    ap.add_argument("--hnsw-m", default="32")
+    ap.add_argument("--ef-construction", type=int, default=200)
+    ap.add_argument("--ef", default="16,32,64,128,256")
+    ap.add_argument("--nlist", type=int, default=0, help="0이면 4√n 자동")
+    ap.add_argument("--nprobe", default="1,4,8,16,32")
+    ap.add_argument("--out", default="")
+    args = ap.parse_args(argv)
+
+    results: List[Dict[str, Any]] = []
+    for n in _ints(args.sizes):
+        print(f"[ann] size={n} dim={args.dim}", file=sys.stderr)
+        rows = run_size(n, args)
+        for r in rows:
+            print(f"{r['index']:<32} recall@{args.k} {r['recall_at_k']:.3f}  p50 {r['p50_ms']:.3f}ms  "
+                  f"p95 {r['p95_ms']:.3f}ms  {r['qps']:>9,.0f} q/s  build {r['build_s']:.1f}s  {r['index_mb']:.1f}MB")
+        results.extend(rows)
+
+    out = args.out or os.path.join(RESULTS_DIR, f"ann_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump({"args": vars(args), "results": results}, f, ensure_ascii=False, indent=2)
+    print(f"[ann] saved → {out}", file=sys.stderr)
+    return results
+
+if __name__ == "__main__":
+    main()
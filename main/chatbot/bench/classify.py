@@ -0,0 +1,102 @@
+# bench/classify.py
+"""
+설문 분류 테이블/배치 경로 벤치마크 (main/chatbot 에서 실행)
+
+    python -m bench.classify --sizes 100000,1000000 --thresh 0.5,0.7,1.0
+
+1) 3^9 응답 조합 전부에 대해 테이블 결과가 규칙 함수(_score_diff)와 같은지 확인
+2) 무작위 코호트(미응답 포함)를 문항별 루프 / 테이블 단건 / numpy 배치로 분류해 처리량 비교
+3) 임계값만 바꿔 전 코호트를 다시 채점하는 시간 (점수 테이블은 재사용)
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from bench.ann import _ints
+from node.egen_teto_classifier import (
+    LABELS, N_CODES, QIDS, _decode, _label_idx, _score_diff, classify_codes, encode_answers, encode_matrix,
+    label_table,
+)
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+def verify(thresh: float) -> int:
+    """테이블과 규칙 함수가 다른 코드 수 (0이어야 함)."""
+    table = label_table(thresh)
+    batch = classify_codes(np.arange(N_CODES), thresh)
+    bad = 0
+    for c in range(N_CODES):
+        want = _label_idx(_score_diff(_decode(c)), thresh)
+        bad += table[c] != want or int(batch[c]) != want
+    return bad
+
+def run_size(n: int, threshs: List[float], seed: int = 0) -> Dict[str, Any]:
+    rng = np.random.default_rng(seed)
+    matrix = rng.integers(0, 3, size=(n, len(QIDS)), dtype=np.int64)   # 0=미응답, 1=O, 2=X
+    dicts = [{q: d == 1 for q, d in zip(QIDS, row) if d} for row in matrix[: min(n, 200_000)].tolist()]
+    m = len(dicts)
+
+    t = time.perf_counter()
+    loop = [_label_idx(_score_diff(a), threshs[0]) for a in dicts]
+    loop_s = time.perf_counter() - t
+
+    t = time.perf_counter()
+    table = label_table(threshs[0])
+    single = [table[encode_answers(a)] for a in dicts]
+    single_s = time.perf_counter() - t
+
+    t = time.perf_counter()
+    codes = encode_matrix(matrix)
+    batch = classify_codes(codes, threshs[0])
+    batch_s = time.perf_counter() - t
+    assert loop == single == batch[:m].tolist()
+
+    rescore = {}
+    for th in threshs:
+        t = time.perf_counter()
+        labels = classify_codes(codes, th)
+        rescore[str(th)] = {
+            "ms": round((time.perf_counter() - t) * 1000, 2),
+            "dist": {LABELS[i]: int((labels == i).sum()) for i in range(len(LABELS))},
+        }
+    return {
+        "size": n,
+        "loop_per_sec": round(m / loop_s),
+        "table_per_sec": round(m / single_s),
+        "batch_per_sec": round(n / batch_s),
+        "rescore": rescore,
+    }
+
+def main(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(description="Survey classification lookup-table benchmark")
+    ap.add_argument("--sizes", default="100000,1000000")
+    ap.add_argument("--thresh", default="0.5,0.7,1.0", help="재채점할 중립 밴드 임계값 목록 (쉼표)")
+    ap.add_argument("--out", default="")
+    args = ap.parse_args(argv)
+    threshs = [float(x) for x in args.thresh.split(",") if x.strip()]
+
+    mismatches = {str(th): verify(th) for th in threshs}
+    print(f"[classify] table vs rule mismatches: {mismatches}", file=sys.stderr)
+    results = []
+    for n in _ints(args.sizes):
+        r = run_size(n, threshs)
+        print(f"size={n:<9} loop {r['loop_per_sec']:>10,}/s  table {r['table_per_sec']:>10,}/s  "
+              f"batch {r['batch_per_sec']:>12,}/s  rescore " +
+              " ".join(f"{th}:{v['ms']}ms" for th, v in r["rescore"].items()))
+        results.append(r)
+
+    out = args.out or os.path.join(RESULTS_DIR, f"classify_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump({"args": vars(args), "mismatches": mismatches, "results": results}, f, ensure_ascii=False, indent=2)
+    print(f"[classify] saved → {out}", file=sys.stderr)
+    return results
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+# bench/fake_openai.py
+"""
+로컬 OpenAI 대역 서버 (네트워크 없이 부하 테스트용)
+- POST /v1/embeddings        : 텍스트 해시 기반 결정적 벡터 (dimensions 지원)
+- POST /v1/chat/completions  : 고정 포맷 피드백, stream=true면 SSE 청크 전송
+- 지연은 CLI 인자로 조절 (평균 + 지터)
+
+    python -m bench.fake_openai --port 8001 --embed-ms 40 --chat-ms 900 --stream-chunk-ms 15
+    OPENAI_BASE_URL=http://127.0.0.1:8001/v1 uvicorn main:app ...
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from typing import Any, Dict, List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from util.embeddings import hash_embedding
+
+CONFIG: Dict[str, float] = {
+    "embed_ms": 40.0,          # 임베딩 호출당 기본 지연
+    "embed_per_item_ms": 0.5,  # 배치 항목당 추가 지연
+    "chat_ms": 900.0,          # 첫 토큰까지 지연 (비스트리밍이면 전체 지연)
+    "stream_chunk_ms": 15.0,   # 스트리밍 청크 간격
+    "jitter": 0.2,             # ±비율
+    "dim": 1536,
+}
+
+FAKE_FEEDBACK = """성향: {persona}
+
+==== 최종 피드백 ====
+1) 한줄요약: 고정지출 비중이 높아 다음 달엔 변동지출 관리가 핵심입니다.
+
+2) 지출 분석: 총지출의 약 35%가 식비·배달에 집중되어 있습니다.
+
+3) 다음달 액션 3가지:
+  1. 배달 횟수를 주 2회로 제한해 월 8만원 절감
+  2. 월급일+1일 적금 자동이체 30만원 설정
+  3. 구독 서비스 2개 해지로 월 2만원 절감
+
+4) 추천 제도/상품: 청년도약계좌
+  - 적용조건: 만 19~34세, 소득 요건 충족
+  - 주의사항: 중도해지 시 정부기여금·비과세 혜택 상실
+"""
+
+app = FastAPI(title="fake-openai")
+
+def _sleep_s(base_ms: float) -> float:
+    j = CONFIG["jitter"]
+    return max(base_ms * (1 + random.uniform(-j, j)), 0.0) / 1000.0
+
+@app.get("/v1/models")
+async def models():
+    return {"object": "list", "data": [{"id": "gpt-4o-mini", "object": "model"},
+                                       {"id": "text-embedding-3-small", "object": "model"}]}
+
+@app.post("/v1/embeddings")
+async def embeddings(request: Request):
+    body = await request.json()
+    inputs = body.get("input", [])
+    if isinstance(inputs, str):
+        inputs = [inputs]
+    dim = int(body.get("dimensions") or CONFIG["dim"])
+    await asyncio.sleep(_sleep_s(CONFIG["embed_ms"] + CONFIG["embed_per_item_ms"] * len(inputs)))
+    data = [{"object": "embedding", "index": i, "embedding": hash_embedding(str(t), dim)}
+            for i, t in enumerate(inputs)]
+    tokens = sum(max(len(str(t)) // 2, 1) for t in inputs)
+    return {"object": "list", "data": data, "model": body.get("model", "text-embedding-3-small"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens}}
+
+def _persona_from_messages(messages: List[Dict[str, Any]]) -> str:
+    for m in messages:
+        content = str(m.get("content", ""))
+        if "성향:" in content and m.get("role") == "user":
+            return content.split("성향:", 1)[1].split("\n", 1)[0].strip()
+    return "NEUTRAL-중립형"
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    messages = body.get("messages", [])
+    model = body.get("model", "gpt-4o-mini")
+    text = FAKE_FEEDBACK.format(persona=_persona_from_messages(messages))
+    prompt_tokens = sum(len(str(m.get("content", ""))) for m in messages) // 2
+    completion_tokens = len(text) // 2
+    cid = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+    created = int(time.time())
+
+    if not body.get("stream"):
+        await asyncio.sleep(_sleep_s(CONFIG["chat_ms"]))
+        return JSONResponse({
+            "id": cid, "object": "chat.completion", "created": created, "model": model,
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": text}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        })
+
+    async def sse():
+        await asyncio.sleep(_sleep_s(CONFIG["chat_ms"]))
+        pieces = [text[i:i + 8] for i in range(0, len(text), 8)]
+        for i, p in enumerate(pieces):
+            delta = {"role": "assistant", "content": p} if i == 0 else {"content": p}
+            chunk = {"id": cid, "object": "chat.completion.chunk", "created": created, "model": model,
+                     "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+            yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+            await asyncio.sleep(_sleep_s(CONFIG["stream_chunk_ms"]))
+        done = {"id": cid, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+        yield f"data: {json.dumps(done)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(sse(), media_type="text/event-stream")
+
+def configure(**kwargs):
+    for k, v in kwargs.items():
+        if v is not None and k in CONFIG:
+            CONFIG[k] = float(v)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Local OpenAI stand-in")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8001)
+    ap.add_argument("--embed-ms", type=float)
+    ap.add_argument("--chat-ms", type=float)
+    ap.add_argument("--stream-chunk-ms", type=float)
+    ap.add_argument("--jitter", type=float)
+    args = ap.parse_args(argv)
+    configure(embed_ms=args.embed_ms, chat_ms=args.chat_ms,
+              stream_chunk_ms=args.stream_chunk_ms, jitter=args.jitter)
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
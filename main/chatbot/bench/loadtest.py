@@ -0,0 +1,166 @@
+# bench/loadtest.py
+"""
+/chat 엔드투엔드 부하 테스트 (main/chatbot 에서 실행)
+
+    # 1) 네트워크 없이: 대역 서버를 띄우고 앱을 같은 프로세스(ASGI)로 구동
+    python -m bench.loadtest --spawn-fake --concurrency 16 --requests 400
+
+    # 2) 이미 떠 있는 서버 대상
+    python -m bench.loadtest --url http://127.0.0.1:7860 --concurrency 32 --duration 60
+
+multipart(answers + 카드 파일 + salary)를 동시성 N으로 보내고 p50/p95/p99 지연, 초당 처리량,
+상태코드 분포를 출력/저장한다. 같은 입력 반복 여부는 --distinct 로 조절.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from bench.synth import card_file_bytes
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+def percentile(sorted_vals: List[float], p: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    idx = min(int(round(p / 100 * (len(sorted_vals) - 1))), len(sorted_vals) - 1)
+    return sorted_vals[idx]
+
+def make_payloads(n: int, rows: int, fmt: str, seed: int = 0) -> List[Dict[str, Any]]:
+    """서로 다른 입력 n개 (답변/파일/월급 조합). n=1이면 전부 같은 요청."""
+    rng = random.Random(seed)
+    out = []
+    for i in range(n):
+        answers = {str(q): rng.choice("OX") for q in range(2, 11)}
+        raw, name = card_file_bytes(rows, fmt, seed=seed + i)
+        out.append({"answers": json.dumps(answers), "salary": str(rng.choice([2_500_000, 3_200_000, 4_000_000])),
+                    "file": (name, raw)})
+    return out
+
+def _spawn_fake(port: int, embed_ms: float, chat_ms: float):
+    import uvicorn
+    from bench import fake_openai
+    fake_openai.configure(embed_ms=embed_ms, chat_ms=chat_ms)
+    server = uvicorn.Server(uvicorn.Config(fake_openai.app, host="127.0.0.1", port=port, log_level="warning"))
+    t = threading.Thread(target=server.run, daemon=True)
+    t.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+async def run(args) -> Dict[str, Any]:
+    if args.url:
+        transport, base_url = None, args.url.rstrip("/")
+    else:
+        # 같은 프로세스에서 ASGI로 직접 구동 (OPENAI_BASE_URL은 main import 전에 설정돼 있어야 함)
+        import main
+        await asyncio.to_thread(main._warmup)
+        main._warmup_state["ready"] = True
+        transport, base_url = httpx.ASGITransport(app=main.app), "http://app"
+
+    payloads = make_payloads(args.distinct, args.rows, args.fmt)
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    errors: Counter = Counter()
+    deadline = time.perf_counter() + args.duration if args.duration else None
+    issued = 0
+    lock = asyncio.Lock()
+
+    async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=args.timeout) as client:
+        async def one(i: int, record: bool):
+            p = payloads[i % len(payloads)]
+            t0 = time.perf_counter()
+            try:
+                r = await client.post("/chat", data={"answers": p["answers"], "salary": p["salary"]},
+                                      files={"file": p["file"]})
+                code = r.status_code
+            except Exception as e:
+                code = 0
+                errors[type(e).__name__] += 1
+            dt = time.perf_counter() - t0
+            if record:
+                statuses[code] += 1
+                latencies.append(dt)
+
+        for i in range(args.warmup):
+            await one(i, record=False)
+
+        async def worker():
+            nonlocal issued
+            while True:
+                async with lock:
+                    if deadline is None and issued >= args.requests:
+                        return
+                    if deadline is not None and time.perf_counter() >= deadline:
+                        return
+                    i = issued
+                    issued += 1
+                await one(i, record=True)
+
+        t_start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        wall = time.perf_counter() - t_start
+
+    lat = sorted(latencies)
+    ok = sum(v for k, v in statuses.items() if 200 <= k < 300)
+    return {
+        "requests": len(lat),
+        "ok": ok,
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+        "errors": dict(errors),
+        "wall_s": round(wall, 3),
+        "rps": round(len(lat) / wall, 2) if wall else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(lat, 50) * 1000, 1),
+            "p95": round(percentile(lat, 95) * 1000, 1),
+            "p99": round(percentile(lat, 99) * 1000, 1),
+            "max": round((lat[-1] if lat else 0) * 1000, 1),
+            "mean": round(sum(lat) / len(lat) * 1000, 1) if lat else 0.0,
+        },
+    }
+
+def main(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(description="/chat load test")
+    ap.add_argument("--url", default="", help="대상 서버 URL (없으면 같은 프로세스 ASGI 구동)")
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--requests", type=int, default=200, help="총 요청 수 (--duration 지정 시 무시)")
+    ap.add_argument("--duration", type=float, default=0, help="초 단위 고정 시간 테스트")
+    ap.add_argument("--warmup", type=int, default=3)
+    ap.add_argument("--rows", type=int, default=300, help="요청당 카드 파일 행 수")
+    ap.add_argument("--fmt", choices=["csv", "xlsx"], default="csv")
+    ap.add_argument("--distinct", type=int, default=50, help="서로 다른 입력 수 (1이면 전부 동일)")
+    ap.add_argument("--timeout", type=float, default=120)
+    ap.add_argument("--spawn-fake", action="store_true", help="로컬 OpenAI 대역 서버를 띄우고 그쪽으로 연결")
+    ap.add_argument("--fake-port", type=int, default=8001)
+    ap.add_argument("--embed-ms", type=float, default=40)
+    ap.add_argument("--chat-ms", type=float, default=900)
+    ap.add_argument("--out", default="")
+    args = ap.parse_args(argv)
+
+    if args.spawn_fake:
+        _spawn_fake(args.fake_port, args.embed_ms, args.chat_ms)
+        os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{args.fake_port}/v1"
+        os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+
+    result = asyncio.run(run(args))
+    result["config"] = vars(args)
+    print(json.dumps({k: v for k, v in result.items() if k != "config"}, ensure_ascii=False, indent=2))
+
+    out = args.out or os.path.join(RESULTS_DIR, f"loadtest_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"[loadtest] saved → {out}", file=sys.stderr)
+    return result
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# bench/quant.py
+"""
+KB 임베딩 압축 저장 벤치마크 (main/chatbot 에서 실행)
+
+    python -m bench.quant --sizes 10000,100000 --truncate 512,256 --rescore 4
+
+float32 전수 검색을 정답으로 두고 ExactIndex의 저장 형식별
+(float32 / float16 / int8, 앞 d차원 절단, 정확 재채점 여부) 상주 메모리,
+단건 질의 p50/p95 지연, recall@k 를 비교한다.
+KB_STORAGE / KB_TRUNCATE_DIM / KB_RESCORE 값을 고를 때 이 결과를 근거로 쓴다.
+재채점용 float32 원본은 --mmap-dir 를 주면 main.py와 같이 .npy memmap으로 붙인다.
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from bench.ann import _ints, evaluate
+from bench.synth import gen_clustered_kb, near_queries
+from util.vector_index import ExactIndex
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+def _modes(dim: int, truncs: List[int], rescore: int):
+    """(라벨, ExactIndex 파라미터) 목록."""
+    out = []
+    for t in [0] + [t for t in truncs if 0 < t < dim]:
+        for storage in ("float32", "float16", "int8"):
+            if storage == "float32" and not t:
+                continue  # 기준선은 따로
+            tag = f"{storage}" + (f"/d{t}" if t else "")
+            out.append((tag, {"storage": storage, "truncate_dim": t or None}))
+            if rescore:
+                out.append((f"{tag}+rescore{rescore}", {"storage": storage, "truncate_dim": t or None,
+                                                        "rescore": rescore}))
+    return out
+
+def run_size(n: int, args) -> List[Dict[str, Any]]:
+    _, embs = gen_clustered_kb(n, args.dim)
+    queries = near_queries(embs, args.queries)
+    base = ExactIndex(embs)
+    _, truth = base.search(queries, args.k)
+    rows = [evaluate("float32", base, queries, truth, args.k, extra={"storage": "float32"})]
+
+    full = None
+    if args.mmap_dir and args.rescore:
+        os.makedirs(args.mmap_dir, exist_ok=True)
+        full_path = os.path.join(args.mmap_dir, f"quant_{n}_{args.dim}.full.npy")
+        np.save(full_path, embs)
+        full = np.load(full_path, mmap_mode="r")
+
+    for label, params in _modes(args.dim, _ints(args.truncate), args.rescore):
+        idx = ExactIndex(embs, full=full if params.get("rescore") else None, **params)
+        rows.append(evaluate(label, idx, queries, truth, args.k, extra=dict(idx.params)))
+    for r in rows:
+        r["size"] = n
+        r["mem_ratio"] = round(r["index_mb"] / rows[0]["index_mb"], 3) if rows[0]["index_mb"] else None
+    return rows
+
+def main(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(description="Quantized / truncated embedding storage benchmark")
+    ap.add_argument("--sizes", default="10000,100000")
+    ap.add_argument("--dim", type=int, default=1536)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", type=int, default=4)
+    ap.add_argument("--truncate", default="512,256", help="앞 d차원 절단 목록 (쉼표)")
+    ap.add_argument("--rescore", type=int, default=4, help="재채점 후보 배수 (0이면 재채점 모드 생략)")
+    ap.add_argument("--mmap-dir", default="", help="재채점 원본을 .npy memmap으로 둘 디렉터리")
+    ap.add_argument("--out", default="")
+    args = ap.parse_args(argv)
+
+    results: List[Dict[str, Any]] = []
+    for n in _ints(args.sizes):
+        print(f"[quant] size={n} dim={args.dim}", file=sys.stderr)
+        rows = run_size(n, args)
+        for r in rows:
+            print(f"{r['index']:<28} recall@{args.k} {r['recall_at_k']:.3f}  p50 {r['p50_ms']:.3f}ms  "
+                  f"p95 {r['p95_ms']:.3f}ms  {r['index_mb']:>8.1f}MB (x{r['mem_ratio']})")
+        results.extend(rows)
+
+    out = args.out or os.path.join(RESULTS_DIR, f"quant_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump({"args": vars(args), "results": results}, f, ensure_ascii=False, indent=2)
+    print(f"[quant] saved → {out}", file=sys.stderr)
+    return results
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+# bench/stages.py
+"""
+단계별 마이크로벤치마크 (main/chatbot 에서 실행)
+
+    python -m bench.stages                          # 기본 크기
+    python -m bench.stages --rows 1000,100000,1000000 --kb 100,10000,100000
+    python -m bench.stages --only normalize,analysis --compare bench/results/prev.json
+
+각 단계를 독립적으로 repeat회 돌려 median/best 시간과 처리량(items/s)을 재고,
+별도 1회 실행을 tracemalloc으로 감싸 peak 메모리를 잰다. 결과는 JSON으로 저장.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+def measure(stage: str, size: int, n_items: int, fn: Callable[[], Any],
+            setup: Optional[Callable[[], Any]] = None, repeat: int = 5) -> Dict[str, Any]:
+    """fn을 repeat회 측정. setup이 있으면 매 회 새 입력을 만들어 fn(arg)로 넘긴다."""
+    times = []
+    for _ in range(repeat):
+        arg = setup() if setup else None
+        gc.collect()
+        t0 = time.perf_counter()
+        fn(arg) if setup else fn()
+        times.append(time.perf_counter() - t0)
+
+    arg = setup() if setup else None
+    gc.collect()
+    tracemalloc.start()
+    fn(arg) if setup else fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    med = statistics.median(times)
+    return {
+        "stage": stage,
+        "size": size,
+        "items": n_items,
+        "median_s": round(med, 6),
+        "best_s": round(min(times), 6),
+        "throughput_per_s": round(n_items / med, 1) if med > 0 else None,
+        "peak_mb": round(peak / 2**20, 3),
+        "repeat": repeat,
+    }
+
+# -----------------------------------------------------------------------------
+# 단계 정의: 각 함수는 크기별 결과 dict 리스트를 반환
+# -----------------------------------------------------------------------------
+def bench_parse(sizes: List[int], repeat: int) -> List[Dict]:
+    from node.get_user_data import normalize_cards
+    from bench.synth import card_file_bytes
+    from util import upload_cache
+    out = []
+    for n in sizes:
+        raw, name = card_file_bytes(n, "csv")
+        out.append(measure("parse_csv+normalize", n, n, lambda: normalize_cards(raw, name), repeat=repeat))
+        if upload_cache.ENABLED:
+            # 같은 파일 재업로드: sha256 + Arrow mmap 읽기 + CardTx 생성
+            upload_cache.normalize_cards_cached(raw, name)
+            out.append(measure("parse_csv+normalize[cache_hit]", n, n,
+                               lambda: upload_cache.normalize_cards_cached(raw, name), repeat=repeat))
+    return out
+
+def bench_normalize(sizes: List[int], repeat: int) -> List[Dict]:
+    from node.get_user_data import _normalize_df_to_records
+    from bench.synth import card_dataframe
+    out = []
+    for n in sizes:
+        base = card_dataframe(n)
+        # _normalize_df_to_records가 df에 헬퍼 컬럼을 추가하므로 매 회 복사본 사용
+        out.append(measure("normalize_df_to_records", n, n, _normalize_df_to_records,
+                           setup=base.copy, repeat=repeat))
+    return out
+
+def bench_analysis(sizes: List[int], repeat: int) -> List[Dict]:
+    from node.analysis import AnalysisNode
+    from bench.synth import card_records
+    out = []
+    for n in sizes:
+        state = {"user_data": {"salary": 3_000_000, "card_history": card_records(n)}}
+        node = AnalysisNode()
+        out.append(measure("AnalysisNode", n, n, lambda: node(state), repeat=repeat))
+        node_cur = AnalysisNode(only_current_month=True)
+        out.append(measure("AnalysisNode[current_month]", n, n, lambda: node_cur(state), repeat=repeat))
+    return out
+
+def bench_category(sizes: List[int], repeat: int) -> List[Dict]:
+    from node.analysis import _infer_category
+    from bench.synth import card_records
+    out = []
+    for n in sizes:
+        merchants = [r["merchant"] for r in card_records(n)]
+        out.append(measure("_infer_category", n, n, lambda: [_infer_category(m) for m in merchants], repeat=repeat))
+    return out
+
+def _import_main():
+    # main.py는 import 시 OpenAI 키를 요구 → 실제 호출은 하지 않으므로 더미 키로 충분
+    os.environ.setdefault("OPENAI_API_KEY", "sk-bench-dummy")
+    os.environ.setdefault("WARMUP", "0")
+    import main
+    return main
+
+def bench_chunk(sizes: List[int], repeat: int) -> List[Dict]:
+    main = _import_main()
+    from bench.synth import gen_markdown
+    out = []
+    for n in sizes:
+        # n = 목표 청크 수 → 섹션 수로 환산 (섹션당 ≈ 450자, 청크 stride 750자)
+        text = gen_markdown(max(n * 750 // 450, 1))
+        out.append(measure("_chunk", n, len(text), lambda: main._chunk(text), repeat=repeat))
+        out.append(measure("chunk_documents", n, len(text),
+                           lambda: main.chunk_documents([("bench.md", text)]), repeat=repeat))
+    return out
+
+def bench_rag_search(sizes: List[int], repeat: int, dim: int) -> List[Dict]:
+    """임베딩 API 없이 main._rank(검색/정렬 단계)만 측정. 가짜 임베딩으로 KB를 채운다."""
+    main = _import_main()
+    from bench.synth import gen_kb, gen_queries
+    from util.vector_index import ExactIndex
+    out = []
+    saved = (main._kb_chunks, main._kb_embs, main._kb_index)
+    try:
+        for n in sizes:
+            chunks, embs = gen_kb(n, dim)
+            main._kb_chunks, main._kb_embs, main._kb_index = chunks, embs, ExactIndex(embs)
+            q = gen_queries(1, dim)[0].tolist()
+            out.append(measure("rag_search(rank)", n, n, lambda: main._rank(q, 4), repeat=repeat))
+    finally:
+        main._kb_chunks, main._kb_embs, main._kb_index = saved
+    return out
+
+STAGES = {
+    "parse": ("rows", bench_parse),
+    "normalize": ("rows", bench_normalize),
+    "analysis": ("rows", bench_analysis),
+    "category": ("rows", bench_category),
+    "chunk": ("kb", bench_chunk),
+    "rag_search": ("kb", bench_rag_search),
+}
+
+# -----------------------------------------------------------------------------
+# 결과 저장/비교
+# -----------------------------------------------------------------------------
+def _git_rev() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return "unknown"
+
+def compare(results: List[Dict], prev_path: str):
+    with open(prev_path, encoding="utf-8") as f:
+        prev = {(r["stage"], r["size"]): r for r in json.load(f)["results"]}
+    print(f"\n== vs {prev_path} (ratio <1.0 = faster) ==")
+    for r in results:
+        p = prev.get((r["stage"], r["size"]))
+        if not p or not p["median_s"]:
+            continue
+        ratio = r["median_s"] / p["median_s"]
+        flag = "  ⚠ regression" if ratio > 1.10 else ""
+        print(f"{r['stage']:<30} {r['size']:>9}  {p['median_s']:.4f}s → {r['median_s']:.4f}s  x{ratio:.2f}{flag}")
+
+def _ints(s: str) -> List[int]:
+    return [int(x) for x in s.split(",") if x.strip()]
+
+def main(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(description="SASHA stage microbenchmarks")
+    ap.add_argument("--rows", default="1000,10000,100000", help="카드 내역 행 수 목록 (최대 1000000)")
+    ap.add_argument("--kb", default="100,1000,10000", help="KB 청크 수 목록 (최대 100000)")
+    ap.add_argument("--dim", type=int, default=1536, help="가짜 임베딩 차원")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--only", default="", help="쉼표 구분 단계 이름: " + ",".join(STAGES))
+    ap.add_argument("--out", default="", help="결과 JSON 경로 (기본 bench/results/stages_<ts>.json)")
+    ap.add_argument("--compare", default="", help="이전 결과 JSON과 비교")
+    args = ap.parse_args(argv)
+
+    wanted = [s for s in args.only.split(",") if s] or list(STAGES)
+    results: List[Dict] = []
+    for name in wanted:
+        kind, fn = STAGES[name]
+        sizes = _ints(args.rows if kind == "rows" else args.kb)
+        print(f"[bench] {name} sizes={sizes}", file=sys.stderr)
+        rs = fn(sizes, args.repeat, args.dim) if name == "rag_search" else fn(sizes, args.repeat)
+        for r in rs:
+            print(f"{r['stage']:<30} {r['size']:>9}  median {r['median_s']:.4f}s  "
+                  f"{r['throughput_per_s'] or 0:>12,.0f}/s  peak {r['peak_mb']:.1f}MB")
+        results.extend(rs)
+
+    payload = {
+        "meta": {
+            "git_rev": _git_rev(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    out = args.out or os.path.join(RESULTS_DIR, f"stages_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+    print(f"[bench] saved → {out}", file=sys.stderr)
+    if args.compare:
+        compare(results, args.compare)
+    return payload
+
+if __name__ == "__main__":
+    main()
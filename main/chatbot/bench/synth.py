@@ -0,0 +1,149 @@
+# bench/synth.py
+"""
+벤치마크용 합성 데이터 생성기 (seed 고정 → 실행 간 동일 데이터)
+- 국내 카드 명세서: 헤더 변형, 날짜/금액 표기 혼재, 환불(음수/괄호) 포함, CSV/XLSX 바이트
+- KB: 마크다운 문서 / 청크 + 가짜 임베딩(정규화된 float32)
+"""
+import io
+import random
+from datetime import date, timedelta
+from typing import Any, Dict, List, Tuple
+
+from node.analysis import CAT_KEYWORDS
+
+# 카드사별로 제각각인 헤더 (get_user_data.REQUIRED_COLS 후보 안에서 고름)
+HEADER_VARIANTS = [
+    ("이용일자", "가맹점명", "이용금액"),
+    ("승인일자", "이용가맹점", "승인금액"),
+    ("거래일시", "상호명", "결제금액"),
+    ("date", "merchant", "amount"),
+]
+
+DATE_FORMATS = ["%Y-%m-%d", "%Y.%m.%d", "%Y/%m/%d", "%Y%m%d", "%y.%m.%d", "%Y-%m-%d %H:%M:%S"]
+
+_EXTRA_MERCHANTS = ["김밥천국", "동네마트", "헬스장", "PC방", "주유소", "꽃집", "서점", "미용실"]
+_MERCHANTS = [k for keys in CAT_KEYWORDS.values() for k in keys] + _EXTRA_MERCHANTS
+
+def _fmt_amount(rng: random.Random, amt: int) -> str:
+    style = rng.random()
+    if amt < 0:
+        return f"({-amt:,})" if style < 0.5 else str(amt)
+    if style < 0.4:
+        return f"{amt:,}"
+    if style < 0.6:
+        return f"{amt:,}원"
+    if style < 0.7:
+        return f"+{amt}"
+    return str(amt)
+
+def gen_card_rows(n: int, seed: int = 42, start: date = date(2022, 1, 1),
+                  days: int = 3 * 365, refund_ratio: float = 0.03) -> Tuple[Tuple[str, str, str], List[Dict[str, str]]]:
+    """(헤더, 행 목록) 반환. 모든 값은 원본 파일처럼 문자열."""
+    rng = random.Random(seed)
+    header = HEADER_VARIANTS[seed % len(HEADER_VARIANTS)]
+    c_date, c_mrch, c_amt = header
+    rows = []
+    for _ in range(n):
+        d = start + timedelta(days=rng.randrange(days))
+        fmt = rng.choice(DATE_FORMATS)
+        ds = d.strftime(fmt) if "%H" not in fmt else f"{d.isoformat()} {rng.randrange(24):02d}:{rng.randrange(60):02d}:00"
+        amt = rng.choice([1500, 4500, 8900, 12000, 25900, 39000, 55000, 120000]) + rng.randrange(0, 1000, 100)
+        if rng.random() < refund_ratio:
+            amt = -amt
+        rows.append({
+            c_date: ds,
+            c_mrch: rng.choice(_MERCHANTS) + (f" {rng.randrange(1, 300)}호점" if rng.random() < 0.3 else ""),
+            c_amt: _fmt_amount(rng, amt),
+        })
+    return header, rows
+
+def card_records(n: int, seed: int = 42, start: date = date(2022, 1, 1),
+                 days: int = 3 * 365) -> List[Dict[str, Any]]:
+    """AnalysisNode 입력용 정규화된 card_history [{date, merchant, amount}]."""
+    rng = random.Random(seed)
+    out = []
+    for _ in range(n):
+        d = start + timedelta(days=rng.randrange(days))
+        amt = rng.choice([1500, 4500, 8900, 12000, 25900, 39000, 55000]) * (-1 if rng.random() < 0.03 else 1)
+        out.append({"date": d.isoformat(), "merchant": rng.choice(_MERCHANTS), "amount": amt})
+    return out
+
+def card_dataframe(n: int, seed: int = 42):
+    import pandas as pd
+    header, rows = gen_card_rows(n, seed)
+    return pd.DataFrame(rows, columns=list(header), dtype=str)
+
+def card_file_bytes(n: int, fmt: str = "csv", seed: int = 42) -> Tuple[bytes, str]:
+    """(파일 바이트, 파일명). xlsx는 openpyxl 필요."""
+    df = card_dataframe(n, seed)
+    buf = io.BytesIO()
+    if fmt == "xlsx":
+        df.to_excel(buf, index=False)
+    else:
+        buf.write(df.to_csv(index=False).encode("utf-8"))
+    return buf.getvalue(), f"statement_{n}.{fmt}"
+
+# -----------------------------------------------------------------------------
+# KB
+# -----------------------------------------------------------------------------
+_TOPICS = ["정기예금", "적금", "ETF", "IRP", "연금저축", "ISA", "청년도약계좌", "신용카드 소득공제", "비상자금", "보험"]
+_SENTS = [
+    "원금 손실 위험이 낮고 고정금리를 제공한다.",
+    "중도해지 시 이자 불이익이 있을 수 있다.",
+    "세액공제 한도와 적용 조건을 먼저 확인해야 한다.",
+    "분산투자와 장기 보유가 변동성을 줄인다.",
+    "자동이체로 강제 저축 습관을 만든다.",
+    "단기 유동성이 필요한 자금은 예치하지 않는다.",
+    "가입 전 예금자보호 대상 여부를 확인한다.",
+]
+
+def gen_markdown(n_sections: int, seed: int = 7) -> str:
+    rng = random.Random(seed)
+    parts = []
+    for i in range(n_sections):
+        parts.append(f"# {rng.choice(_TOPICS)} 안내 {i}")
+        for _ in range(rng.randint(3, 8)):
+            parts.append("- " + " ".join(rng.choice(_SENTS) for _ in range(rng.randint(1, 3))))
+        parts.append("")
+    return "\n".join(parts)
+
+def gen_kb(n_chunks: int, dim: int = 1536, seed: int = 7):
+    """(청크 목록, 임베딩 ndarray[n, dim] float32, L2 정규화)."""
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    chunks = [{"id": i, "title": f"doc_{i // 20}.md", "text": f"{_TOPICS[i % len(_TOPICS)]} {_SENTS[i % len(_SENTS)]}"}
+              for i in range(n_chunks)]
+    embs = rng.standard_normal((n_chunks, dim), dtype=np.float32)
+    embs /= np.linalg.norm(embs, axis=1, keepdims=True)
+    return chunks, embs
+
+def gen_clustered_kb(n_chunks: int, dim: int = 1536, n_clusters: int = 0, noise: float = 0.35, seed: int = 7):
+    """
+    주제별로 뭉친 임베딩 (실제 KB처럼 군집 구조가 있어야 ANN recall 측정이 의미 있음).
+    반환: (청크 목록, 임베딩 ndarray[n, dim] float32, L2 정규화)
+    """
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    n_clusters = n_clusters or max(int(np.sqrt(n_chunks)), 1)
+    centers = rng.standard_normal((n_clusters, dim), dtype=np.float32)
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    labels = rng.integers(0, n_clusters, n_chunks)
+    embs = centers[labels] + noise * rng.standard_normal((n_chunks, dim), dtype=np.float32) / np.sqrt(dim) * 4
+    embs /= np.linalg.norm(embs, axis=1, keepdims=True)
+    chunks = [{"id": i, "title": f"doc_{labels[i]}.md", "text": f"{_TOPICS[labels[i] % len(_TOPICS)]} {_SENTS[i % len(_SENTS)]}"}
+              for i in range(n_chunks)]
+    return chunks, embs.astype(np.float32)
+
+def near_queries(embs, n: int, noise: float = 0.5, seed: int = 11):
+    """KB 벡터 근처의 질의 (실제 질의처럼 관련 문서가 존재하는 분포)."""
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    base = embs[rng.integers(0, embs.shape[0], n)]
+    q = base + noise * rng.standard_normal(base.shape, dtype=np.float32) / np.sqrt(embs.shape[1]) * 4
+    return (q / np.linalg.norm(q, axis=1, keepdims=True)).astype(np.float32)
+
+def gen_queries(n: int, dim: int = 1536, seed: int = 11):
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    q = rng.standard_normal((n, dim), dtype=np.float32)
+    return q / np.linalg.norm(q, axis=1, keepdims=True)
@@ -0,0 +1,110 @@
+# bench/tx_index.py
+"""
+기간 조회 벤치마크: 전체 스캔(AnalysisNode) vs 날짜 정렬 인덱스(util/tx_index) (main/chatbot 에서 실행)
+
+    python -m bench.tx_index --rows 10000,100000,1000000 --years 1,3,5
+
+오늘로 끝나는 N년치 정규화 이력을 만들어 다음을 비교한다.
+- current_month: AnalysisNode(only_current_month=True) 전체 스캔 vs TxIndex.analysis(이번 달)
+- last_3_months: 구간 필터 후 AnalysisNode vs TxIndex.analysis(최근 3개월)
+- month_over_month: 월별 합계 전체 스캔 vs TxIndex.month_over_month (누적합, 행 순회 없음)
+- build: TxIndex.from_history (업로드당 1회, 새 거래가 들어올 때만 다시)
+인덱스 결과는 AnalysisNode 결과와 같아야 한다 (parity 불일치 시 종료 코드 1).
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from bench.stages import RESULTS_DIR, _ints, measure
+from bench.synth import card_records
+from node.analysis import AnalysisNode
+from util.tx_index import TxIndex, last_months, month_range
+
+SALARY = 3_000_000
+
+def _scan_window(history: List[Dict[str, Any]], lo: int, hi: int) -> Dict[str, Any]:
+    """인덱스 없는 기준선: 날짜 문자열 비교로 구간을 거른 뒤 AnalysisNode."""
+    s, e = f"{lo // 10000:04d}-{lo // 100 % 100:02d}-{lo % 100:02d}", f"{hi // 10000:04d}-{hi // 100 % 100:02d}-{hi % 100:02d}"
+    rows = [tx for tx in history if s <= tx["date"] < e]
+    return AnalysisNode()({"user_data": {"salary": SALARY, "card_history": rows}})["analysis_result"]
+
+def _scan_mom(history: List[Dict[str, Any]], ref: date) -> Dict[str, int]:
+    cur = ref.strftime("%Y-%m")
+    prev = (ref.replace(day=1) - timedelta(days=1)).strftime("%Y-%m")
+    out = {cur: 0, prev: 0}
+    for tx in history:
+        m = tx["date"][:7]
+        if m in out and tx["amount"] > 0:
+            out[m] += tx["amount"]
+    return out
+
+def run(sizes: List[int], years: List[int], repeat: int) -> Dict[str, Any]:
+    today = date.today()
+    results: List[Dict[str, Any]] = []
+    mismatches: List[str] = []
+    node_cur = AnalysisNode(only_current_month=True)
+    for y in years:
+        start = today - timedelta(days=365 * y - 1)
+        for n in sizes:
+            history = card_records(n, start=start, days=365 * y)
+            state = {"user_data": {"salary": SALARY, "card_history": history}}
+            idx = TxIndex.from_history(history)
+            cur = month_range(today.year, today.month)
+            last3 = last_months(3, today)
+
+            # parity
+            a = node_cur(state)["analysis_result"]
+            b = idx.analysis(SALARY, *cur, only_current_month=True)
+            if a != b or a["top_merchants"] != b["top_merchants"]:
+                mismatches.append(f"current_month years={y} rows={n}")
+            a, b = _scan_window(history, *last3), idx.analysis(SALARY, *last3)
+            if a != b or a["top_merchants"] != b["top_merchants"]:
+                mismatches.append(f"last_3_months years={y} rows={n}")
+            if idx.totals(*cur)["total_spent"] != _scan_mom(history, today)[today.strftime("%Y-%m")]:
+                mismatches.append(f"month_over_month years={y} rows={n}")
+
+            cases = [
+                ("build", lambda: TxIndex.from_history(history), None),
+                ("current_month", lambda: node_cur(state), lambda: idx.analysis(SALARY, *cur, only_current_month=True)),
+                ("last_3_months", lambda: _scan_window(history, *last3), lambda: idx.analysis(SALARY, *last3)),
+                ("month_over_month", lambda: _scan_mom(history, today), lambda: idx.month_over_month(today)),
+            ]
+            for name, scan, indexed in cases:
+                r = {"case": name, "years": y, "rows": n,
+                     "scan": measure(f"{name}[scan]" if indexed else name, n, n, scan, repeat=repeat)}
+                if indexed:
+                    r["index"] = measure(f"{name}[index]", n, n, indexed, repeat=repeat)
+                    r["speedup"] = round(r["scan"]["median_s"] / r["index"]["median_s"], 1) \
+                        if r["index"]["median_s"] > 0 else None
+                    print(f"{name:<17} {y}y {n:>9}  scan {r['scan']['median_s'] * 1000:>9.3f}ms  "
+                          f"index {r['index']['median_s'] * 1000:>8.3f}ms  x{r['speedup']}")
+                else:
+                    print(f"{name:<17} {y}y {n:>9}  {r['scan']['median_s'] * 1000:>9.3f}ms")
+                results.append(r)
+    for m in mismatches:
+        print(f"[tx_index] PARITY MISMATCH {m}", file=sys.stderr)
+    return {"results": results, "mismatches": mismatches}
+
+def main(argv: Optional[List[str]] = None):
+    ap = argparse.ArgumentParser(description="Date-sorted transaction index benchmark")
+    ap.add_argument("--rows", default="10000,100000,1000000")
+    ap.add_argument("--years", default="1,3,5", help="이력 기간(년) 목록")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--out", default="")
+    args = ap.parse_args(argv)
+
+    payload = run(_ints(args.rows), _ints(args.years), args.repeat)
+    out = args.out or os.path.join(RESULTS_DIR, f"tx_index_{datetime.now():%Y%m%d_%H%M%S}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump({"args": vars(args), **payload}, f, ensure_ascii=False, indent=2)
+    print(f"[tx_index] saved → {out}", file=sys.stderr)
+    if payload["mismatches"]:
+        sys.exit(1)
+    return payload
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,32 @@
+from typing import Any, AsyncIterator, Dict
+
 from node.react import ReactAgentNode
 from langgraph.graph import StateGraph, END
 
 from state.schema import OverallState
+from graph.cache import get_compiled
+from util.metrics import timed_node
+
+
+def _build_react_graph():
+    graph = StateGraph(OverallState)
+    graph.add_node("react", timed_node("react", ReactAgentNode()))
+    graph.add_edge("react", END)
+    graph.set_entry_point("react")
+    compile_graph=graph.compile()
+    return compile_graph
 
 
 class GraphBuilder:
     def __init__(self):
-        self.react_node = ReactAgentNode()
-        self.graph = self.build_graph()
-
-    def build_graph(self):
-        graph = StateGraph(OverallState)
-        graph.add_node("react", self.react_node)
-        graph.add_edge("react", END)
-        graph.set_entry_point("react")
-        compile_graph=graph.compile()
-        return compile_graph
+        self.graph = get_compiled("react", _build_react_graph)
 
     def run_graph_streaming(self, input_text: str):
-        return self.graph.invoke({"input":input_text})
\ No newline at end of file
+        return self.graph.invoke({"input":input_text})
+
+    async def ainvoke(self, input_text: str) -> Dict[str, Any]:
+        return await self.graph.ainvoke({"input": input_text})
+
+    async def astream(self, input_text: str) -> AsyncIterator[Dict[str, Any]]:
+        async for update in self.graph.astream({"input": input_text}, stream_mode="updates"):
+            yield update
@@ -0,0 +1,26 @@
+# graph/cache.py
+import threading
+from typing import Any, Callable, Dict
+
+# 프로세스 단위 컴파일 그래프 캐시: 빌더 인스턴스마다 StateGraph를 다시 compile하지 않도록 이름별 1회만 생성
+_COMPILED: Dict[str, Any] = {}
+_LOCK = threading.Lock()
+
+def get_compiled(name: str, factory: Callable[[], Any]) -> Any:
+    graph = _COMPILED.get(name)
+    if graph is not None:
+        return graph
+    with _LOCK:
+        graph = _COMPILED.get(name)
+        if graph is None:
+            graph = factory()
+            _COMPILED[name] = graph
+    return graph
+
+def clear_compiled(name: str | None = None):
+    """테스트/핫리로드용: 특정(또는 전체) 캐시 제거."""
+    with _LOCK:
+        if name is None:
+            _COMPILED.clear()
+        else:
+            _COMPILED.pop(name, None)
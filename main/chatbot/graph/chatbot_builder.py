@@ -1,31 +1,59 @@
 # chat_builder.py
+from typing import Any, AsyncIterator, Dict
+
 from langgraph.graph import StateGraph, END
 from node.analysis import AnalysisNode
 from node.egen_teto_classifier import EgenTetoClassifierNode
 from node.greet import GreetingNode
 from state.schema import OverallState
+from graph.cache import get_compiled
+from util.metrics import timed_node
+
+
+def _build_chat_graph():
+    """
+    greeting → (egen_teto_classifier ∥ analysis) → END
+    분류와 카드 분석은 서로 의존하지 않으므로 병렬 실행 후 OverallState로 병합된다.
+    (각 노드는 자기 키만 부분 업데이트로 반환해야 병합 충돌이 없다)
+    """
+    graph = StateGraph(OverallState)
+    graph.add_node("greeting", timed_node("greeting", GreetingNode()))
+    graph.add_node("egen_teto_classifier", timed_node("egen_teto_classifier", EgenTetoClassifierNode()))
+    graph.add_node("analysis", timed_node("analysis", AnalysisNode()))
+
+    graph.set_entry_point("greeting")
+    graph.add_edge("greeting", "egen_teto_classifier")
+    graph.add_edge("greeting", "analysis")
+    graph.add_edge("egen_teto_classifier", END)
+    graph.add_edge("analysis", END)
+    return graph.compile()
+
 
 class ChatBuilder:
     def __init__(self):
-        self.greeting_node = GreetingNode()
-        self.egen_teto_classifier_node = EgenTetoClassifierNode()
-        self.analysis_node = AnalysisNode()
-        self.graph = self._build_graph()
-
-    def _build_graph(self):
-        graph = StateGraph(OverallState)
-        graph.add_node("greeting", self.greeting_node)
-        graph.add_node("egen_teto_classifier", self.egen_teto_classifier_node)
-        graph.add_node("analysis", self.analysis_node)
-
-        graph.set_entry_point("greeting")
-        graph.add_edge("greeting", "egen_teto_classifier")
-        graph.add_edge("egen_teto_classifier", "analysis")
-        graph.add_edge("analysis", END)
-        return graph.compile()
-
-    def run_graph_streaming(self, input_text: str, user_data: dict | None = None):
+        self.graph = get_compiled("chat", _build_chat_graph)
+
+    @staticmethod
+    def _init_state(input_text: str, user_data: dict | None = None,
+                    survey_answers: dict | None = None) -> Dict[str, Any]:
         init_state = {"input": input_text}
         if user_data:
             init_state["user_data"] = user_data   # {"salary":..., "card_history":[...]}
-        return self.graph.invoke(init_state)
+        if survey_answers:
+            init_state["survey_answers"] = survey_answers
+        return init_state
+
+    def run_graph_streaming(self, input_text: str, user_data: dict | None = None,
+                            survey_answers: dict | None = None):
+        return self.graph.invoke(self._init_state(input_text, user_data, survey_answers))
+
+    async def ainvoke(self, input_text: str, user_data: dict | None = None,
+                      survey_answers: dict | None = None) -> Dict[str, Any]:
+        return await self.graph.ainvoke(self._init_state(input_text, user_data, survey_answers))
+
+    async def astream(self, input_text: str, user_data: dict | None = None,
+                      survey_answers: dict | None = None) -> AsyncIterator[Dict[str, Any]]:
+        """노드가 끝나는 순서대로 {노드명: 부분 업데이트}를 흘려보낸다."""
+        init_state = self._init_state(input_text, user_data, survey_answers)
+        async for update in self.graph.astream(init_state, stream_mode="updates"):
+            yield update
@@ -1,12 +1,14 @@
 # main.py
-import os, io, json
+import os, io, json, asyncio, logging, threading, time, uuid
+from contextlib import asynccontextmanager
 from typing import Dict, List, Any, Tuple
 
 from fastapi import FastAPI, UploadFile, File, Form, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.exceptions import RequestValidationError
 from pathlib import Path
+import numpy as np
 import pandas as pd
 
 # OpenAI SDK (v1.x)
@@ -38,12 +40,91 @@ if not OPENAI_API_KEY:
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 # 규칙 분류기 (이미 프로젝트에 있는 파일 사용)
-from node.egen_teto_classifier import EgenTetoClassifierNode
+from node.egen_teto_classifier import EgenTetoClassifierNode, normalize_answers
+from util.prompt_pack import PromptPacker
+from util.session_store import get_session_store, apply_answer_delta, on_session_end
+from state.schema import SessionState
+from util import metrics
+from util.metrics import span
+from util.embeddings import get_embedding_provider
+from util.vector_index import as_matrix, index_params_from_env, load_or_build_index
+from util import kb_shared
+from util.singleflight import SingleFlight, request_key
+from util import memprof
+from util.memprof import mem_stage, record_bytes, record_df
+from util.kb_registry import KBRegistry, tenant_dir
+from util.chunker import DEFAULT_MAX_TOKENS, chunk_documents, compare_report
+from util import llm_route, tx_index, tx_ingest, upload_cache
+from util.cohort import get_cohort_store
+
+logger = logging.getLogger(__name__)
+
+# 메모리 세션이 LRU로 밀려나면 코호트 기여분도 뺀다 (TTL 만료는 코호트 저장소가 COHORT_TTL_SEC로 정리)
+on_session_end(lambda sid: get_cohort_store().remove(sid))
+
+# -----------------------------------------------------------------------------
+# 워밍업 (lifespan): KB 적재/임베딩 + OpenAI 커넥션 풀 예열 후 ready 전환
+# -----------------------------------------------------------------------------
+# WARMUP=0 이면 워밍업을 건너뛰고 즉시 ready (로컬 개발용)
+# WARMUP_RAG_STORE=1 이면 util/rag의 FAISS 스토어(Ollama 임베딩)도 미리 빌드
+# 실패하면 WARMUP_RETRY_SEC(기본 5)부터 두 배씩(최대 300초) 늘려 가며 성공할 때까지 다시 시도
+_warmup_state: Dict[str, Any] = {"ready": False, "error": None, "elapsed_sec": None}
+
+def _warmup():
+    t0 = time.perf_counter()
+    embed_kb()
+    # 질의 임베딩 + 검색까지 한 번 태워서 TLS 핸드셰이크/커넥션 풀을 미리 연다
+    rag_search(DEFAULT_RAG_QUERY, k=1)
+    if os.getenv("WARMUP_RAG_STORE", "0") == "1":
+        from util.rag import get_store
+        get_store()
+    return round(time.perf_counter() - t0, 3)
+
+async def _run_warmup():
+    delay = float(os.getenv("WARMUP_RETRY_SEC", "5"))
+    while True:
+        try:
+            _warmup_state["elapsed_sec"] = await asyncio.to_thread(_warmup)
+            _warmup_state["ready"] = True
+            _warmup_state["error"] = None
+            logger.info(f"[warmup] done in {_warmup_state['elapsed_sec']}s")
+            return
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # 실패해도 프로세스는 살아있고(live) ready는 내린 채 재시도
+            # (그 사이 /chat이 KB를 만들어 두면 다음 시도는 커넥션 예열만 하고 끝난다)
+            _warmup_state["error"] = f"{type(e).__name__}: {e}"
+            logger.error(f"[warmup] failed: {_warmup_state['error']} (retry in {delay:.0f}s)")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 300.0)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    store = get_session_store()
+    if hasattr(store, "stats"):
+        metrics.register_cache_stats("session", store.stats)
+    task = None
+    if os.getenv("WARMUP", "1") == "0":
+        _warmup_state["ready"] = True
+    else:
+        # 백그라운드로 돌리고 바로 yield → 워밍업 중에도 /health/live는 200, /health/ready는 503
+        task = asyncio.create_task(_run_warmup())
+    try:
+        yield
+    finally:
+        if task is not None and not task.done():
+            # to_thread 스레드는 중단할 수 없어 끝까지 돌지만, 종료를 붙잡지 않도록 태스크만 취소
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
 
 # -----------------------------------------------------------------------------
 # FastAPI & CORS
 # -----------------------------------------------------------------------------
-app = FastAPI(title="SASHA Finance Coach API")
+app = FastAPI(title="SASHA Finance Coach API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -63,21 +144,88 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
     return JSONResponse(status_code=422, content={"detail": sanitized})
 
 # -----------------------------------------------------------------------------
-# 간단한 상태 확인
+# 계측: 요청별 단계 breakdown 수집 + /metrics (Prometheus 텍스트)
+# -----------------------------------------------------------------------------
+# METRICS_STAGE_HEADER=1 이거나 요청 헤더 X-Debug-Timing: 1 이면 Server-Timing 헤더로 단계별 ms 반환
+@app.middleware("http")
+async def stage_timing_middleware(request: Request, call_next):
+    token = metrics.start_request()
+    mem_token = memprof.start_request(request.url.path)   # MEMPROF=1 이고 샘플된 경우만
+    t0 = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        breakdown = metrics.end_request(token)
+        memprof.end_request(mem_token)
+        # 라벨은 라우트 템플릿(/session/{session_id}) — 원본 URL이면 세션 id/404 탐색마다 시계열이 늘어난다
+        route = request.scope.get("route")
+        metrics.REQUEST_LATENCY.observe(time.perf_counter() - t0, path=getattr(route, "path", None) or "unmatched",
+                                        status=status)
+    if breakdown and (os.getenv("METRICS_STAGE_HEADER", "0") == "1"
+                      or request.headers.get("x-debug-timing") == "1"):
+        response.headers["Server-Timing"] = metrics.server_timing(breakdown)
+    return response
+
+@app.get("/metrics")
+def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+# MEMPROF=1 일 때 요청별 단계 peak / DataFrame 크기 리포트 (top>0 이면 현재 할당 상위 위치)
+@app.get("/debug/memory")
+def debug_memory(top: int = 0):
+    return memprof.snapshot(top=top)
+
+# -----------------------------------------------------------------------------
+# 상태 확인: live(프로세스 응답 가능) / ready(워밍업 완료, 트래픽 수신 가능)
 # -----------------------------------------------------------------------------
 @app.get("/health")
 def health():
-    return {"ok": True}
+    return {"ok": True, "live": True, "ready": _warmup_state["ready"]}
+
+@app.get("/health/live")
+def health_live():
+    return {"live": True}
+
+@app.get("/health/ready")
+def health_ready():
+    # 로드밸런서는 이 엔드포인트로 판단: 워밍업 전/실패 시 503
+    if not _warmup_state["ready"]:
+        return JSONResponse(
+            status_code=503,
+            content={"ready": False, "error": _warmup_state["error"]},
+        )
+    return {"ready": True, "warmup_sec": _warmup_state["elapsed_sec"], "kb_chunks": _kb_chunk_stats or None}
 
 # -----------------------------------------------------------------------------
 # KB / RAG (로컬 ./kb의 .md/.txt 문서를 읽어서 OpenAI 임베딩)
 # -----------------------------------------------------------------------------
-KB_DIR = os.path.join(os.path.dirname(__file__), "kb")
+# KB_DIR=./rag_data 로 번들된 금융 문서 코퍼스(14개 문서)를 색인할 수 있다 (기본 ./kb: 기본 문서 1개)
+KB_DIR = os.getenv("KB_DIR") or os.path.join(os.path.dirname(__file__), "kb")
 EMBED_MODEL = "text-embedding-3-small"   # 가성비
 CHAT_MODEL  = "gpt-4o-mini"              # 응답 모델
+DEFAULT_RAG_QUERY = "예금/적금/ETF 장단점, 안정/성장 성향별 권장사항, 리스크 경고"
+
+# 임베딩 공급자: EMBED_PROVIDER=openai(기본)|ollama|local (local은 오프라인 테스트용 결정적 벡터)
+# KB_EMBED_DIM: text-embedding-3-small을 API 단에서 축소 차원(예: 512)으로 받음 (KB/질의 모두 같은 차원)
+KB_EMBED_DIM = int(os.getenv("KB_EMBED_DIM", "0")) or None
+embedder = get_embedding_provider(os.getenv("EMBED_PROVIDER", "openai"), client=client, model=EMBED_MODEL,
+                                  dimensions=KB_EMBED_DIM)
+
+# 검색 인덱스: KB_INDEX=exact(기본, numpy 전수)|hnsw|ivf (faiss), KB_INDEX_PATH 지정 시 디스크 저장/재사용
+# exact는 KB_STORAGE=float16|int8, KB_TRUNCATE_DIM, KB_RESCORE로 압축 저장 + 정확 재채점 가능 (util/vector_index)
+KB_INDEX = os.getenv("KB_INDEX", "exact")
+KB_INDEX_PATH = os.getenv("KB_INDEX_PATH", "")
+
+# KB_CHUNKER=structure(기본, util/chunker: 헤딩/문장 경계 + 중복 제거)|legacy(900자 슬라이스)
+KB_CHUNKER = os.getenv("KB_CHUNKER", "structure")
 
 _kb_chunks: List[Dict[str, Any]] = []    # {id, title, text}
-_kb_embs: List[List[float]] = []         # 임베딩 캐시
+_kb_chunk_stats: Dict[str, Any] = {}     # 청킹 통계 (/health/ready)
+_kb_embs: np.ndarray | None = None       # 인덱스 빌드용 임베딩 (n, dim) float32, L2 정규화 — 빌드 후 해제
+_kb_index = None                         # util.vector_index 인덱스
+_kb_lock = threading.RLock()             # 워밍업(백그라운드)과 요청 스레드가 동시에 빌드하지 않도록
 
 def _bootstrap_kb():
     """./kb 폴더가 없거나 비어있으면 샘플 문서를 하나 만든다."""
@@ -109,50 +257,153 @@ def _chunk(text: str, size: int = 900, overlap: int = 150) -> List[str]:
         i += size - overlap
     return out
 
+def _read_kb_docs(kb_dir: str) -> List[Tuple[str, str]]:
+    docs = []
+    for fn in sorted(os.listdir(kb_dir)):
+        if not fn.endswith((".md", ".txt")):
+            continue
+        with open(os.path.join(kb_dir, fn), "r", encoding="utf-8") as f:
+            docs.append((fn, f.read()))
+    return docs
+
+def _chunk_docs(docs: List[Tuple[str, str]]) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """(청크 목록, 청킹 통계). KB_CHUNKER=legacy면 통계 없음."""
+    if KB_CHUNKER == "legacy":
+        chunks = []
+        for fn, raw in docs:
+            for c in _chunk(raw):
+                chunks.append({"id": len(chunks), "title": fn, "text": c.strip()})
+        return chunks, {}
+    # 헤딩/문장 경계 청킹 + 중복 제거 (기존 문자 슬라이스 대비 감소량을 함께 기록)
+    chunks, stats = chunk_documents(docs)
+    baseline = [c for _, raw in docs for c in _chunk(raw)]
+    return chunks, {**stats.to_dict(), **compare_report(baseline, chunks, dim=KB_EMBED_DIM or 1536)}
+
 def load_kb():
     """KB 조각을 메모리에 적재."""
-    global _kb_chunks
+    global _kb_chunks, _kb_chunk_stats
     if _kb_chunks:
         return
-    _bootstrap_kb()
-    did = 0
-    for fn in os.listdir(KB_DIR):
-        if not fn.endswith((".md", ".txt")):
-            continue
-        path = os.path.join(KB_DIR, fn)
-        with open(path, "r", encoding="utf-8") as f:
-            raw = f.read()
-        for c in _chunk(raw):
-            _kb_chunks.append({"id": did, "title": fn, "text": c.strip()})
-            did += 1
+    with _kb_lock:
+        if _kb_chunks:
+            return
+        _bootstrap_kb()
+        chunks, _kb_chunk_stats = _chunk_docs(_read_kb_docs(KB_DIR))
+        _kb_chunks = chunks
+        if _kb_chunk_stats:
+            logger.info(f"[kb] chunks {_kb_chunk_stats}")
+
+def _embed_chunks(chunks: List[Dict[str, Any]]) -> np.ndarray:
+    with span("kb_embed"):
+        return as_matrix(embedder.embed_documents([c["text"] for c in chunks]))   # 공급자 내부에서 200개 단위 배치
+
+def _build_kb_embeddings() -> Tuple[List[Dict[str, Any]], np.ndarray]:
+    load_kb()
+    return _kb_chunks, _embed_chunks(_kb_chunks)
+
+def _kb_fingerprint(kb_dir: str = KB_DIR) -> str:
+    if kb_dir == KB_DIR:
+        _bootstrap_kb()
+    files = [os.path.join(kb_dir, fn) for fn in os.listdir(kb_dir) if fn.endswith((".md", ".txt"))]
+    return kb_shared.source_fingerprint(files, provider=os.getenv("EMBED_PROVIDER", "openai"),
+                                        model=EMBED_MODEL, dim=KB_EMBED_DIM,
+                                        chunker=[KB_CHUNKER, DEFAULT_MAX_TOKENS])
+
+def _build_kb_index(embs: np.ndarray, index_path: str = ""):
+    with span("kb_index_build"):
+        params = index_params_from_env(KB_INDEX)
+        if index_path:
+            with kb_shared.file_lock(index_path + ".lock"):   # 디스크 인덱스 빌드/저장은 워커 하나만
+                return load_or_build_index(KB_INDEX, embs, path=index_path, **params)
+        return load_or_build_index(KB_INDEX, embs, **params)
 
 def embed_kb():
-    """KB 조각 임베딩 생성(최초 1회)."""
-    global _kb_embs
-    if _kb_embs:
+    """KB 조각 임베딩 생성 + 검색 인덱스 구성(최초 1회)."""
+    global _kb_chunks, _kb_embs, _kb_index
+    if _kb_index is not None:
         return
-    load_kb()
-    texts = [c["text"] for c in _kb_chunks]
-    _kb_embs = []
-    B = 200
-    for i in range(0, len(texts), B):
-        resp = client.embeddings.create(model=EMBED_MODEL, input=texts[i:i+B])
-        _kb_embs.extend([d.embedding for d in resp.data])
-
-def _cosine(a: List[float], b: List[float]) -> float:
-    from math import sqrt
-    dot = sum(x*y for x, y in zip(a, b))
-    na = sqrt(sum(x*x for x in a)) or 1.0
-    nb = sqrt(sum(y*y for y in b)) or 1.0
-    return dot / (na * nb)
-
-def rag_search(query: str, k: int = 4) -> List[Dict[str, Any]]:
-    load_kb()
-    embed_kb()
-    q_emb = client.embeddings.create(model=EMBED_MODEL, input=[query]).data[0].embedding
-    scored = [(_cosine(q_emb, emb), ch) for ch, emb in zip(_kb_chunks, _kb_embs)]
-    scored.sort(key=lambda x: x[0], reverse=True)
-    return [c for _, c in scored[:k]]
+    # 워밍업이 끝나기 전 들어온 요청들이 각자 KB 전체를 다시 임베딩(유료 호출)하지 않도록 한 스레드만 빌드
+    with _kb_lock:
+        if _kb_index is not None:
+            return
+        if kb_shared.SHARED_DIR:
+            # 워커 간 공유: 한 워커만 임베딩하고 나머지는 읽기 전용 memmap으로 연결
+            _kb_chunks, _kb_embs = kb_shared.materialize("main_kb", _kb_fingerprint(), _build_kb_embeddings)
+        else:
+            _, _kb_embs = _build_kb_embeddings()
+        index = _build_kb_index(_kb_embs, KB_INDEX_PATH)
+        # 인덱스를 만든 뒤 float32 원본은 놓아준다. 검색은 인덱스만 쓴다
+        # (hnsw/ivf: faiss 내부 사본, exact: codes(압축본), KB_RESCORE 재채점은 인덱스가 든 full 참조)
+        _kb_embs = None
+        _kb_index = index   # 마지막에 공개 → 락 밖의 빠른 경로는 완성된 청크/인덱스만 본다
+
+# -----------------------------------------------------------------------------
+# 테넌트별 KB: KB_TENANTS_DIR/<tenant>/*.md — 처음 쓰일 때 적재, 메모리 예산 초과 시 LRU로 내림
+# -----------------------------------------------------------------------------
+# KB_TENANTS_DIR(기본 ./kb_tenants), KB_TENANT_BUDGET_MB(기본 512, 0=무제한), KB_TENANT_CHECK_SEC(30: 원본 변경 확인 주기)
+KB_TENANTS_DIR = os.getenv("KB_TENANTS_DIR", os.path.join(os.path.dirname(__file__), "kb_tenants"))
+
+class TenantKB:
+    """테넌트 하나의 청크 + 검색 인덱스. version은 원본 지문 (결과 캐시 무효화용)."""
+    def __init__(self, tenant: str, chunks: List[Dict[str, Any]], index, version: str):
+        self.tenant = tenant
+        self.chunks = chunks
+        self.index = index
+        self.version = version
+        self.nbytes = int(index.nbytes) + sum(len(c["text"].encode("utf-8")) for c in chunks)
+
+def _has_kb_docs(kb_dir: str) -> bool:
+    """.md/.txt 문서가 하나라도 있는 디렉터리인지 (빈 테넌트는 없는 테넌트로 취급)."""
+    return os.path.isdir(kb_dir) and any(fn.endswith((".md", ".txt")) for fn in os.listdir(kb_dir))
+
+def _load_tenant_kb(tenant: str) -> TenantKB:
+    kb_dir = tenant_dir(KB_TENANTS_DIR, tenant)
+    if not _has_kb_docs(kb_dir):
+        raise KeyError(tenant)
+    version = _kb_fingerprint(kb_dir)
+
+    def build():
+        chunks, _ = _chunk_docs(_read_kb_docs(kb_dir))
+        if not chunks:   # 문서가 모두 비어 있음 → (1, 0) 행렬로 인덱스를 만들지 않는다
+            raise KeyError(tenant)
+        return chunks, _embed_chunks(chunks)
+
+    if kb_shared.SHARED_DIR:
+        chunks, embs = kb_shared.materialize(f"kb_{tenant}", version, build)
+    else:
+        chunks, embs = build()
+    index = _build_kb_index(embs, f"{KB_INDEX_PATH}.{tenant}" if KB_INDEX_PATH else "")
+    logger.info(f"[kb] tenant {tenant}: {len(chunks)} chunks loaded")
+    return TenantKB(tenant, chunks, index, version)
+
+_tenant_kbs = KBRegistry(
+    "kb_tenant", _load_tenant_kb,
+    budget_mb=float(os.getenv("KB_TENANT_BUDGET_MB", "512")),
+    fingerprint=lambda t: _kb_fingerprint(tenant_dir(KB_TENANTS_DIR, t)),
+    check_sec=float(os.getenv("KB_TENANT_CHECK_SEC", "30")),
+)
+
+def rag_search(query: str, k: int = 4, tenant: str | None = None) -> List[Dict[str, Any]]:
+    """tenant가 있으면 해당 테넌트 KB, 없으면 기본 KB(./kb)에서 검색."""
+    if tenant:
+        kb = _tenant_kbs.get(tenant)
+        index, chunks = kb.index, kb.chunks
+    else:
+        embed_kb()
+        index, chunks = _kb_index, _kb_chunks
+    with span("rag_embed_query"):
+        # 동시 요청의 단건 질의는 마이크로배처가 몇 ms 모아 한 번에 호출
+        q_emb = embedder.embed_query(query)
+    with span("rag_score"):
+        return _rank(q_emb, k, index, chunks)
+
+def _rank(q_emb: List[float], k: int, index=None, chunks: List[Dict[str, Any]] | None = None) -> List[Dict[str, Any]]:
+    """질의 임베딩으로 KB 청크 상위 k개 (임베딩 호출 없이 순수 검색 단계만; 벤치마크에서 단독 측정)."""
+    index = index if index is not None else _kb_index
+    chunks = chunks if chunks is not None else _kb_chunks
+    scores, ids = index.search(np.asarray(q_emb, dtype=np.float32), k)
+    # 원본 청크 dict는 공유 캐시이므로 복사해서 점수를 붙인다 (패커가 저점수부터 제외)
+    return [{**chunks[i], "score": round(float(s), 4)} for s, i in zip(scores, ids) if i >= 0]
 
 # -----------------------------------------------------------------------------
 # 카드 파일 파서 & 요약
@@ -160,10 +411,12 @@ def rag_search(query: str, k: int = 4) -> List[Dict[str, Any]]:
 def parse_card_file(file_bytes: bytes, filename: str) -> pd.DataFrame:
     """CSV/XLSX 모두 지원. 금액 컬럼을 'AMOUNT'로 표준화."""
     buf = io.BytesIO(file_bytes)
-    if filename.lower().endswith(".csv"):
-        df = pd.read_csv(buf, encoding="utf-8", engine="python")
-    else:
-        df = pd.read_excel(buf)  # openpyxl 필요
+    with mem_stage("read_table"):
+        if filename.lower().endswith(".csv"):
+            df = pd.read_csv(buf, encoding="utf-8", engine="python")
+        else:
+            df = pd.read_excel(buf)  # openpyxl 필요
+    record_df("parsed", df)
     # 금액 컬럼 추정
     cand = ["금액", "이용금액", "결제금액", "AMOUNT", "amount"]
     amount_col = next((c for c in df.columns if c in cand), None)
@@ -216,7 +469,12 @@ SYSTEM_PROMPT = """당신은 개인 금융 코치입니다.
 - '성향'은 LLM이 임의로 바꾸지 말고 [분류 결과] 값을 그대로 사용.
 """
 
-def build_user_prompt(answers: Dict[str, Any], stats: Dict[str, Any], kb_ctx: List[Dict[str, Any]]) -> str:
+def build_user_prompt(
+    answers: Dict[str, Any],
+    stats: Dict[str, Any],
+    kb_ctx: List[Dict[str, Any]],
+    packer: PromptPacker | None = None,
+) -> str:
     ans_fmt = ", ".join(f"Q{id}: {val}" for id, val in answers.items())
     stats_lines = [
         f"- 총 지출 합계: {stats.get('total_spend', 0):,.0f}원",
@@ -227,7 +485,9 @@ def build_user_prompt(answers: Dict[str, Any], stats: Dict[str, Any], kb_ctx: Li
         stats_lines.append(f"- 월급 대비 지출 비율: {stats['spending_rate']}%")
     stats_block = "\n".join(stats_lines)
 
-    ctx = "\n\n".join([f"[{c['title']}] {c['text']}" for c in kb_ctx])
+    # RAG 발췌: 토큰 예산 안에서 겹침 제거 + 저점수 청크부터 제외
+    packer = packer or PromptPacker()
+    ctx = packer.pack_chunks("rag", kb_ctx, fmt=lambda c: f"[{c['title']}] {c['text']}")
     return f"""[사용자 O/X 응답]
 {ans_fmt}
 
@@ -239,74 +499,302 @@ def build_user_prompt(answers: Dict[str, Any], stats: Dict[str, Any], kb_ctx: Li
 """
 
 def call_openai_final_feedback_with_prompt(user_prompt: str) -> str:
-    resp = client.chat.completions.create(
-        model=CHAT_MODEL,
-        temperature=0.2,
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": user_prompt},
-        ],
-    )
+    with span("llm_completion"):
+        resp = client.chat.completions.create(
+            model=CHAT_MODEL,
+            temperature=0.2,
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": user_prompt},
+            ],
+        )
+    usage = getattr(resp, "usage", None)
+    if usage is not None:
+        metrics.record_llm_usage(CHAT_MODEL, usage.prompt_tokens, usage.completion_tokens)
     return resp.choices[0].message.content.strip()
 
 # -----------------------------------------------------------------------------
 # /chat : FormData(answers + file + salary) 처리
 # -----------------------------------------------------------------------------
+# 동일 입력(답변/파일/월급/세션)이 처리 중이면 새로 돌리지 않고 그 결과를 같이 받는다 (더블클릭/재시도)
+# session_id 없는 첫 요청(파일 업로드 더블클릭의 대표 경우)도 합치되, 따라온 요청에는 계산된 세션을
+# 새 id로 복사해 준다 → 결과만 공유하고 세션은 요청마다 따로 (다른 사용자와 세션 공유 X)
+# CHAT_SINGLEFLIGHT=0 이면 끔
+_chat_flight = SingleFlight("chat_singleflight")
+metrics.register_cache_stats("chat_singleflight", _chat_flight.stats)
+
+def _fork_session(result: Dict[str, Any]) -> Dict[str, Any]:
+    """합쳐진 익명 요청용: 리더가 만든 세션을 새 id로 복사하고 응답의 session_id를 바꾼다.
+    코호트에는 리더 세션만 반영 (중복 제출이 같은 사용자를 두 번 세지 않도록)."""
+    store = get_session_store()
+    sess = store.get(result["session_id"])
+    if sess is None:
+        return result
+    clone = sess.model_copy(deep=True, update={"session_id": uuid.uuid4().hex})
+    store.put(clone)
+    return {**result, "session_id": clone.session_id}
+
+def _salary_value(salary: str | None) -> int | None:
+    if salary is None or str(salary).strip() == "":
+        return None
+    try:
+        return max(int(float(salary)), 0)
+    except Exception:
+        return None
+
+def _age_value(age: str | None) -> int | None:
+    """정수 나이(0~120)만 허용. 빈 값은 None, 그 외 형식은 ValueError."""
+    if age is None or str(age).strip() == "":
+        return None
+    s = str(age).strip()
+    if not s.isdigit() or not 0 <= int(s) <= 120:
+        raise ValueError(f"age는 0~120 정수여야 합니다: {age!r}")
+    return int(s)
+
 @app.post("/chat")
 async def chat_endpoint(
-    answers: str = Form(...),                 # JSON 문자열 {"2":"X","3":"O",...}
-    file: UploadFile = File(None),            # CSV/XLSX
-    salary: str = Form(None)                  # 옵션: 월급(문자열로 와도 됨)
+    answers: str = Form(...),                 # JSON 문자열 {"2":"X","3":"O",...} (세션 사용 시 변경분만)
+    file: UploadFile = File(None),            # CSV/XLSX (세션에 한 번 올리면 재전송 불필요)
+    salary: str = Form(None),                 # 옵션: 월급(문자열로 와도 됨)
+    session_id: str = Form(None),             # 옵션: 없으면 새 세션 발급
+    tenant: str = Form(None),                 # 옵션: 제휴 은행/상품군 KB (KB_TENANTS_DIR/<tenant>)
+    age: str = Form(None),                    # 옵션: 나이 (코호트 연령대 집계용)
+    mode: str = Form(None),                   # 옵션: "classify"면 성향 한 줄만 (템플릿, RAG/LLM 호출 없음)
 ):
     # 1) answers 파싱
     try:
         ans_dict = json.loads(answers) if answers else {}
     except json.JSONDecodeError as e:
         return JSONResponse(status_code=400, content={"error": f"Invalid JSON in 'answers': {str(e)}"})
-
-    # 2) 파일 파싱(있다면)
-    df = pd.DataFrame()
-    if file is not None:
-        raw = await file.read()
-        try:
-            df = parse_card_file(raw, file.filename)
-        except Exception as e:
-            return JSONResponse(status_code=400, content={"error": f"파일 파싱 실패: {str(e)}"})
-
-    # 3) 요약 통계
-    monthly_salary = None
-    if salary is not None and str(salary).strip() != "":
+    ans_dict = ans_dict if isinstance(ans_dict, dict) else {}
+    try:
+        age_value = _age_value(age)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    if mode not in (None, "", "classify"):
+        return JSONResponse(status_code=400, content={"error": f"알 수 없는 mode: {mode} (classify)"})
+    if tenant:
         try:
-            monthly_salary = float(salary)
-        except Exception:
-            monthly_salary = None
-    stats = quick_analysis(df, monthly_salary)
+            if not _has_kb_docs(tenant_dir(KB_TENANTS_DIR, tenant)):
+                return JSONResponse(status_code=404, content={"error": f"알 수 없는 tenant: {tenant}"})
+        except ValueError as e:
+            return JSONResponse(status_code=400, content={"error": str(e)})
 
-    # 4) 규칙 기반 에겐/테토 분류 (여기가 핵심!)
+    raw = None
+    filename = None
+    if file is not None:
+        with span("file_read"), mem_stage("file_read"):
+            raw = await file.read()
+        record_bytes("upload", len(raw))
+        filename = file.filename
+
+    if os.getenv("CHAT_SINGLEFLIGHT", "1") == "0":
+        return await _chat(ans_dict, raw, filename, salary, session_id, tenant, age_value, mode)
+    key = request_key(sorted(normalize_answers(ans_dict).items()), _salary_value(salary), session_id,
+                      filename or "", tenant or "", age_value, mode or "",
+                      blobs={"file": raw} if raw is not None else None)
+    result, shared = await _chat_flight.do(
+        key, lambda: _chat(ans_dict, raw, filename, salary, session_id, tenant, age_value, mode))
+    if shared and not session_id and isinstance(result, dict):
+        result = await asyncio.to_thread(_fork_session, result)
+    return result
+
+def _background(fn, *args) -> "asyncio.Task":
+    """스레드에서 fn 실행. 먼저 실패한 단계 때문에 결과를 안 기다려도 예외 경고가 남지 않게 한다."""
+    task = asyncio.ensure_future(asyncio.to_thread(fn, *args))
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+    return task
+
+def _rag_stage(tenant: str | None = None) -> str:
+    with span("rag_search"), mem_stage("rag_search"):
+        return rag_search(DEFAULT_RAG_QUERY, k=4, tenant=tenant)
+
+def _parse_stage(raw: bytes | None, filename: str | None, sess: SessionState,
+                 monthly_salary: float | None) -> Tuple[List[float] | None, Dict[str, Any], tx_ingest.IngestResult | None]:
+    """(금액 목록|None, quick_analysis 통계, 적재 결과|None). 새 업로드가 없으면 세션의 누적분으로 계산.
+    같은 파일 재업로드는 util/upload_cache(sha256 + 확장자 + 파서 버전 키)에서 파싱 결과를 바로 읽는다.
+
+    날짜/가맹점/금액 열이 있는 파일은 거래 원장에 새 거래만 누적(겹치는 재업로드 중복 제거)하고,
+    금액 열만 있는 파일은 기존처럼 금액 목록을 통째로 교체한다.
+    """
+    if raw is not None:
+        key = upload_cache.digest(raw, filename)
+        with span("file_parse"), mem_stage("file_parse"):
+            try:
+                records = upload_cache.normalize_cards_cached(raw, filename, key=key)
+            except ValueError:
+                records = None   # 필수 열 누락 → 금액 열 경로
+            if records is None:
+                amounts = upload_cache.amounts_cached(raw, filename, parse_card_file, key=key)
+        if records is not None:
+            with span("tx_ingest"), mem_stage("tx_ingest"):
+                led, res = tx_ingest.ingest(sess, records)
+            return None, led.quick_stats(monthly_salary), res
+        df = pd.DataFrame({"AMOUNT": amounts}) if amounts else pd.DataFrame()
+    elif sess.cards:
+        return None, tx_ingest.ledger_for(sess).quick_stats(monthly_salary), None
+    else:
+        amounts = sess.card_amounts
+        df = pd.DataFrame({"AMOUNT": amounts}) if amounts else pd.DataFrame()
+    with span("quick_analysis"), mem_stage("quick_analysis"):
+        return amounts, quick_analysis(df, monthly_salary), None
+
+async def _chat(ans_dict: Dict, raw: bytes | None, filename: str | None,
+                salary: str | None, session_id: str | None, tenant: str | None = None, age: int | None = None,
+                mode: str | None = None):
+    """/chat 본 처리. 반환값(dict 또는 JSONResponse)은 합쳐진 중복 요청들이 그대로 공유한다."""
+    # 1-1) 세션 조회/생성 후 답변 변경분만 누적
+    store = get_session_store()
+    sess = store.get(session_id) if session_id else None
+    if session_id:
+        metrics.record_cache("session", sess is not None)
+        if sess is None:
+            # 세션 id는 서버가 발급한 것만 받는다 (클라이언트가 정한 id로 세션 생성 X)
+            return JSONResponse(status_code=404, content={"error": "세션이 없거나 만료되었습니다. session_id 없이 다시 시작하세요."})
+    else:
+        sess = SessionState(session_id=uuid.uuid4().hex)
+    apply_answer_delta(sess, ans_dict)
+
+    if _salary_value(salary) is not None:
+        sess.salary = _salary_value(salary)
+    monthly_salary = float(sess.salary) if sess.salary is not None else None
+    if age is not None:
+        sess.age = age
+
+    # 응답 경로: mode=classify는 고정 형식("성향: ...") 템플릿, 그 외는 RAG + LLM 생성 (util/llm_route)
+    route = "persona" if mode == "classify" else "final_feedback"
+    use_llm = llm_route.needs_llm(route)
+
+    # 의존 관계: RAG(고정 질의) ∥ [파일 파싱 → 요약 통계] ∥ 분류  →  프롬프트 → LLM
+    # 블로킹 단계는 스레드로 보내 이벤트 루프를 막지 않고, 요청 지연 = 가장 긴 경로가 되게 한다
+    rag_task = _background(_rag_stage, tenant) if use_llm else None
+    if rag_task is not None and memprof.active():
+        # 메모리 프로파일 대상 요청은 순서대로: 두 단계가 겹치면 단계별 peak에 서로의 할당이 섞인다
+        await asyncio.wait([rag_task])   # 예외는 아래 await rag_task에서 처리
+    parse_task = _background(_parse_stage, raw, filename, sess, monthly_salary)
+    await asyncio.sleep(0)   # 두 작업이 스레드풀에 먼저 올라가도록 한 번 양보
+
+    # 4) 규칙 기반 에겐/테토 분류 (수 μs라 루프에서 바로 실행 — 위 두 작업과 겹쳐 진행)
     try:
         cls = EgenTetoClassifierNode()
-        state_for_cls = {"survey_answers": ans_dict}  # 문자열 O/X여도 내부에서 변환 처리
-        egen_teto_type = cls.compute_type(state_for_cls)
+        state_for_cls = {"survey_answers": sess.survey_answers}  # 세션에서 이미 {int: bool}로 정규화됨
+        with span("classify"):
+            egen_teto_type = cls.compute_type(state_for_cls)
     except Exception as e:
         # 분류기 오류 시에도 서비스는 계속되도록
         egen_teto_type = "NEUTRAL-중립형"
+    sess.egen_teto_type = egen_teto_type
 
-    # 5) RAG 컨텍스트
-    rag_query = "예금/적금/ETF 장단점, 안정/성장 성향별 권장사항, 리스크 경고"
-    top_ctx = rag_search(rag_query, k=4)
-
-    # 6) LLM 프롬프트(분류 결과 고정값 prepend)
-    user_prompt = build_user_prompt(ans_dict, stats, top_ctx)
-    user_prompt = f"[분류 결과] 성향: {egen_teto_type}\n\n" + user_prompt
-
-    # 7) LLM 호출
+    # 2~3) 파일 파싱 + 요약 통계 → 거래 원장(새 거래만) 또는 금액 열을 세션에 보관
+    #      (파일이 없으면 세션의 기존 업로드 재사용)
     try:
-        final_feedback = call_openai_final_feedback_with_prompt(user_prompt)
+        amounts, stats, ingested = await parse_task
     except Exception as e:
-        return JSONResponse(status_code=500, content={"error": f"LLM 호출 실패: {type(e).__name__}: {e}"})
+        return JSONResponse(status_code=400, content={"error": f"파일 파싱 실패: {str(e)}"})
+    if raw is not None:
+        if amounts is not None:
+            tx_ingest.reset(sess)
+            await asyncio.to_thread(get_cohort_store().remove, sess.session_id)   # 거래 원장이 없어졌으니 기여분도 제거
+            sess.card_amounts = amounts
+        else:
+            sess.card_amounts = []
+        sess.card_filename = filename
+    store.put(sess)
+    # 코호트 집계: 이번 요청에 새로 들어온 거래와 성향/나이만 반영 (증분)
+    # (Postgres 저장소면 DB 왕복이므로 스레드에서)
+    await asyncio.to_thread(get_cohort_store().update, sess.session_id, egen_teto_type, sess.age,
+                            ingested.new if ingested else ())
+
+    route_ctx = {"egen_teto_type": egen_teto_type}
+    if not use_llm:
+        # 5~7) 고정 형식: RAG/프롬프트/LLM 생략
+        final_feedback = llm_route.render(route, route_ctx, lambda: "")
+    else:
+        # 5) RAG 컨텍스트 (보통 이 시점엔 이미 끝나 있음)
+        top_ctx = await rag_task
+
+        # 6) LLM 프롬프트(분류 결과 고정값 prepend)
+        packer = PromptPacker()
+        ans_ox = {qid: "O" if v else "X" for qid, v in sorted(sess.survey_answers.items())}
+        with span("prompt_build"):
+            user_prompt = build_user_prompt(ans_ox, stats, top_ctx, packer=packer)
+            user_prompt = f"[분류 결과] 성향: {egen_teto_type}\n\n" + user_prompt
+        packer.log(" /chat")
+
+        # 7) LLM 호출 (LLM_TEMPLATES=0 이면 mode=classify도 이 경로 → 전체 피드백 생성)
+        try:
+            final_feedback = await asyncio.to_thread(
+                llm_route.render, route, route_ctx, lambda: call_openai_final_feedback_with_prompt(user_prompt))
+        except Exception as e:
+            return JSONResponse(status_code=500, content={"error": f"LLM 호출 실패: {type(e).__name__}: {e}"})
 
     # 8) 프론트로 반환
-    return {
+    out = {
         "final_feedback": final_feedback,
-        "egen_teto_type": egen_teto_type
+        "egen_teto_type": egen_teto_type,
+        "session_id": sess.session_id,
+    }
+    if ingested is not None:
+        out["tx_ingest"] = ingested.to_dict()   # {"added", "duplicates", "total"}
+    return out
+
+# -----------------------------------------------------------------------------
+# 세션 조회/삭제
+# -----------------------------------------------------------------------------
+@app.get("/session/{session_id}")
+def get_session(session_id: str):
+    sess = get_session_store().get(session_id)
+    if sess is None:
+        return JSONResponse(status_code=404, content={"error": "세션이 없거나 만료되었습니다."})
+    next_qid, _ = EgenTetoClassifierNode.next_question({"survey_answers": sess.survey_answers})
+    return {
+        "session_id": sess.session_id,
+        "survey_answers": {qid: "O" if v else "X" for qid, v in sess.survey_answers.items()},
+        "survey_done": sess.survey_done,
+        "next_question": next_qid,
+        "egen_teto_type": sess.egen_teto_type,
+        "card_filename": sess.card_filename,
+        "card_tx_count": len(sess.cards) or len(sess.card_amounts),
+        "salary": sess.salary,
     }
+
+@app.get("/session/{session_id}/spending")
+def session_spending(session_id: str, month: str | None = None, start: str | None = None,
+                     end: str | None = None, last: int | None = None):
+    """기간 지출 분석. 예: ?month=2025-10 | ?month=this | ?last=3 | ?start=2025-01-01&end=2025-04-01 (end 미포함)"""
+    sess = get_session_store().get(session_id)
+    if sess is None:
+        return JSONResponse(status_code=404, content={"error": "세션이 없거나 만료되었습니다."})
+    try:
+        lo, hi = tx_index.window(month=month, start=start, end=end, last=last)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": f"기간 형식 오류: {e}"})
+    t0 = time.perf_counter()
+    with span("tx_window"):
+        idx = tx_ingest.ledger_for(sess).tx_index()
+        out = {
+            "window": {"start": lo, "end": hi},
+            "analysis": idx.analysis(sess.salary or 0, lo, hi, include_undated=lo is None and hi is None),
+            "month_over_month": idx.month_over_month(),
+        }
+    out["elapsed_ms"] = round((time.perf_counter() - t0) * 1000, 3)
+    return out
+
+@app.delete("/session/{session_id}")
+def delete_session(session_id: str):
+    get_session_store().delete(session_id)
+    get_cohort_store().remove(session_id)
+    return {"deleted": session_id}
+
+# -----------------------------------------------------------------------------
+# 코호트 분석: 사전 집계 셀 조회 (사용자 수와 무관하게 ms 단위)
+# -----------------------------------------------------------------------------
+@app.get("/analytics/cohort")
+def analytics_cohort(persona: str | None = None, age_band: str | None = None,
+                     month: str | None = None, category: str | None = None):
+    """예: /analytics/cohort?persona=TETO&age_band=20s&month=this&category=식비"""
+    t0 = time.perf_counter()
+    with span("cohort_query"):
+        out = get_cohort_store().query(persona=persona, age_band=age_band, month=month, category=category)
+    out["elapsed_ms"] = round((time.perf_counter() - t0) * 1000, 3)
+    return out
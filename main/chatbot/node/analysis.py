@@ -57,9 +57,11 @@ def _month_key(dt: datetime) -> str:
 
 class AnalysisNode:
     """
-    사용자 카드내역을 분석하고 요약 메트릭을 state['analysis_result']에 채운다.
+    사용자 카드내역을 분석하고 요약 메트릭을 analysis_result로 반환한다.
     - 입력: state = { 'user_data': { 'salary': int, 'card_history': [{date, merchant, amount}, ...] } }
-    - 출력: state['analysis_result'] 딕셔너리
+      user_data['ledger'](util.tx_ingest.TxLedger)가 있으면 전체 기간 분석은 누적 집계를 그대로 쓴다
+      user_data['tx_index'](util.tx_index.TxIndex)가 있으면 이번 달 분석은 이진 탐색으로 해당 월만 본다
+    - 출력: {'analysis_result': 딕셔너리} (그래프 병렬 병합용 부분 업데이트, 입력 state는 변경하지 않음)
     """
     def __init__(self, only_current_month: bool = False):
         self.only_current_month = only_current_month
@@ -67,6 +69,17 @@ class AnalysisNode:
     def __call__(self, state: Dict) -> Dict:
         user_data = state.get("user_data", {}) or {}
         salary = _safe_int(user_data.get("salary", 0))
+        ledger = user_data.get("ledger")
+        if ledger is not None and not self.only_current_month:
+            return {"analysis_result": ledger.analysis(salary)}
+        tx_index = user_data.get("tx_index")
+        if tx_index is None and ledger is not None:
+            tx_index = ledger.tx_index()
+        if tx_index is not None and self.only_current_month:
+            from util.tx_index import month_range
+            now = datetime.now()
+            return {"analysis_result": tx_index.analysis(salary, *month_range(now.year, now.month),
+                                                          only_current_month=True)}
         card_history: List[Dict] = user_data.get("card_history", []) or []
 
         # 날짜 파싱 + 월 필터
@@ -109,7 +122,7 @@ class AnalysisNode:
             key = _month_key(dt) if dt else "unknown"
             by_month[key] = by_month.get(key, 0) + a
 
-        state["analysis_result"] = {
+        analysis_result = {
             "salary": salary,
             "total_spent": total_spent,
             "total_refund": total_refund,
@@ -122,4 +135,4 @@ class AnalysisNode:
             "by_month": by_month,       # {"2025-08": 123000, ...}
             "only_current_month": self.only_current_month,
         }
-        return state
+        return {"analysis_result": analysis_result}
@@ -1,5 +1,10 @@
+from functools import lru_cache
+from typing import Dict, List, Sequence, Tuple, Optional
 
-from typing import Dict, Tuple, Optional
+try:
+    import numpy as np
+except ImportError:  # 배치 API만 numpy 사용 (없으면 리스트로 처리)
+    np = None
 
 QUESTIONS = {
     2: "기대 수익률이 낮더라도 원금 손실이 없는 상품을 우선 고려하시나요?",
@@ -12,6 +17,145 @@ QUESTIONS = {
     9: "타인 성공사례/트렌드보다 자신의 분석을 더 신뢰하나요?",
     10: "매달 예산을 세우고 지출을 꼼꼼히 추적하려고 노력하시나요?"
 }
+
+# -----------------------------------------------------------------------------
+# 스코어링 규칙
+# -----------------------------------------------------------------------------
+# 문항별 O 응답의 기본 귀속 성향과 가중치
+# 2: 원금보전 선호 → EGEN, 3: 투자정보 탐색 → TETO, 4: 성장선호 → TETO
+# 5: 장기투자 선호 → EGEN(약하게), 6: 본인수익 자신 → TETO, 7: 보증상품 선호 → EGEN
+# 8: 손실회피 큼 → EGEN, 9: 자기분석 신뢰 → TETO, 10: 예산/추적 → EGEN(소비 습관)
+O_WEIGHT = {
+    2: ("EGEN", 1.0),
+    3: ("TETO", 1.0),
+    4: ("TETO", 1.0),
+    5: ("EGEN", 0.6),
+    6: ("TETO", 1.0),
+    7: ("EGEN", 1.0),
+    8: ("EGEN", 1.0),
+    9: ("TETO", 0.8),
+    10: ("EGEN", 0.7),
+}
+
+# X 응답 시 반대로 가산. 다만 Q5/10은 ‘반대 성향’ 증거가 약하므로 완화 계수 적용
+# (예: 장기투자 X → 곧바로 TETO 확신이라기보단 약한 신호)
+X_WEAKEN = {5: 0.6, 10: 0.4}  # 1.0이면 대칭, <1.0이면 완화
+
+# 중립 밴드: |TETO - EGEN| < THRESH 이면 중립 (원하면 0.7~1.0로 조정)
+THRESH = 0.5
+
+LABELS = ("EGEN-안정 추구형", "NEUTRAL-중립형", "TETO-성장 추구형")
+EGEN_IDX, NEUTRAL_IDX, TETO_IDX = 0, 1, 2
+
+# -----------------------------------------------------------------------------
+# 응답 인코딩 & 컴파일된 점수 테이블
+# -----------------------------------------------------------------------------
+# 2~10번 문항을 자리 하나씩(0=미응답, 1=O, 2=X) 3진수로 → 0 ~ 3^9-1
+QIDS = tuple(range(2, 11))
+N_CODES = 3 ** len(QIDS)
+_POW3 = tuple(3 ** i for i in range(len(QIDS)))
+
+def _as_bool(raw) -> bool:
+    return raw if isinstance(raw, bool) else str(raw).strip().upper() == "O"   # "O" -> True, "X" -> False
+
+def encode_answers(answers: Dict) -> int:
+    """{qid: bool|"O"|"X"} → 테이블 인덱스. 키는 int여야 한다 (문자열 키는 normalize_answers 먼저)."""
+    code = 0
+    for qid, p in zip(QIDS, _POW3):
+        if qid in answers:
+            code += p if _as_bool(answers[qid]) else 2 * p
+    return code
+
+def _score_diff(answers: Dict[int, bool]) -> float:
+    """TETO - EGEN. 원래 compute_type의 문항 순회/부동소수 덧셈 순서를 그대로 유지."""
+    EGEN = 0.0
+    TETO = 0.0
+    for qid in range(2, 11):
+        if qid not in answers or qid not in O_WEIGHT:
+            continue
+        target, w = O_WEIGHT[qid]
+        if answers[qid] is True:  # O
+            if target == "EGEN":
+                EGEN += w
+            else:
+                TETO += w
+        else:  # X → 반대 성향으로 가산
+            w2 = w * X_WEAKEN.get(qid, 1.0)
+            if target == "EGEN":
+                TETO += w2
+            else:
+                EGEN += w2
+    return TETO - EGEN
+
+def _decode(code: int) -> Dict[int, bool]:
+    out: Dict[int, bool] = {}
+    for qid in QIDS:
+        code, d = divmod(code, 3)
+        if d:
+            out[qid] = d == 1
+    return out
+
+@lru_cache(maxsize=1)
+def _diff_table() -> Tuple[float, ...]:
+    """모든 3^9 응답 조합의 점수 차 (규칙 함수로 직접 계산 → 기존 결과와 비트 단위 동일)."""
+    return tuple(_score_diff(_decode(c)) for c in range(N_CODES))
+
+def _label_idx(diff: float, thresh: float) -> int:
+    if abs(diff) < thresh:
+        return NEUTRAL_IDX
+    return TETO_IDX if diff > 0 else EGEN_IDX
+
+@lru_cache(maxsize=8)
+def label_table(thresh: float = THRESH) -> bytes:
+    """코드 → 라벨 인덱스(0/1/2). 임계값별로 한 번만 만든다."""
+    return bytes(_label_idx(d, thresh) for d in _diff_table())
+
+def classify_codes(codes: Sequence[int], thresh: float = THRESH):
+    """인코딩된 응답 배열 → 라벨 인덱스 배열 (numpy 있으면 ndarray[uint8], 없으면 list)."""
+    if np is None:
+        table = label_table(thresh)
+        return [table[c] for c in codes]
+    diff = _diff_array()[np.asarray(codes, dtype=np.int64)]
+    # 점수 차는 테이블에서 그대로 가져오고 비교만 벡터화 → 임계값이 바뀌어도 전 코호트 재채점이 배열 연산 한 번
+    return np.where(np.abs(diff) < thresh, NEUTRAL_IDX, np.where(diff > 0, TETO_IDX, EGEN_IDX)).astype(np.uint8)
+
+@lru_cache(maxsize=1)
+def _diff_array():
+    return np.asarray(_diff_table(), dtype=np.float64)
+
+def encode_matrix(matrix):
+    """(N, 9) 배열(열=Q2..Q10, 값 0=미응답/1=O/2=X) → 코드 배열."""
+    m = np.asarray(matrix, dtype=np.int64)
+    return m @ np.asarray(_POW3, dtype=np.int64)
+
+def classify_batch(responses, thresh: float = THRESH) -> List[str]:
+    """
+    설문 응답 여러 건을 한 번에 분류. compute_type과 결과 동일.
+    responses: {qid: bool|"O"|"X"} dict 목록, 또는 encode_matrix 형식의 (N, 9) 배열
+    """
+    if np is not None and not (len(responses) and isinstance(responses[0], dict)):
+        codes = encode_matrix(responses) if len(responses) else np.zeros(0, dtype=np.int64)
+    else:
+        codes = [encode_answers(a if _is_normalized(a) else normalize_answers(a)) for a in responses]
+    return [LABELS[i] for i in classify_codes(codes, thresh)]
+
+def normalize_answers(answers_in: Dict) -> Dict[int, bool]:
+    """{"2": "O", 3: "x", 4: True} → {2: True, 3: False, 4: True} (정수로 못 바꾸는 키는 버림)"""
+    answers: Dict[int, bool] = {}
+    for k, v in (answers_in or {}).items():
+        try:
+            qid = int(k)  # "2" -> 2
+        except Exception:
+            continue
+        if isinstance(v, bool):
+            answers[qid] = v
+        else:
+            answers[qid] = str(v).strip().upper() == "O"
+    return answers
+
+def _is_normalized(answers: Dict) -> bool:
+    return all(type(k) is int and type(v) is bool for k, v in answers.items())
+
 class EgenTetoClassifierNode:
     """
         사전 정의된 에겐 테토 분류 질문을 수행하고 그 결과를 반환하는 노드
@@ -19,23 +163,17 @@ class EgenTetoClassifierNode:
     def __init__(self):
         pass
 
-    def __call__(self, state: Dict):
-        return state
+    def __call__(self, state: Dict) -> Dict:
+        # 그래프에서 분석 노드와 병렬로 돌기 때문에 자기 키만 부분 업데이트로 반환
+        if not state.get("survey_answers"):
+            return {}
+        return {"egen_teto_type": self.compute_type(state)}
 
     @staticmethod
     def next_question(state: Dict) -> Tuple[Optional[int], Optional[str]]:
-                # 수정 — 문자열 키/값 변환
+        # 세션 저장소/record_answer를 거친 답변은 이미 {int: bool} → 재정규화 생략
         answers_in = state.get("survey_answers", {}) or {}
-        answers: Dict[int, bool] = {}
-        for k, v in answers_in.items():
-            try:
-                qid = int(k)  # "2" -> 2
-            except Exception:
-                continue
-            if isinstance(v, bool):
-                answers[qid] = v
-            else:
-                answers[qid] = str(v).strip().upper() == "O"
+        answers = answers_in if _is_normalized(answers_in) else normalize_answers(answers_in)
         for qid in sorted(QUESTIONS.keys()):
             if qid not in answers:
                 return qid, QUESTIONS[qid]
@@ -54,57 +192,5 @@ class EgenTetoClassifierNode:
         - 결과 차이가 작으면 NEUTRAL 처리 (중립 밴드)
         """
         answers: Dict[int, bool] = state.get("survey_answers", {})
-
-        # 문항별 O 응답의 기본 귀속 성향과 가중치
-        # 2: 원금보전 선호 → EGEN, 3: 투자정보 탐색 → TETO, 4: 성장선호 → TETO
-        # 5: 장기투자 선호 → EGEN(약하게), 6: 본인수익 자신 → TETO, 7: 보증상품 선호 → EGEN
-        # 8: 손실회피 큼 → EGEN, 9: 자기분석 신뢰 → TETO, 10: 예산/추적 → EGEN(소비 습관)
-        O_WEIGHT = {
-            2: ("EGEN", 1.0),
-            3: ("TETO", 1.0),
-            4: ("TETO", 1.0),
-            5: ("EGEN", 0.6),
-            6: ("TETO", 1.0),
-            7: ("EGEN", 1.0),
-            8: ("EGEN", 1.0),
-            9: ("TETO", 0.8),
-            10: ("EGEN", 0.7),
-        }
-
-        # X 응답 시 반대로 가산. 다만 Q5/10은 ‘반대 성향’ 증거가 약하므로 완화 계수 적용
-        # (예: 장기투자 X → 곧바로 TETO 확신이라기보단 약한 신호)
-        X_WEAKEN = {5: 0.6, 10: 0.4}  # 1.0이면 대칭, <1.0이면 완화
-        EGEN = 0.0
-        TETO = 0.0
-
-        for qid in range(2, 11):
-            if qid not in answers:
-                continue
-            raw = answers[qid]
-            if isinstance(raw, bool):
-                ans = raw
-            else:
-                ans = str(raw).strip().upper() == "O"   # "O" -> True, "X" -> False
-            if qid not in O_WEIGHT:
-                continue
-
-            target, w = O_WEIGHT[qid]
-            if ans is True:  # O
-                if target == "EGEN":
-                    EGEN += w
-                else:
-                    TETO += w
-            else:  # X → 반대 성향으로 가산
-                weaken = X_WEAKEN.get(qid, 1.0)
-                w2 = w * weaken
-                if target == "EGEN":
-                    TETO += w2
-                else:
-                    EGEN += w2
-
-        # 중립 밴드: 차이가 작으면 중립 처리
-        diff = TETO - EGEN
-        THRESH = 0.5  # 임계값 (원하면 0.7~1.0로 조정)
-        if abs(diff) < THRESH:
-            return "NEUTRAL-중립형"
-        return "TETO-성장 추구형" if diff > 0 else "EGEN-안정 추구형"
\ No newline at end of file
+        # 3^9 조합 테이블 조회 (스코어링 규칙은 모듈 상단 O_WEIGHT/X_WEAKEN/THRESH)
+        return LABELS[label_table(THRESH)[encode_answers(answers)]]
@@ -3,8 +3,11 @@ import json
 import re
 from typing import Dict, Any, List
 from langchain_ollama import ChatOllama
-from chatbot.util.mbti import classify_egen_teto
-from chatbot.util.rag import rag_search
+from util.mbti import classify_egen_teto
+from util.rag import rag_search
+from util.prompt_pack import PromptPacker
+from util.metrics import record_llm_usage, span
+from util import llm_route
 
 SYSTEM = """당신은 개인 금융 코치입니다.
 - 응답은 한국어로 작성합니다.
@@ -34,11 +37,24 @@ def _to_int_amount(x: Any) -> int:
     except Exception:
         return 0
 
+def _compact_detail(detail: Dict[str, List[int]]) -> str:
+    # json.dumps 대신 "축:+성향=Q2,Q7" 형태로 압축 (빈 축은 생략)
+    parts = [f"{k}=" + ",".join(f"Q{q}" for q in v) for k, v in detail.items() if v]
+    return " / ".join(parts) or "없음"
+
 class FeedbackAgentNode:
     def __init__(self, base_url: str = "", model: str = "gemma3:1b"):
         # 필요시 매개변수 조정 (temperature/top_p 등)
+        self.model = model
         self.llm = ChatOllama(model=model, streaming=True, base_url=base_url)
 
+    def _generate(self, prompt: str) -> str:
+        with span("llm_completion"):
+            resp = self.llm.invoke(prompt)
+        usage = getattr(resp, "usage_metadata", None) or {}
+        record_llm_usage(self.model, usage.get("input_tokens"), usage.get("output_tokens"))
+        return resp.content
+
     def __call__(self, state: Dict[str, Any]) -> Dict[str, Any]:
         # ── 입력 꺼내기
         survey = state.get("survey_answers", {}) or {}
@@ -48,6 +64,20 @@ class FeedbackAgentNode:
         # ── 설문 분류(에겐/테토)
         sr = classify_egen_teto(survey)  # invest, consume, detail 같은 속성 제공 가정
 
+        # ── 분기: 간단 분류 모드(두 줄만)
+        # - /classify처럼 결과만 원할 때 state["mode"] == "classify" 또는 state["simple"] == True로 호출
+        # - 형식이 고정이라 템플릿으로 바로 렌더링 (LLM/RAG 호출 없음, LLM_TEMPLATES=0이면 기존처럼 생성)
+        if state.get("mode") == "classify" or state.get("simple") is True:
+            prompt = f"""{SYSTEM_CLASSIFY_ONLY}
+
+[입력]
+투자 성향: {sr.invest}
+소비 성향: {sr.consume}
+"""
+            out = llm_route.render("classify", {"invest": sr.invest, "consume": sr.consume},
+                                   lambda: self._generate(prompt))
+            return {"output": out}
+
         # ── 카드 요약 (카테고리 합계: amount 누적)
         by_cat: Dict[str, int] = {}
         for r in recs:
@@ -57,24 +87,20 @@ class FeedbackAgentNode:
 
         # ── RAG 컨텍스트
         try:
-            rag_ctx = rag_search(
-                f"{seg}에게 적합한 절세/정부지원/저축/신용·보험 팁과 주의점",
-                k=5
-            ) or ""
+            with span("rag_search"):
+                rag_ctx = rag_search(
+                    f"{seg}에게 적합한 절세/정부지원/저축/신용·보험 팁과 주의점",
+                    k=5
+                ) or ""
         except Exception:
             rag_ctx = ""
 
-        # ── 분기: 간단 분류 모드(두 줄만)
-        # - /classify처럼 결과만 원할 때 state["mode"] == "classify" 또는 state["simple"] == True로 호출
-        if state.get("mode") == "classify" or state.get("simple") is True:
-            prompt = f"""{SYSTEM_CLASSIFY_ONLY}
-
-[입력]
-투자 성향: {sr.invest}
-소비 성향: {sr.consume}
-"""
-            out = self.llm.invoke(prompt).content
-            return {"output": out}
+        # ── 섹션별 토큰 예산 적용
+        packer = PromptPacker()
+        detail_txt = packer.pack_text("detail", _compact_detail(sr.detail))
+        cards_txt = packer.pack_text("cards", json.dumps(by_cat, ensure_ascii=False))
+        rag_txt = packer.pack_text("rag", rag_ctx)
+        packer.log(" FeedbackAgentNode")
 
         # ── 기본(코치형) 프롬프트
         prompt = f"""{SYSTEM}
@@ -84,15 +110,15 @@ class FeedbackAgentNode:
 [설문 결과]
 - 투자 성향: {sr.invest}
 - 소비 성향: {sr.consume}
-- 근접 문항(참고): {json.dumps(sr.detail, ensure_ascii=False)}
+- 근접 문항(참고): {detail_txt}
 
-[카드내역 합계(카테고리:금액)] {json.dumps(by_cat, ensure_ascii=False)}
+[카드내역 합계(카테고리:금액)] {cards_txt}
 
 [내부 지식 컨텍스트]
-{rag_ctx}
+{rag_txt}
 
 위 정보를 반영하여 이번 달 소비 패턴의 핵심 이슈와 다음 달 개선 액션을 제시하세요.
 '에겐형'이면 안전/현금흐름 중심, '테토형'이면 성장/리스크관리 중심으로 톤을 조절하세요.
 """
-        out = self.llm.invoke(prompt).content
+        out = llm_route.render("coach", {}, lambda: self._generate(prompt))
         return {"output": out}
@@ -5,6 +5,7 @@ import io
 import pandas as pd
 from typing import Dict, List, Optional
 from state.schema import CardTx
+from util.memprof import mem_stage, record_df
 from datetime import datetime
 import re
 import os
@@ -87,44 +88,50 @@ def _normalize_df_to_records(df: pd.DataFrame) -> List[CardTx]:
     c_amt  = _first_existing(df, REQUIRED_COLS["amount"])
     if not all([c_date, c_mrch, c_amt]):
         raise ValueError(f"필수 컬럼(날짜/가맹점/금액) 누락. 현재 컬럼: {list(df.columns)}")
+    record_df("raw", df)
 
-    # 날짜
-    dates = []
-    for v in df[c_date].tolist():
-        dates.append(_parse_date(v))
-    df["_date"] = dates
+    with mem_stage("helper_columns"):
+        # 날짜
+        dates = []
+        for v in df[c_date].tolist():
+            dates.append(_parse_date(v))
+        df["_date"] = dates
 
-    # 금액
-    amts = []
-    for v in df[c_amt].tolist():
-        amts.append(_parse_amount(v))
-    df["_amount"] = amts
+        # 금액
+        amts = []
+        for v in df[c_amt].tolist():
+            amts.append(_parse_amount(v))
+        df["_amount"] = amts
+    record_df("with_helpers", df)
 
     # 레코드 생성 (0 금액은 스킵; 환불/입금은 음수로 남김 → 필요 시 필터)
     out: List[CardTx] = []
-    for _, r in df.iterrows():
-        ds = r["_date"]
-        if not isinstance(ds, str) or len(ds) < 8:
-            continue
-        mrch = str(r.get(c_mrch, "") or "").strip() or "미상"
-        amt = int(r["_amount"])
-        if amt == 0:
-            continue  # 0원은 제외 (원하면 포함으로 바꿔도 됨)
-        out.append(CardTx(date=ds[:10], merchant=mrch, amount=amt))
+    with mem_stage("card_records"):
+        for _, r in df.iterrows():
+            ds = r["_date"]
+            if not isinstance(ds, str) or len(ds) < 8:
+                continue
+            mrch = str(r.get(c_mrch, "") or "").strip() or "미상"
+            amt = int(r["_amount"])
+            if amt == 0:
+                continue  # 0원은 제외 (원하면 포함으로 바꿔도 됨)
+            out.append(CardTx(date=ds[:10], merchant=mrch, amount=amt))
     return out
 
 # --- 기존 CSV 함수는 유지하되, 인코딩/견고화 추가 ---
 def normalize_cards_csv(file_bytes: bytes) -> List[CardTx]:
     # utf-8 → 실패 시 cp949 재시도
-    try:
-        df = pd.read_csv(io.BytesIO(file_bytes), dtype=str, encoding="utf-8")
-    except Exception:
-        df = pd.read_csv(io.BytesIO(file_bytes), dtype=str, encoding="cp949")
+    with mem_stage("read_csv"):
+        try:
+            df = pd.read_csv(io.BytesIO(file_bytes), dtype=str, encoding="utf-8")
+        except Exception:
+            df = pd.read_csv(io.BytesIO(file_bytes), dtype=str, encoding="cp949")
     return _normalize_df_to_records(df)
 
 # --- XLSX/XLS 지원 ---
 def normalize_cards_excel(file_bytes: bytes) -> List[CardTx]:
-    df = pd.read_excel(io.BytesIO(file_bytes), dtype=str)
+    with mem_stage("read_excel"):
+        df = pd.read_excel(io.BytesIO(file_bytes), dtype=str)
     return _normalize_df_to_records(df)
 
 # --- 확장자 자동 판별 진입점 ---
@@ -11,6 +11,8 @@ from state.schema import OutputState
 # ✅ RAG util 경로 주의: 프로젝트 구조에 맞춰 조절
 # from util.rag import rag_context                # (현재 파일 기준 상위/util이면 이거)
 from util.rag import rag_context          # (예: main/chatbot/util/rag.py 인 경우)
+from util.prompt_pack import PromptPacker
+from util.metrics import record_llm_usage, span
 
 # -----------------------------------------------------------------------------
 # .env 로드 (명시 경로 → 실패 시 기본 탐색)
@@ -168,9 +170,10 @@ class ReactNode:
         # 1) 질의/페르소나
         query, persona, _ = self._build_query(egen_teto_type, analysis_result, card_history)
 
-        # 2) RAG 컨텍스트 안전 호출
+        # 2) RAG 컨텍스트 안전 호출 (토큰 예산 패킹)
+        packer = PromptPacker()
         try:
-            context = rag_context(query=query, k=6, persona=persona)
+            context = rag_context(query=query, k=6, persona=persona, packer=packer, tenant=state.get("tenant"))
         except Exception as e:
             logger.warning(f"[RAG] rag_context failed: {e}")
             context = "(RAG 컨텍스트 불러오기에 실패했습니다. 기본 지침만 활용하세요.)"
@@ -194,10 +197,15 @@ class ReactNode:
 3) 다음달 액션 3가지: 금액·비율·구체 실행 포함 (번호 목록)
 4) 추천 제도/상품(근거·주의): 제도명·적용조건·주의사항 간략 명시
 """
+        packer.log(" ReactNode")
 
         # 4) LLM 호출 (오류 내성 + 폴백 한 번 더)
         try:
-            resp = LLM.invoke(prompt)
+            with span("llm_completion"):
+                resp = LLM.invoke(prompt)
+            usage = getattr(resp, "usage_metadata", None) or {}
+            record_llm_usage(getattr(LLM, "model_name", None) or getattr(LLM, "model", "llm"),
+                             usage.get("input_tokens"), usage.get("output_tokens"))
             text = getattr(resp, "content", None) or getattr(resp, "text", None) or str(resp)
         except Exception as e:
             logger.error(f"[LLM] invoke failed: {e}")
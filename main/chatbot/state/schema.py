@@ -16,7 +16,16 @@ class OutputState(TypedDict, total=False):
     output: Any
 
 class OverallState(InputState, OutputState):
-    """OverallState is a combination of InputState and OutputState."""
+    """
+    OverallState is a combination of InputState and OutputState.
+    병렬 노드(분류 ∥ 분석)는 각자 아래 키 중 자기 것만 부분 업데이트로 반환한다.
+    """
+    user_data: Dict[str, Any]             # {"salary":..., "card_history":[...]}
+    survey_answers: Dict[int, bool]
+    egen_teto_type: str                   # EgenTetoClassifierNode
+    analysis_result: Dict[str, Any]       # AnalysisNode
+    final_feedback: str                   # ReactNode
+    tenant: str                           # KB 테넌트 (제휴 은행/상품군, 없으면 기본 KB)
 
 
 # ---------------------------------------------------------------------
@@ -67,8 +76,11 @@ class SessionState(BaseModel):
     - survey_answers: 2~10 문항 O/X 기록
     - survey_done: 설문 완료 여부
     - egen_teto_type: 최종 라벨 (없을 수 있음)
-    - cards: 업로드된 카드내역 (정규화된 표준 스키마)
+    - cards: 업로드된 카드내역 (정규화된 표준 스키마, 재업로드 시 새 거래만 누적)
+    - tx_fingerprints: cards와 같은 순서의 거래 지문 (util/tx_ingest 중복 제거용)
+    - card_amounts/card_filename: /chat 업로드를 한 번만 파싱해 둔 금액 열 (후속 요청은 재전송 불필요)
     - salary: 급여(원)
+    - age: 나이 (선택, 코호트 연령대 집계용)
     """
     model_config = ConfigDict(str_strip_whitespace=True)
 
@@ -78,7 +90,11 @@ class SessionState(BaseModel):
     egen_teto_type: Optional[PersonaLabel] = None
 
     cards: List[CardTx] = Field(default_factory=list)
+    tx_fingerprints: List[str] = Field(default_factory=list)
+    card_amounts: List[float] = Field(default_factory=list)
+    card_filename: Optional[str] = None
     salary: Optional[int] = Field(default=None, ge=0)
+    age: Optional[int] = Field(default=None, ge=0, le=120)
 
     @field_validator("survey_answers")
     @classmethod
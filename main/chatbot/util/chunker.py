@@ -0,0 +1,216 @@
+# chatbot/util/chunker.py
+"""
+구조 인식 KB 청커 (main.load_kb 용)
+- 마크다운 헤딩(#~######) 단위로 섹션을 나누고, 섹션 안에서는 줄(불릿/문단) → 문장 경계로만 자른다
+- 예산 안의 연속 섹션은 한 청크로 묶고, 큰 섹션을 나눌 때는 조각마다 헤딩을 붙여 문맥을 유지
+- 토큰 예산(KB_CHUNK_TOKENS, 기본 600)은 prompt_pack.estimate_tokens 기준
+- 완전 중복(정규화 후 해시) + 근접 중복(문자 shingle 자카드 ≥ KB_DEDUP_THRESHOLD, 기본 0.85) 제거
+"""
+import hashlib
+import os
+import re
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .prompt_pack import estimate_tokens
+
+DEFAULT_MAX_TOKENS = int(os.getenv("KB_CHUNK_TOKENS", "600"))
+DEFAULT_DEDUP_THRESHOLD = float(os.getenv("KB_DEDUP_THRESHOLD", "0.85"))
+SHINGLE = 5   # 한글은 띄어쓰기가 불규칙해서 단어 대신 문자 5-gram
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.*\S)\s*$")
+_SENT_SPLIT = re.compile(r"(?<=[\.\?\!。])\s+|(?<=다\.)(?=\S)")
+_WS = re.compile(r"\s+")
+
+@dataclass
+class ChunkStats:
+    files: int = 0
+    sections: int = 0
+    raw_chunks: int = 0
+    exact_dups: int = 0
+    near_dups: int = 0
+    kept: int = 0
+    tokens_raw: int = 0
+    tokens_kept: int = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+# -----------------------------------------------------------------------------
+# 분할
+# -----------------------------------------------------------------------------
+def split_sections(text: str) -> List[Tuple[str, List[str]]]:
+    """[(헤딩 경로, 본문 줄 목록)]. 헤딩 경로는 상위 헤딩을 ' > '로 이은 것."""
+    sections: List[Tuple[str, List[str]]] = []
+    path: List[Tuple[int, str]] = []
+    lines: List[str] = []
+
+    def flush():
+        if any(l.strip() for l in lines):
+            sections.append((" > ".join(t for _, t in path), [l for l in lines if l.strip()]))
+
+    for line in text.splitlines():
+        m = _HEADING.match(line)
+        if m:
+            flush()
+            lines = []
+            level = len(m.group(1))
+            path = [(lv, t) for lv, t in path if lv < level] + [(level, m.group(2))]
+        else:
+            lines.append(line.rstrip())
+    flush()
+    return sections
+
+def _split_long(block: str, max_tokens: int) -> List[str]:
+    """예산을 넘는 한 줄 → 문장 단위, 그래도 넘으면 글자 단위로 자른다."""
+    out, cur = [], ""
+    for sent in (s for s in _SENT_SPLIT.split(block) if s and s.strip()):
+        cand = f"{cur} {sent}".strip() if cur else sent.strip()
+        if estimate_tokens(cand) <= max_tokens:
+            cur = cand
+            continue
+        if cur:
+            out.append(cur)
+        while estimate_tokens(sent) > max_tokens:   # 문장 하나가 예산 초과 (표/URL 등)
+            step = max(len(sent) * max_tokens // max(estimate_tokens(sent), 1), 1)
+            out.append(sent[:step])
+            sent = sent[step:]
+        cur = sent.strip()
+    if cur:
+        out.append(cur)
+    return out
+
+def _split_section(prefix: str, lines: List[str], max_tokens: int) -> List[str]:
+    """예산을 넘는 섹션 하나 → 줄/문장 경계 청크 (청크마다 헤딩 접두)."""
+    budget = max(max_tokens - estimate_tokens(prefix), max_tokens // 2)
+    out: List[str] = []
+    cur: List[str] = []
+    cur_tok = 0
+    for line in lines:
+        pieces = [line] if estimate_tokens(line) <= budget else _split_long(line, budget)
+        for p in pieces:
+            t = estimate_tokens(p) + 1
+            if cur and cur_tok + t > budget:
+                out.append(prefix + "\n".join(cur))
+                cur, cur_tok = [], 0
+            cur.append(p)
+            cur_tok += t
+    if cur:
+        out.append(prefix + "\n".join(cur))
+    return out
+
+def chunk_markdown(text: str, max_tokens: int = DEFAULT_MAX_TOKENS) -> List[str]:
+    """
+    섹션 경계 우선 청킹.
+    - 예산 안에 들어가는 연속 섹션은 통째로 한 청크에 묶는다 (섹션 중간에서 자르지 않음)
+    - 예산을 넘는 섹션만 줄/문장 경계로 나누고, 조각마다 헤딩을 붙인다
+    """
+    chunks: List[str] = []
+    cur: List[str] = []
+    cur_tok = 0
+    for heading, lines in split_sections(text.strip()):
+        prefix = f"# {heading}\n" if heading else ""
+        block = prefix + "\n".join(lines)
+        t = estimate_tokens(block) + 1
+        if t > max_tokens:
+            if cur:
+                chunks.append("\n\n".join(cur))
+                cur, cur_tok = [], 0
+            chunks.extend(_split_section(prefix, lines, max_tokens))
+            continue
+        if cur and cur_tok + t > max_tokens:
+            chunks.append("\n\n".join(cur))
+            cur, cur_tok = [], 0
+        cur.append(block)
+        cur_tok += t
+    if cur:
+        chunks.append("\n\n".join(cur))
+    return chunks
+
+# -----------------------------------------------------------------------------
+# 중복 제거
+# -----------------------------------------------------------------------------
+def _normalize(text: str) -> str:
+    return _WS.sub(" ", re.sub(r"^#+\s*|^[-*]\s*", "", text, flags=re.M)).strip().lower()
+
+def shingles(text: str, n: int = SHINGLE) -> Set[int]:
+    s = _normalize(text).replace(" ", "")
+    if len(s) <= n:
+        return {hash(s)}
+    return {hash(s[i:i + n]) for i in range(len(s) - n + 1)}
+
+def jaccard(a: Set[int], b: Set[int]) -> float:
+    if not a or not b:
+        return 0.0
+    inter = len(a & b)
+    return inter / (len(a) + len(b) - inter)
+
+def dedupe(chunks: Iterable[Dict[str, Any]], threshold: float = DEFAULT_DEDUP_THRESHOLD,
+           stats: Optional[ChunkStats] = None) -> List[Dict[str, Any]]:
+    """
+    chunks: [{..., "text"}] — 입력 순서를 유지하며 먼저 나온 청크를 남긴다.
+    근접 중복은 shingle 수 비율로 자카드 상한을 먼저 걸러 비교 횟수를 줄인다.
+    """
+    stats = stats if stats is not None else ChunkStats()
+    seen_hash: Set[str] = set()
+    kept: List[Dict[str, Any]] = []
+    kept_sh: List[Set[int]] = []
+    for c in chunks:
+        h = hashlib.sha1(_normalize(c["text"]).encode("utf-8")).hexdigest()
+        if h in seen_hash:
+            stats.exact_dups += 1
+            continue
+        sh = shingles(c["text"])
+        dup = False
+        if threshold < 1.0:
+            for other in kept_sh:
+                small, big = sorted((len(sh), len(other)))
+                if big and small / big < threshold:   # |A∩B|/|A∪B| ≤ min/max
+                    continue
+                if jaccard(sh, other) >= threshold:
+                    dup = True
+                    break
+        if dup:
+            stats.near_dups += 1
+            continue
+        seen_hash.add(h)
+        kept.append(c)
+        kept_sh.append(sh)
+    return kept
+
+# -----------------------------------------------------------------------------
+# KB 전체
+# -----------------------------------------------------------------------------
+def chunk_documents(docs: Iterable[Tuple[str, str]], max_tokens: int = DEFAULT_MAX_TOKENS,
+                    threshold: float = DEFAULT_DEDUP_THRESHOLD) -> Tuple[List[Dict[str, Any]], ChunkStats]:
+    """docs: [(파일명, 원문)] → ([{id, title, text}], 통계). 중복 제거는 파일 간에도 적용."""
+    stats = ChunkStats()
+    raw: List[Dict[str, Any]] = []
+    for title, text in docs:
+        stats.files += 1
+        stats.sections += len(split_sections(text))
+        for c in chunk_markdown(text, max_tokens):
+            raw.append({"title": title, "text": c})
+    stats.raw_chunks = len(raw)
+    stats.tokens_raw = sum(estimate_tokens(c["text"]) for c in raw)
+    kept = dedupe(raw, threshold, stats)
+    for i, c in enumerate(kept):
+        c["id"] = i
+    stats.kept = len(kept)
+    stats.tokens_kept = sum(estimate_tokens(c["text"]) for c in kept)
+    return kept, stats
+
+def compare_report(baseline: List[str], chunks: List[Dict[str, Any]], dim: int = 1536,
+                   embed_batch: int = 200) -> Dict[str, Any]:
+    """기존 문자 슬라이스 청커 대비 청크 수 / 임베딩 호출 수 / 인덱스 크기(float32) 감소량."""
+    def _calls(n: int) -> int:
+        return -(-n // embed_batch) if n else 0
+    b_tok = sum(estimate_tokens(t) for t in baseline)
+    n_tok = sum(estimate_tokens(c["text"]) for c in chunks)
+    return {
+        "chunks": [len(baseline), len(chunks)],
+        "embed_tokens": [b_tok, n_tok],
+        "embed_calls": [_calls(len(baseline)), _calls(len(chunks))],
+        "index_bytes": [len(baseline) * dim * 4, len(chunks) * dim * 4],
+        "chunk_reduction": round(1 - len(chunks) / len(baseline), 3) if baseline else 0.0,
+    }
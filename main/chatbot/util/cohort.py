@@ -0,0 +1,392 @@
+# chatbot/util/cohort.py
+"""
+코호트 분석용 사전 집계 (성향 × 연령대 × 월 × 카테고리)
+- 셀 (persona, age_band, month)마다: 사용자 수, 지출 합계, 카테고리별 합계, 카테고리별 지출 비중 합
+  → "이번 달 20대 TETO 사용자의 평균 식비 비중" = 셀 조회 + 나눗셈 (사용자 수와 무관, 셀 수에만 비례)
+- 증분 갱신: 새로 적재된 거래(tx_ingest의 IngestResult.new)만 반영.
+  사용자별 (월 → 카테고리 합계)를 따로 들고 있어서, 바뀐 (사용자, 월)만 셀에서 빼고 다시 더한다
+- 성향/연령대가 바뀌면 그 사용자의 월 기여분만 옛 셀 → 새 셀로 옮긴다
+- 세션이 만료(COHORT_TTL_SEC, 기본 SESSION_TTL_SEC)·삭제·LRU로 밀려나면 그 사용자 기여분을 셀에서 뺀다
+  (만료는 갱신/조회 시 COHORT_SWEEP_SEC(60)마다 한 번 정리)
+- 카테고리/지출 정의는 AnalysisNode와 동일 (_infer_category, 양수 금액만 지출)
+- 평균 비중은 (사용자, 월) 단위 표본의 평균
+
+저장소 (COHORT_STORE=memory|postgres, 기본은 SESSION_STORE와 같게)
+- PgCohortStore: util/tx_store의 cohort_* 테이블. 모든 워커가 같은 집계를 보고 재시작해도 유지
+  갱신은 사용자 행 잠금(FOR UPDATE) + 셀 증감 upsert를 한 트랜잭션으로 (셀 키 순서로 써서 교착 방지)
+- CohortStore: 프로세스 메모리 (단일 워커 개발용 — 워커마다 부분 집계, 재시작 시 사라짐)
+"""
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from node.analysis import _infer_category
+from state.schema import CardTx
+
+PERSONAS = ("EGEN", "TETO", "NEUTRAL")
+UNKNOWN_AGE = "unknown"
+TTL = float(os.getenv("COHORT_TTL_SEC") or os.getenv("SESSION_TTL_SEC", "3600"))
+SWEEP_SEC = float(os.getenv("COHORT_SWEEP_SEC", "60"))
+
+def persona_of(label: Optional[str]) -> str:
+    """"TETO-성장 추구형" → "TETO" (없거나 모르는 값은 NEUTRAL)."""
+    head = (label or "").split("-", 1)[0].upper()
+    return head if head in PERSONAS else "NEUTRAL"
+
+def age_band(age: Optional[int]) -> str:
+    """27 → "20s". 없으면 "unknown"."""
+    if age is None or age < 0:
+        return UNKNOWN_AGE
+    return f"{min(int(age) // 10 * 10, 70)}s"
+
+Cell = Tuple[str, str, str]   # (persona, age_band, month)
+
+class _CellAgg:
+    __slots__ = ("users", "spent", "by_cat", "share_sum")
+
+    def __init__(self):
+        self.users = 0
+        self.spent = 0
+        self.by_cat: Dict[str, int] = {}
+        self.share_sum: Dict[str, float] = {}
+
+    def apply(self, cats: Dict[str, int], sign: int):
+        total = sum(cats.values())
+        if total <= 0:
+            return
+        self.users += sign
+        self.spent += sign * total
+        for c, a in cats.items():
+            self.by_cat[c] = self.by_cat.get(c, 0) + sign * a
+            self.share_sum[c] = self.share_sum.get(c, 0.0) + sign * a / total
+
+class _UserAgg:
+    __slots__ = ("persona", "age_band", "months", "expires")
+
+    def __init__(self, persona: str, band: str):
+        self.persona = persona
+        self.age_band = band
+        self.months: Dict[str, Dict[str, int]] = {}   # month → {category: 지출 합계}
+        self.expires = 0.0
+
+def _month_deltas(new_txs: Iterable[CardTx]) -> Dict[str, Dict[str, int]]:
+    """새 거래 → {month: {category: 지출 합계}} (환불/0원 제외)."""
+    delta: Dict[str, Dict[str, int]] = {}
+    for tx in new_txs:
+        a = int(tx.amount)
+        if a <= 0:
+            continue
+        cats = delta.setdefault(tx.date[:7], {})
+        cat = _infer_category(tx.merchant)
+        cats[cat] = cats.get(cat, 0) + a
+    return delta
+
+def _cell_deltas(old: Tuple[str, str], new: Tuple[str, str], months: Dict[str, Dict[str, int]],
+                 delta: Dict[str, Dict[str, int]]) -> Dict[Cell, _CellAgg]:
+    """사용자 한 명의 변경이 셀에 주는 증감. 프로필이 바뀌면 전체 월, 아니면 새 거래가 닿은 월만.
+    (비중이 바뀌므로 닿은 월은 옛 기여를 빼고 합친 값을 더한다)"""
+    out: Dict[Cell, _CellAgg] = {}
+
+    def cell(profile: Tuple[str, str], month: str) -> _CellAgg:
+        key = (profile[0], profile[1], month)
+        agg = out.get(key)
+        if agg is None:
+            agg = out[key] = _CellAgg()
+        return agg
+
+    touched = set(delta) | (set(months) if new != old else set())
+    for month in touched:
+        cats = months.get(month, {})
+        merged = dict(cats)
+        for c, a in delta.get(month, {}).items():
+            merged[c] = merged.get(c, 0) + a
+        cell(old, month).apply(cats, -1)
+        cell(new, month).apply(merged, +1)
+    return out
+
+def _removal_deltas(profile: Tuple[str, str], months: Dict[str, Dict[str, int]]) -> Dict[Cell, _CellAgg]:
+    """사용자 기여분 전체를 셀에서 빼는 증감."""
+    out: Dict[Cell, _CellAgg] = {}
+    for month, cats in months.items():
+        agg = out[(profile[0], profile[1], month)] = _CellAgg()
+        agg.apply(cats, -1)
+    return out
+
+def _result(filters: Dict[str, Any], users: int, spent: int, by_cat: Dict[str, int],
+            share_sum: Dict[str, float], category: Optional[str]) -> Dict[str, Any]:
+    cats = [category] if category else sorted((c for c in by_cat if by_cat[c]), key=lambda c: by_cat[c], reverse=True)
+    return {
+        "filters": filters,
+        "samples": users,   # (사용자, 월) 수
+        "total_spent": spent,
+        "avg_spent": round(spent / users, 2) if users else 0.0,
+        "categories": {
+            c: {
+                "total": by_cat.get(c, 0),
+                "avg_amount": round(by_cat.get(c, 0) / users, 2) if users else 0.0,
+                "avg_share": round(share_sum.get(c, 0.0) / users, 4) if users else 0.0,
+            }
+            for c in cats
+        },
+    }
+
+def _filters(persona, age_band, month, category) -> Dict[str, Any]:
+    if month in ("this", "current"):
+        month = datetime.now().strftime("%Y-%m")
+    return {"persona": persona.upper() if persona else None, "age_band": age_band, "month": month,
+            "category": category}
+
+# -----------------------------------------------------------------------------
+# 프로세스 메모리 저장소 (개발용)
+# -----------------------------------------------------------------------------
+class CohortStore:
+    def __init__(self, ttl: Optional[float] = TTL):
+        self._cells: Dict[Cell, _CellAgg] = {}
+        self._users: Dict[str, _UserAgg] = {}
+        self._lock = threading.Lock()
+        self.ttl = ttl
+        self._swept = 0.0
+        self.updated_at: Optional[float] = None
+
+    def _cell(self, key: Cell) -> _CellAgg:
+        agg = self._cells.get(key)
+        if agg is None:
+            agg = self._cells[key] = _CellAgg()
+        return agg
+
+    def _merge(self, deltas: Dict[Cell, _CellAgg]):
+        for key, d in deltas.items():
+            agg = self._cell(key)
+            agg.users += d.users
+            agg.spent += d.spent
+            for c, a in d.by_cat.items():
+                agg.by_cat[c] = agg.by_cat.get(c, 0) + a
+            for c, s in d.share_sum.items():
+                agg.share_sum[c] = agg.share_sum.get(c, 0.0) + s
+            if agg.users == 0 and agg.spent == 0:
+                del self._cells[key]
+
+    def _drop(self, user_id: str):
+        u = self._users.pop(user_id, None)
+        if u is not None:
+            self._merge(_removal_deltas((u.persona, u.age_band), u.months))
+
+    def _sweep(self, now: float):
+        if self.ttl is None or now - self._swept < SWEEP_SEC:
+            return
+        self._swept = now
+        for uid in [uid for uid, u in self._users.items() if u.expires < now]:
+            self._drop(uid)
+
+    def update(self, user_id: str, persona: Optional[str] = None, age: Optional[int] = None,
+               new_txs: Iterable[CardTx] = ()) -> None:
+        """사용자 프로필(성향/나이) 갱신 + 새 거래 반영. 바뀐 부분만 셀에 다시 계산한다."""
+        p = persona_of(persona) if persona else None
+        band = age_band(age) if age is not None else None
+        delta = _month_deltas(new_txs)
+        now = time.time()
+        with self._lock:
+            self._sweep(now)
+            u = self._users.get(user_id)
+            if u is None:
+                u = self._users[user_id] = _UserAgg(p or "NEUTRAL", band or UNKNOWN_AGE)
+            old = (u.persona, u.age_band)
+            new = (p or u.persona, band or u.age_band)
+            self._merge(_cell_deltas(old, new, u.months, delta))
+            u.persona, u.age_band = new
+            for month, add in delta.items():
+                cats = u.months.setdefault(month, {})
+                for c, a in add.items():
+                    cats[c] = cats.get(c, 0) + a
+            u.expires = now + self.ttl if self.ttl is not None else float("inf")
+            self.updated_at = now
+
+    def remove(self, user_id: str) -> None:
+        with self._lock:
+            self._drop(user_id)
+
+    def query(self, persona: Optional[str] = None, age_band: Optional[str] = None,
+              month: Optional[str] = None, category: Optional[str] = None) -> Dict[str, Any]:
+        """조건에 맞는 셀들을 합쳐 코호트 지표 반환. None이면 그 축은 전체."""
+        f = _filters(persona, age_band, month, category)
+        users = spent = 0
+        by_cat: Dict[str, int] = {}
+        share_sum: Dict[str, float] = {}
+        with self._lock:
+            self._sweep(time.time())
+            for (p, b, m), agg in self._cells.items():
+                if (f["persona"] and p != f["persona"]) or (age_band and b != age_band) or (f["month"] and m != f["month"]):
+                    continue
+                users += agg.users
+                spent += agg.spent
+                for c, a in agg.by_cat.items():
+                    by_cat[c] = by_cat.get(c, 0) + a
+                for c, s in agg.share_sum.items():
+                    share_sum[c] = share_sum.get(c, 0.0) + s
+        return _result(f, users, spent, by_cat, share_sum, category)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "memory", "size": len(self._cells), "users": len(self._users),
+                "updated_at": self.updated_at}
+
+# -----------------------------------------------------------------------------
+# Postgres 저장소 (util/tx_store의 cohort_* 테이블)
+# -----------------------------------------------------------------------------
+_UPSERT_CELL = (
+    "INSERT INTO cohort_cells (persona, age_band, month, users, spent) "
+    "VALUES (:persona, :age_band, :month, :users, :spent) "
+    "ON CONFLICT (persona, age_band, month) DO UPDATE SET "
+    "users = cohort_cells.users + excluded.users, spent = cohort_cells.spent + excluded.spent")
+_UPSERT_CAT = (
+    "INSERT INTO cohort_cell_categories (persona, age_band, month, category, total, share_sum) "
+    "VALUES (:persona, :age_band, :month, :category, :total, :share_sum) "
+    "ON CONFLICT (persona, age_band, month, category) DO UPDATE SET "
+    "total = cohort_cell_categories.total + excluded.total, "
+    "share_sum = cohort_cell_categories.share_sum + excluded.share_sum")
+_UPSERT_USER_MONTH = (
+    "INSERT INTO cohort_user_months (user_id, month, category, amount) "
+    "VALUES (:user_id, :month, :category, :amount) "
+    "ON CONFLICT (user_id, month, category) DO UPDATE SET amount = cohort_user_months.amount + excluded.amount")
+
+class PgCohortStore:
+    """db_util.engine(동기) 위의 코호트 테이블. 세션 저장소(PostgresSessionStore)와 같은 연결 풀."""
+    def __init__(self, ttl: Optional[float] = TTL):
+        # 선택 의존성: Postgres 저장소를 켤 때만 엔진/드라이버를 불러온다
+        from sqlalchemy import text
+        from util.db_util import engine
+        from util.tx_store import COHORT_TABLES
+
+        self.text = text
+        self.engine = engine
+        self.ttl = ttl
+        self._swept = 0.0
+        self._sweep_lock = threading.Lock()
+        for table in COHORT_TABLES:
+            table.create(bind=engine, checkfirst=True)
+
+    def _expires(self) -> datetime:
+        return datetime.now(timezone.utc) + timedelta(seconds=self.ttl if self.ttl is not None else 10 ** 9)
+
+    def _months(self, conn, user_id: str) -> Dict[str, Dict[str, int]]:
+        months: Dict[str, Dict[str, int]] = {}
+        rows = conn.execute(self.text(
+            "SELECT month, category, amount FROM cohort_user_months WHERE user_id = :u"), {"u": user_id})
+        for month, cat, amount in rows:
+            months.setdefault(month, {})[cat] = int(amount)
+        return months
+
+    def _apply(self, conn, deltas: Dict[Cell, _CellAgg]):
+        cells: List[Dict[str, Any]] = []
+        cats: List[Dict[str, Any]] = []
+        for (p, b, m), d in sorted(deltas.items()):      # 셀 키 순서로 잠가 동시 갱신 간 교착 방지
+            if d.users or d.spent:
+                cells.append({"persona": p, "age_band": b, "month": m, "users": d.users, "spent": d.spent})
+            for c in sorted(d.by_cat):
+                cats.append({"persona": p, "age_band": b, "month": m, "category": c,
+                             "total": d.by_cat[c], "share_sum": d.share_sum.get(c, 0.0)})
+        if cells:
+            conn.execute(self.text(_UPSERT_CELL), cells)
+        if cats:
+            conn.execute(self.text(_UPSERT_CAT), cats)
+
+    def _drop(self, conn, user_id: str, expired_before: Optional[datetime] = None) -> bool:
+        sql = "SELECT persona, age_band FROM cohort_users WHERE user_id = :u"
+        if expired_before is not None:
+            sql += " AND expires_at < :now"               # 잠그는 사이 갱신된 사용자는 건너뜀
+        row = conn.execute(self.text(sql + " FOR UPDATE"), {"u": user_id, "now": expired_before}).first()
+        if row is None:
+            return False
+        self._apply(conn, _removal_deltas((row[0], row[1]), self._months(conn, user_id)))
+        conn.execute(self.text("DELETE FROM cohort_user_months WHERE user_id = :u"), {"u": user_id})
+        conn.execute(self.text("DELETE FROM cohort_users WHERE user_id = :u"), {"u": user_id})
+        return True
+
+    def _sweep(self):
+        """만료된 사용자 기여분 정리 (프로세스당 SWEEP_SEC마다 한 번, 워커끼리는 SKIP LOCKED로 나눠 처리)."""
+        now = time.time()
+        if self.ttl is None or now - self._swept < SWEEP_SEC or not self._sweep_lock.acquire(blocking=False):
+            return
+        try:
+            self._swept = now
+            cutoff = datetime.now(timezone.utc)
+            with self.engine.connect() as conn:
+                ids = [r[0] for r in conn.execute(self.text(
+                    "SELECT user_id FROM cohort_users WHERE expires_at < :now LIMIT 500"), {"now": cutoff})]
+            for uid in ids:
+                with self.engine.begin() as conn:
+                    self._drop(conn, uid, expired_before=cutoff)
+            with self.engine.begin() as conn:
+                conn.execute(self.text("DELETE FROM cohort_cells WHERE users = 0 AND spent = 0"))
+                conn.execute(self.text("DELETE FROM cohort_cell_categories WHERE total = 0"))
+        finally:
+            self._sweep_lock.release()
+
+    def update(self, user_id: str, persona: Optional[str] = None, age: Optional[int] = None,
+               new_txs: Iterable[CardTx] = ()) -> None:
+        p = persona_of(persona) if persona else None
+        band = age_band(age) if age is not None else None
+        delta = _month_deltas(new_txs)
+        self._sweep()
+        with self.engine.begin() as conn:
+            conn.execute(self.text(
+                "INSERT INTO cohort_users (user_id, persona, age_band, expires_at) "
+                "VALUES (:u, :p, :b, :exp) ON CONFLICT (user_id) DO NOTHING"),
+                {"u": user_id, "p": p or "NEUTRAL", "b": band or UNKNOWN_AGE, "exp": self._expires()})
+            row = conn.execute(self.text(
+                "SELECT persona, age_band FROM cohort_users WHERE user_id = :u FOR UPDATE"), {"u": user_id}).first()
+            old = (row[0], row[1])
+            new = (p or old[0], band or old[1])
+            months = self._months(conn, user_id) if (delta or new != old) else {}
+            self._apply(conn, _cell_deltas(old, new, months, delta))
+            rows = [{"user_id": user_id, "month": m, "category": c, "amount": a}
+                    for m, cats in sorted(delta.items()) for c, a in sorted(cats.items())]
+            if rows:
+                conn.execute(self.text(_UPSERT_USER_MONTH), rows)
+            conn.execute(self.text(
+                "UPDATE cohort_users SET persona = :p, age_band = :b, expires_at = :exp WHERE user_id = :u"),
+                {"u": user_id, "p": new[0], "b": new[1], "exp": self._expires()})
+
+    def remove(self, user_id: str) -> None:
+        with self.engine.begin() as conn:
+            self._drop(conn, user_id)
+
+    def query(self, persona: Optional[str] = None, age_band: Optional[str] = None,
+              month: Optional[str] = None, category: Optional[str] = None) -> Dict[str, Any]:
+        f = _filters(persona, age_band, month, category)
+        self._sweep()
+        where, params = [], {}
+        for col in ("persona", "age_band", "month"):
+            if f[col]:
+                where.append(f"{col} = :{col}")
+                params[col] = f[col]
+        cond = (" WHERE " + " AND ".join(where)) if where else ""
+        with self.engine.connect() as conn:
+            users, spent = conn.execute(self.text(
+                f"SELECT COALESCE(SUM(users), 0), COALESCE(SUM(spent), 0) FROM cohort_cells{cond}"), params).one()
+            by_cat: Dict[str, int] = {}
+            share_sum: Dict[str, float] = {}
+            for cat, total, share in conn.execute(self.text(
+                    f"SELECT category, SUM(total), SUM(share_sum) FROM cohort_cell_categories{cond} "
+                    "GROUP BY category"), params):
+                by_cat[cat], share_sum[cat] = int(total), float(share)
+        return _result(f, int(users), int(spent), by_cat, share_sum, category)
+
+    def stats(self) -> Dict[str, Any]:
+        with self.engine.connect() as conn:
+            cells = conn.execute(self.text("SELECT count(*) FROM cohort_cells")).scalar()
+            users = conn.execute(self.text("SELECT count(*) FROM cohort_users")).scalar()
+        return {"backend": "postgres", "size": int(cells), "users": int(users)}
+
+_STORE = None
+_store_lock = threading.Lock()
+
+def get_cohort_store():
+    global _STORE
+    if _STORE is None:
+        with _store_lock:
+            if _STORE is None:
+                kind = os.getenv("COHORT_STORE") or os.getenv("SESSION_STORE", "memory")
+                _STORE = PgCohortStore() if kind == "postgres" else CohortStore()
+    return _STORE
@@ -0,0 +1,229 @@
+# chatbot/util/embeddings.py
+"""
+임베딩 공급자 단일 인터페이스
+- OpenAIEmbeddingProvider : text-embedding-3-small 등 (main.py KB)
+- OllamaEmbeddingProvider : bge-m3 등 로컬 올라마 (util/rag FAISS)
+- LocalEmbeddingProvider  : 텍스트 해시 기반 결정적 벡터 (오프라인 테스트/벤치마크)
+- MicroBatcher            : 수 ms 안에 동시에 들어온 단건 질의 임베딩을 한 번의 배치 호출로 합침
+- LangChainEmbeddings     : FAISS 등 LangChain 벡터스토어에 꽂기 위한 어댑터
+
+환경변수
+- EMBED_PROVIDER (main.py, 기본 openai) / RAG_EMBED_PROVIDER (util/rag, 기본 ollama)
+- EMBED_MICROBATCH_MS (기본 5, 0이면 끔: 대기 중인 질의가 있을 때만 이만큼 더 모음, 단독 질의는 즉시), EMBED_MICROBATCH_MAX (기본 64)
+"""
+import hashlib
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, List, Optional, Tuple
+
+from .metrics import record_llm_usage
+
+try:
+    from langchain_core.embeddings import Embeddings as _LCEmbeddings
+except ImportError:  # LangChain 없이도 main.py 경로는 동작
+    _LCEmbeddings = object
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingProvider:
+    name: str = "base"
+    dim: Optional[int] = None
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        raise NotImplementedError
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    name = "openai"
+
+    def __init__(self, client: Any = None, model: str = "text-embedding-3-small",
+                 batch_size: int = 200, dimensions: Optional[int] = None):
+        if client is None:
+            from openai import OpenAI
+            client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.client = client
+        self.model = model
+        self.batch_size = batch_size
+        self.dimensions = dimensions   # text-embedding-3-*: 축소 차원 지원
+        self.dim = dimensions
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        out: List[List[float]] = []
+        extra = {"dimensions": self.dimensions} if self.dimensions else {}
+        for i in range(0, len(texts), self.batch_size):
+            resp = self.client.embeddings.create(model=self.model, input=texts[i:i + self.batch_size], **extra)
+            out.extend(d.embedding for d in resp.data)
+            record_llm_usage(self.model, embedding_tokens=getattr(resp.usage, "total_tokens", 0))
+        return out
+
+
+class OllamaEmbeddingProvider(EmbeddingProvider):
+    name = "ollama"
+
+    def __init__(self, model: str = "bge-m3", base_url: Optional[str] = None):
+        from langchain_ollama import OllamaEmbeddings
+        kwargs = {"model": model}
+        if base_url:
+            kwargs["base_url"] = base_url
+        self.model = model
+        self.inner = OllamaEmbeddings(**kwargs)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.inner.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.inner.embed_query(text)
+
+
+def hash_embedding(text: str, dim: int) -> List[float]:
+    """텍스트 SHA-256으로 시드를 고정한 L2 정규화 가우시안 벡터 (같은 텍스트 → 같은 벡터)."""
+    import numpy as np
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    v = np.random.default_rng(seed).standard_normal(dim, dtype=np.float32)
+    v /= np.linalg.norm(v) or 1.0
+    return v.tolist()
+
+
+class LocalEmbeddingProvider(EmbeddingProvider):
+    name = "local"
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+        self.model = f"local-hash-{dim}"
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [hash_embedding(t, self.dim) for t in texts]
+
+
+class MicroBatcher(EmbeddingProvider):
+    """
+    embed_query 단건 호출을 큐에 모아 window_ms 안에 들어온 것끼리 한 번에 backend.embed_documents로 보낸다.
+    (여러 스레드/요청에서 동시에 부를 때 효과, 같은 텍스트는 배치 안에서 한 번만 임베딩)
+    - 꺼낸 시점에 큐에 다른 질의가 없으면 기다리지 않고 바로 보낸다 → 단독 질의에는 지연이 붙지 않음.
+      이미 대기 중인 질의가 있을 때만 최대 window_ms 동안 더 모은다
+    - backend 예외/결과 개수 불일치는 해당 배치의 미완료 Future에만 전달, 워커 스레드는 계속 돈다
+    """
+    def __init__(self, backend: EmbeddingProvider, window_ms: float = 5.0, max_batch: int = 64):
+        self.backend = backend
+        self.name = f"{backend.name}+microbatch"
+        self.dim = backend.dim
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self._q: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.backend_calls = 0
+
+    def __getattr__(self, item):
+        # model 등 backend 속성은 그대로 노출
+        return getattr(self.backend, item)
+
+    def _ensure_worker(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._loop, name="embed-microbatch", daemon=True)
+                    self._thread.start()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.backend.embed_documents(texts)  # 이미 배치 → 그대로 통과
+
+    def embed_query(self, text: str) -> List[float]:
+        self._ensure_worker()
+        fut: Future = Future()
+        self._q.put((text, fut))
+        return fut.result()
+
+    def _loop(self):
+        while True:
+            batch = [self._q.get()]
+            if not self._q.empty():
+                deadline = time.monotonic() + self.window
+                while len(batch) < self.max_batch:
+                    remain = deadline - time.monotonic()
+                    if remain <= 0:
+                        break
+                    try:
+                        batch.append(self._q.get(timeout=remain))
+                    except queue.Empty:
+                        break
+            try:
+                self._run(batch)
+            except Exception as e:   # 어떤 경우에도 워커가 죽으면 이후 embed_query가 영원히 대기
+                logger.warning(f"[embeddings] microbatch failed: {type(e).__name__}: {e}")
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+
+    def _run(self, batch: List[Tuple[str, Future]]):
+        uniq = list(dict.fromkeys(t for t, _ in batch))
+        self.queries += len(batch)
+        self.backend_calls += 1
+        vecs = self.backend.embed_documents(uniq)
+        by_text = dict(zip(uniq, vecs))
+        for t, fut in batch:
+            if t in by_text and not fut.done():
+                fut.set_result(by_text[t])
+        if len(vecs) != len(uniq):
+            err = RuntimeError(f"embedding count mismatch: {len(vecs)} for {len(uniq)} texts")
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(err)
+
+    def stats(self) -> dict:
+        return {
+            "queries": self.queries,
+            "backend_calls": self.backend_calls,
+            "avg_batch": round(self.queries / self.backend_calls, 2) if self.backend_calls else 0.0,
+        }
+
+
+class LangChainEmbeddings(_LCEmbeddings):
+    """EmbeddingProvider → LangChain Embeddings 어댑터 (FAISS.from_documents 등에 사용)."""
+    def __init__(self, provider: EmbeddingProvider):
+        self.provider = provider
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.provider.embed_documents(list(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.provider.embed_query(text)
+
+
+def get_embedding_provider(
+    kind: str,
+    *,
+    model: Optional[str] = None,
+    client: Any = None,
+    base_url: Optional[str] = None,
+    dim: Optional[int] = None,
+    dimensions: Optional[int] = None,
+    microbatch_ms: Optional[float] = None,
+) -> EmbeddingProvider:
+    kind = (kind or "openai").lower()
+    if kind == "openai":
+        provider: EmbeddingProvider = OpenAIEmbeddingProvider(
+            client=client, model=model or "text-embedding-3-small", dimensions=dimensions)
+    elif kind == "ollama":
+        provider = OllamaEmbeddingProvider(model=model or "bge-m3",
+                                           base_url=base_url or os.getenv("OLLAMA_BASE_URL"))
+    elif kind == "local":
+        provider = LocalEmbeddingProvider(dim=dim or dimensions or 384)
+    else:
+        raise ValueError(f"알 수 없는 임베딩 공급자: {kind} (openai|ollama|local)")
+
+    if microbatch_ms is None:
+        microbatch_ms = float(os.getenv("EMBED_MICROBATCH_MS", "5"))
+    if microbatch_ms > 0 and kind != "local":
+        provider = MicroBatcher(provider, window_ms=microbatch_ms,
+                                max_batch=int(os.getenv("EMBED_MICROBATCH_MAX", "64")))
+    return provider
@@ -0,0 +1,154 @@
+# chatbot/util/kb_registry.py
+"""
+테넌트(제휴 은행/상품군)별 KB 레지스트리
+- 처음 쓰일 때 loader(key)로 청크/인덱스를 적재하고, 메모리 예산(budget_mb) 안에서 상주
+- 예산을 넘으면 가장 오래 안 쓴 테넌트부터 내린다 (방금 적재한 항목은 제외)
+- 항목마다 version(원본 지문)을 기록 → 결과 캐시 키/무효화에 사용
+- fingerprint(key)를 주면 check_sec 간격으로 원본 변경을 확인해 다시 적재
+- 같은 키를 여러 스레드가 동시에 요청해도 적재는 1번만 (키별 락)
+"""
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from .metrics import record_cache, register_cache_stats, span
+
+logger = logging.getLogger(__name__)
+
+_TENANT_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.\-]{0,63}$")
+
+def tenant_dir(base_dir: str, tenant: str) -> str:
+    """테넌트 이름 검증 후 base_dir/<tenant>. 경로 탈출(../)이나 이상한 이름은 ValueError."""
+    if not tenant or not _TENANT_RE.match(tenant) or ".." in tenant:
+        raise ValueError(f"잘못된 tenant 이름: {tenant!r}")
+    return os.path.join(base_dir, tenant)
+
+def _sizeof(obj: Any) -> int:
+    n = getattr(obj, "nbytes", None)
+    return int(n() if callable(n) else n or 0)
+
+class _Entry:
+    __slots__ = ("value", "version", "nbytes", "checked_at")
+
+    def __init__(self, value: Any, version: Optional[str]):
+        self.value = value
+        self.version = version
+        self.nbytes = _sizeof(value)
+        self.checked_at = time.monotonic()
+
+class KBRegistry:
+    def __init__(self, name: str, loader: Callable[[Hashable], Any], budget_mb: float = 0,
+                 fingerprint: Optional[Callable[[Hashable], str]] = None, check_sec: float = 30.0):
+        """
+        loader(key) → 적재된 객체 (nbytes 속성이 있으면 예산 계산에 사용, version 속성이 있으면 버전으로 사용)
+        budget_mb: 0 이하면 무제한
+        """
+        self.name = name
+        self.loader = loader
+        self.budget = int(budget_mb * 1024 * 1024) if budget_mb and budget_mb > 0 else 0
+        self.fingerprint = fingerprint
+        self.check_sec = check_sec
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks: Dict[Hashable, threading.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.reloads = 0
+        register_cache_stats(name, self.stats)
+
+    def _key_lock(self, key: Hashable) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _fresh(self, key: Hashable, e: _Entry) -> bool:
+        if self.fingerprint is None or time.monotonic() - e.checked_at < self.check_sec:
+            return True
+        e.checked_at = time.monotonic()
+        try:
+            return self.fingerprint(key) == e.version
+        except OSError:
+            return True   # 원본을 잠시 못 읽으면 기존 것 유지
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            e = self._entries.get(key)
+            if e is not None:
+                self._entries.move_to_end(key)
+        if e is not None and self._fresh(key, e):
+            self.hits += 1
+            record_cache(self.name, True)
+            return e.value
+        with self._key_lock(key):
+            with self._lock:
+                cur = self._entries.get(key)
+            if cur is not None and cur is not e:          # 기다리는 동안 다른 스레드가 적재
+                self.hits += 1
+                record_cache(self.name, True)
+                return cur.value
+            self.misses += 1
+            record_cache(self.name, False)
+            if e is not None:
+                self.reloads += 1
+                logger.info(f"[{self.name}] source changed, reloading {key!r}")
+            with span(f"{self.name}_load"):
+                value = self.loader(key)
+            version = getattr(value, "version", None)
+            if version is None and self.fingerprint is not None:
+                version = self.fingerprint(key)
+            entry = _Entry(value, version)
+            with self._lock:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                self._evict_locked(keep=key)
+            return value
+
+    def _evict_locked(self, keep: Hashable):
+        if not self.budget:
+            return
+        total = sum(e.nbytes for e in self._entries.values())
+        for k in list(self._entries.keys()):
+            if total <= self.budget:
+                break
+            if k == keep:
+                continue
+            total -= self._entries.pop(k).nbytes
+            self.evictions += 1
+            logger.info(f"[{self.name}] evicted {k!r} (LRU, budget {self.budget // 2**20}MB)")
+
+    def version(self, key: Hashable) -> Optional[str]:
+        e = self._entries.get(key)
+        return e.version if e is not None else None
+
+    def invalidate(self, key: Optional[Hashable] = None,
+                   where: Optional[Callable[[Hashable], bool]] = None) -> int:
+        """key 하나, where(key)가 참인 항목들, 둘 다 없으면 전부 내린다."""
+        with self._lock:
+            keys = [key] if key is not None else [k for k in self._entries if where is None or where(k)]
+            n = sum(1 for k in keys if self._entries.pop(k, None) is not None)
+        return n
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "bytes": sum(e.nbytes for e in self._entries.values()),
+            "budget": self.budget,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+            "reloads": self.reloads,
+            "resident": {str(k): {"version": e.version, "mb": round(e.nbytes / 2**20, 2)}
+                         for k, e in self._entries.items()},
+        }
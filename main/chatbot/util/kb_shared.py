@@ -0,0 +1,105 @@
+# chatbot/util/kb_shared.py
+"""
+워커 간 KB 공유 (uvicorn --workers / gunicorn -w N)
+- 첫 워커만 파일 락을 잡고 청크(JSON) + 임베딩(.npy)을 KB_SHARED_DIR에 만든다 (임베딩 API 호출 1회)
+- 나머지 워커는 락이 풀리면 같은 파일을 np.load(mmap_mode="r")로 읽기 전용 연결
+  → 임베딩 행렬은 OS 페이지 캐시 1벌만 상주, 워커 수만큼 늘지 않음
+- 원본 지문(KB 파일 이름/크기/mtime + 임베딩 설정)이 바뀌면 다시 만든다
+- meta.json을 마지막에 원자적으로 써서, meta가 보이면 나머지 파일은 완성된 상태
+
+환경변수: KB_SHARED_DIR (비우면 끔 → 워커별 메모리 적재)
+"""
+import hashlib
+import json
+import logging
+import os
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .metrics import record_cache, span
+
+try:
+    import fcntl
+except ImportError:  # Windows: 락 없이 동작 (단일 워커 가정)
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+SHARED_DIR = os.getenv("KB_SHARED_DIR", "")
+
+@contextmanager
+def file_lock(path: str):
+    """프로세스 간 배타 락 (fcntl.flock). 같은 호스트의 워커끼리 빌드를 직렬화한다."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "a+") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+def source_fingerprint(paths: Iterable[str], **extra: Any) -> str:
+    """파일 내용을 읽지 않고 이름/크기/mtime + 설정값으로 만드는 가벼운 지문."""
+    h = hashlib.sha1()
+    for p in sorted(paths):
+        st = os.stat(p)
+        h.update(f"{os.path.basename(p)}:{st.st_size}:{st.st_mtime_ns}\n".encode())
+    h.update(json.dumps(extra, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+def _paths(name: str, shared_dir: str) -> Dict[str, str]:
+    base = os.path.join(shared_dir, name)
+    return {"chunks": base + ".chunks.json", "embs": base + ".embs.npy",
+            "meta": base + ".meta.json", "lock": base + ".lock"}
+
+def _atomic_write(path: str, write: Callable[[Any], None], mode: str = "wb"):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, mode, **({} if "b" in mode else {"encoding": "utf-8"})) as f:
+        write(f)
+    os.replace(tmp, path)
+
+def attach(name: str, fingerprint: str, shared_dir: Optional[str] = None
+           ) -> Optional[Tuple[List[Dict[str, Any]], np.ndarray]]:
+    """지문이 같은 공유 KB가 있으면 (청크, 읽기 전용 memmap 임베딩), 없으면 None."""
+    p = _paths(name, shared_dir or SHARED_DIR)
+    try:
+        with open(p["meta"], encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get("fingerprint") != fingerprint:
+        return None
+    with open(p["chunks"], encoding="utf-8") as f:
+        chunks = json.load(f)
+    embs = np.load(p["embs"], mmap_mode="r")
+    return chunks, embs
+
+def materialize(name: str, fingerprint: str,
+                build: Callable[[], Tuple[List[Dict[str, Any]], np.ndarray]],
+                shared_dir: Optional[str] = None) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+    """
+    공유 KB에 연결. 없거나 지문이 다르면 락을 잡은 워커 하나만 build()로 만들고 저장한다.
+    build: () -> (청크 목록, (n, dim) float32 정규화 임베딩)
+    """
+    shared_dir = shared_dir or SHARED_DIR
+    got = attach(name, fingerprint, shared_dir)
+    if got is None:
+        p = _paths(name, shared_dir)
+        with file_lock(p["lock"]):
+            got = attach(name, fingerprint, shared_dir)   # 락 대기 중 다른 워커가 만들었을 수 있음
+            if got is None:
+                with span("kb_shared_build"):
+                    chunks, embs = build()
+                    _atomic_write(p["chunks"], lambda f: json.dump(chunks, f, ensure_ascii=False), "w")
+                    _atomic_write(p["embs"], lambda f: np.save(f, np.ascontiguousarray(embs, dtype=np.float32)))
+                    _atomic_write(p["meta"], lambda f: json.dump(
+                        {"fingerprint": fingerprint, "n": len(chunks), "shape": list(np.shape(embs))}, f), "w")
+                logger.info(f"[kb_shared] built {name}: {len(chunks)} chunks → {shared_dir}")
+                record_cache("kb_shared", False)
+                return attach(name, fingerprint, shared_dir)
+    record_cache("kb_shared", True)
+    return got
@@ -0,0 +1,63 @@
+# chatbot/util/llm_route.py
+"""
+LLM 호출 라우팅: 형식이 고정된 응답은 템플릿으로 바로 렌더링하고, 생성이 필요한 경우만 LLM 호출
+- render(route, ctx, generate): route에 템플릿이 있으면 template(ctx), 없으면 generate()
+- 템플릿 응답은 결정적(같은 입력 → 같은 출력)이고 지연이 μs 단위
+- 피한 호출 수는 /metrics의 sasha_llm_route_total{target="template"} 및 stats()
+- LLM_TEMPLATES=0 이면 템플릿을 끄고 항상 LLM 호출 (비교/회귀 확인용)
+
+라우트
+- "persona"        : /chat mode=classify → "성향: <분류 결과>" (SYSTEM_PROMPT가 그대로 옮겨 쓰라고 고정한 첫 줄)
+- "classify"       : FeedbackAgentNode 간단 분류 모드 → 투자/소비 성향 두 줄
+- "final_feedback" : /chat 코칭 피드백, "coach": FeedbackAgentNode 코칭 — 생성 내용이라 항상 LLM (호출 수 집계용)
+"""
+import os
+import threading
+from typing import Any, Callable, Dict
+
+from .metrics import record_llm_route
+
+_TEMPLATES: Dict[str, Callable[[Dict[str, Any]], str]] = {}
+_counts: Dict[str, Dict[str, int]] = {}
+_lock = threading.Lock()
+
+def template(route: str):
+    """@template("classify") 로 고정 형식 렌더러 등록."""
+    def deco(fn: Callable[[Dict[str, Any]], str]):
+        _TEMPLATES[route] = fn
+        return fn
+    return deco
+
+def needs_llm(route: str) -> bool:
+    return route not in _TEMPLATES or os.getenv("LLM_TEMPLATES", "1") == "0"
+
+def render(route: str, ctx: Dict[str, Any], generate: Callable[[], str]) -> str:
+    used_llm = needs_llm(route)
+    out = generate() if used_llm else _TEMPLATES[route](ctx)
+    record_llm_route(route, used_llm)
+    with _lock:
+        c = _counts.setdefault(route, {"llm": 0, "template": 0})
+        c["llm" if used_llm else "template"] += 1
+    return out
+
+def stats() -> Dict[str, Any]:
+    avoided = sum(c["template"] for c in _counts.values())
+    total = avoided + sum(c["llm"] for c in _counts.values())
+    return {
+        "routes": {k: dict(v) for k, v in _counts.items()},
+        "llm_calls_avoided": avoided,
+        "avoided_rate": round(avoided / total, 4) if total else 0.0,
+    }
+
+# -----------------------------------------------------------------------------
+# 고정 형식 템플릿
+# -----------------------------------------------------------------------------
+@template("persona")
+def _persona(ctx: Dict[str, Any]) -> str:
+    """/chat 응답 형식의 '성향:' 줄. 규칙 기반 분류 결과를 그대로 쓴다."""
+    return f"성향: {ctx['egen_teto_type']}"
+
+@template("classify")
+def _classify(ctx: Dict[str, Any]) -> str:
+    """FeedbackAgentNode 간단 분류 모드: SYSTEM_CLASSIFY_ONLY가 요구하던 두 줄 그대로."""
+    return f"투자 성향: {ctx['invest']}\n소비 성향: {ctx['consume']}"
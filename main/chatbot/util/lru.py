@@ -0,0 +1,95 @@
+# chatbot/util/lru.py
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Generic, Hashable, Optional, Tuple, TypeVar
+
+V = TypeVar("V")
+
+class TTLCache(Generic[V]):
+    """
+    스레드 안전 LRU + TTL 캐시
+    - maxsize 초과 시 가장 오래 안 쓴 항목부터 제거
+    - ttl(초)이 지난 항목은 조회 시점에 만료 처리 (ttl=None이면 만료 없음)
+    - on_evict(key, value): 용량/만료로 밀려날 때 호출 (하위 저장소로 내리기 등)
+    """
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None,
+                 on_evict: Optional[Callable[[Hashable, V], None]] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.on_evict = on_evict
+        self._data: "OrderedDict[Hashable, Tuple[float, V]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _expired(self, ts: float, now: float) -> bool:
+        return self.ttl is not None and now - ts > self.ttl
+
+    def get(self, key: Hashable, default: Any = None) -> Optional[V]:
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            ts, value = item
+            if self._expired(ts, now):
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: V):
+        evicted = []
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                k, (_, v) = self._data.popitem(last=False)
+                self.evictions += 1
+                evicted.append((k, v))
+        if self.on_evict:
+            for k, v in evicted:
+                self.on_evict(k, v)
+
+    def pop(self, key: Hashable, default: Any = None) -> Optional[V]:
+        with self._lock:
+            item = self._data.pop(key, None)
+        return default if item is None else item[1]
+
+    def purge_expired(self) -> int:
+        """만료 항목 일괄 정리 (주기 작업용)."""
+        if self.ttl is None:
+            return 0
+        now = time.monotonic()
+        with self._lock:
+            dead = [k for k, (ts, _) in self._data.items() if self._expired(ts, now)]
+            for k in dead:
+                del self._data[k]
+            self.expirations += len(dead)
+        return len(dead)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
@@ -10,15 +10,35 @@ class SurveyResult:
     consume: str         # "에겐형" or "테토형"
     detail: Dict[str, List[int]]  # 각 축에서 가산된 문항 인덱스
 
-def _count_true(answers: Dict[int, Answer], keys: List[int]) -> int:
-    c = 0
-    for k in keys:
-        v = answers.get(k, "X")
-        if isinstance(v, bool):
-            c += int(v)
-        else:
-            c += int(str(v).upper() == "O")
-    return c
+# 이미지 기준 매핑
+INVEST_EGEN = [2, 7, 8, 10]
+INVEST_TETO = [3, 4, 6, 9]
+CONSUME_EGEN = [5, 10]
+CONSUME_TETO = [3, 4, 9]
+_AXES = (("invest:+에겐", INVEST_EGEN), ("invest:+테토", INVEST_TETO),
+         ("consume:+에겐", CONSUME_EGEN), ("consume:+테토", CONSUME_TETO))
+_QIDS = tuple(range(2, 11))   # 매핑에 쓰이는 문항 (O만 점수에 반영 → 2^9 조합)
+
+def _is_o(v) -> bool:
+    return v is True or (not isinstance(v, bool) and str(v).upper() == "O")
+
+def _mask(answers: Dict[int, Answer]) -> int:
+    m = 0
+    for i, q in enumerate(_QIDS):
+        if _is_o(answers.get(q, "X")):
+            m |= 1 << i
+    return m
+
+def _classify_mask(mask: int) -> Tuple[str, str, Tuple[Tuple[str, Tuple[int, ...]], ...]]:
+    on = {q for i, q in enumerate(_QIDS) if mask >> i & 1}
+    i_egen, i_teto, c_egen, c_teto = (sum(q in on for q in qs) for _, qs in _AXES)
+    invest_type = "에겐형(안정 추구)" if i_egen >= i_teto else "테토형(성장 추구)"
+    consume_type = "에겐형(안정 추구)" if c_egen >= c_teto else "테토형(성장 추구)"
+    detail = tuple((name, tuple(q for q in qs if q in on)) for name, qs in _AXES)
+    return invest_type, consume_type, detail
+
+# O/X 2^9 조합별 결과를 import 시 한 번 계산 (512개)
+_TABLE = tuple(_classify_mask(m) for m in range(1 << len(_QIDS)))
 
 def classify_egen_teto(answers: Dict[int, Answer]) -> SurveyResult:
     """
@@ -27,24 +47,6 @@ def classify_egen_teto(answers: Dict[int, Answer]) -> SurveyResult:
       1:"O", 2:"X", 3:"O", ..., 10:"X"
     }
     """
-    # 이미지 기준 매핑
-    invest_egen = [2, 7, 8, 10]
-    invest_teto = [3, 4, 6, 9]
-    consume_egen = [5, 10]
-    consume_teto = [3, 4, 9]
-
-    i_egen = _count_true(answers, invest_egen)
-    i_teto = _count_true(answers, invest_teto)
-    c_egen = _count_true(answers, consume_egen)
-    c_teto = _count_true(answers, consume_teto)
-
-    invest_type = "에겐형(안정 추구)" if i_egen >= i_teto else "테토형(성장 추구)"
-    consume_type = "에겐형(안정 추구)" if c_egen >= c_teto else "테토형(성장 추구)"
-
-    detail = {
-        "invest:+에겐": [q for q in invest_egen if str(answers.get(q, "X")).upper()=="O" or answers.get(q) is True],
-        "invest:+테토": [q for q in invest_teto if str(answers.get(q, "X")).upper()=="O" or answers.get(q) is True],
-        "consume:+에겐": [q for q in consume_egen if str(answers.get(q, "X")).upper()=="O" or answers.get(q) is True],
-        "consume:+테토": [q for q in consume_teto if str(answers.get(q, "X")).upper()=="O" or answers.get(q) is True],
-    }
-    return SurveyResult(invest=invest_type, consume=consume_type, detail=detail)
+    invest_type, consume_type, detail = _TABLE[_mask(answers)]
+    # detail 리스트는 호출 측이 수정할 수 있으므로 매번 새로 만든다
+    return SurveyResult(invest=invest_type, consume=consume_type, detail={k: list(v) for k, v in detail})
@@ -0,0 +1,153 @@
+# chatbot/util/memprof.py
+"""
+요청 단위 메모리 프로파일링 (opt-in, tracemalloc)
+- MEMPROF=1 일 때만 동작. 꺼져 있으면 mem_stage/record_df는 ContextVar 조회 1번으로 끝난다
+- MEMPROF_SAMPLE(기본 1.0): 요청 샘플링 비율. 샘플된 요청이 있는 동안에만 tracemalloc을 켠다
+- MEMPROF_PATHS(기본 /chat): 대상 경로 (쉼표 구분)
+- mem_stage("file_parse"): 단계 동안의 추가 할당 peak / 종료 시 순증가(MB)
+  peak를 리셋하기 전에 열려 있는 모든 단계(중첩·다른 스레드)에 그때까지의 peak를 접어 두므로
+  file_parse의 peak는 read_csv 등 하위 단계 구간까지 포함하고, 다른 스레드의 단계가 끝나도 지워지지 않는다
+- record_df("parsed", df): DataFrame memory_usage(deep=True) 합계와 행/열 수
+- record_bytes("upload", n): 업로드 원본 크기
+- 최근 리포트 MEMPROF_KEEP(기본 50)개를 보관 → /debug/memory, 요청마다 한 줄 로그
+
+주의: tracemalloc peak는 프로세스 전체 값이라 동시에 도는 요청/스레드의 할당도 섞인다 (과소 측정은 없음).
+/chat은 리포트가 열린 요청에서 RAG와 파일 파싱을 순서대로 돌려 단계끼리 섞이지 않게 한다.
+요청 간 섞임을 줄이려면 동시성을 낮춘 상태(또는 MEMPROF_SAMPLE 낮게)에서 본다.
+"""
+import logging
+import os
+import random
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, List, Optional
+
+try:
+    import resource  # 유닉스 전용 (ru_maxrss)
+except ImportError:
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("MEMPROF", "0") == "1"
+SAMPLE = float(os.getenv("MEMPROF_SAMPLE", "1.0"))
+KEEP = int(os.getenv("MEMPROF_KEEP", "50"))
+PATHS = tuple(p.strip() for p in os.getenv("MEMPROF_PATHS", "/chat").split(",") if p.strip())
+_MB = 1024 * 1024
+
+_report: ContextVar[Optional[Dict[str, Any]]] = ContextVar("memprof_report", default=None)
+_recent: Deque[Dict[str, Any]] = deque(maxlen=KEEP)
+_lock = threading.Lock()
+_active = 0            # tracemalloc을 필요로 하는 진행 중 요청 수
+_we_started = False    # 우리가 켠 경우에만 끈다 (PYTHONTRACEMALLOC 등 외부 설정 존중)
+_frames: List[List[int]] = []   # 프로세스 전체에서 열린 단계별 [절대 peak] (스레드 무관)
+
+def _rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / 1024, 1)   # linux: KB 단위
+
+def active() -> bool:
+    """현재 요청이 샘플되어 리포트가 열려 있는지."""
+    return _report.get() is not None
+
+def _fold_and_reset() -> tuple:
+    """(current, peak) 읽고, 열린 모든 단계에 peak를 접은 뒤 리셋. _lock 안에서 호출."""
+    cur, peak = tracemalloc.get_traced_memory()
+    for f in _frames:
+        if peak > f[0]:
+            f[0] = peak
+    tracemalloc.reset_peak()
+    return cur, peak
+
+def start_request(path: str = ""):
+    """샘플되면 리포트 컨텍스트를 열고 토큰 반환, 아니면 None."""
+    global _active, _we_started
+    if not ENABLED or path not in PATHS or random.random() >= SAMPLE:
+        return None
+    with _lock:
+        _active += 1
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _we_started = True
+    return _report.set({"path": path, "ts": time.time(), "stages": {}, "frames": {}, "bytes": {}})
+
+def end_request(token) -> Optional[Dict[str, Any]]:
+    global _active, _we_started
+    if token is None:
+        return None
+    rep = _report.get()
+    _report.reset(token)
+    with _lock:
+        _active -= 1
+        if _active == 0 and _we_started:
+            tracemalloc.stop()
+            _we_started = False
+    if rep is None:
+        return None
+    rep["rss_max_mb"] = _rss_mb()
+    _recent.append(rep)
+    if rep["stages"] or rep["frames"]:
+        stages = ", ".join(f"{k}={v['peak_mb']}MB" for k, v in rep["stages"].items())
+        frames = ", ".join(f"{k}={v['mb']}MB/{v['rows']}r" for k, v in rep["frames"].items())
+        logger.info(f"[memprof] {rep['path']} peak[{stages}] df[{frames}] rss_max={rep['rss_max_mb']}MB")
+    return rep
+
+@contextmanager
+def mem_stage(stage: str):
+    rep = _report.get()
+    if rep is None or not tracemalloc.is_tracing():
+        yield
+        return
+    with _lock:
+        cur0, _ = _fold_and_reset()             # 다른 열린 단계의 peak를 보존한 뒤 리셋
+        frame = [cur0]
+        _frames.append(frame)
+    try:
+        yield
+    finally:
+        with _lock:
+            cur1, _ = _fold_and_reset()         # frame에도 접힘 → 중간 리셋 이전 peak 포함
+            _frames.remove(frame)
+        rep["stages"][stage] = {
+            "peak_mb": round(max(frame[0] - cur0, 0) / _MB, 3),
+            "delta_mb": round((cur1 - cur0) / _MB, 3),
+        }
+
+def record_df(label: str, df) -> None:
+    rep = _report.get()
+    if rep is None or df is None:
+        return
+    try:
+        mb = float(df.memory_usage(deep=True).sum()) / _MB
+    except Exception:
+        return
+    rep["frames"][label] = {"rows": int(len(df)), "cols": int(len(df.columns)), "mb": round(mb, 3)}
+
+def record_bytes(label: str, n: int) -> None:
+    rep = _report.get()
+    if rep is not None:
+        rep["bytes"][label] = round(n / _MB, 3)
+
+def snapshot(top: int = 0) -> Dict[str, Any]:
+    """/debug/memory 응답 본문."""
+    out: Dict[str, Any] = {
+        "enabled": ENABLED,
+        "sample": SAMPLE,
+        "tracing": tracemalloc.is_tracing(),
+        "rss_max_mb": _rss_mb(),
+        "recent": list(_recent),
+    }
+    if tracemalloc.is_tracing():
+        cur, peak = tracemalloc.get_traced_memory()
+        out["traced_mb"] = {"current": round(cur / _MB, 3), "peak": round(peak / _MB, 3)}
+        if top:
+            stats = tracemalloc.take_snapshot().statistics("lineno")[:top]
+            out["top"] = [{"where": str(s.traceback), "mb": round(s.size / _MB, 3), "count": s.count}
+                          for s in stats]
+    return out
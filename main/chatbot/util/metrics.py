@@ -0,0 +1,184 @@
+# chatbot/util/metrics.py
+"""
+경량 단계별 지연 계측 + Prometheus 텍스트 노출 (외부 의존성 없음)
+- span("stage"): 구간 시간을 히스토그램에 기록하고, 요청 컨텍스트가 있으면 요청별 breakdown에도 누적
+- timed("stage"): 함수 데코레이터 버전
+- timed_node("name", node): LangGraph 노드 래퍼
+- LLM 토큰/캐시 적중 카운터, render()로 /metrics 본문 생성
+"""
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _fmt_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{str(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name, self.help = name, help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(str(labels.get(n, "")) for n in self.labelnames), 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, v in sorted(self._values.items()):
+            lines.append(f"{self.name}{_fmt_labels(self.labelnames, key)} {v}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name, self.help = name, help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key → [bucket counts..., +Inf count, sum]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            s = self._series.get(key)
+            if s is None:
+                s = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            for i, b in enumerate(self.buckets):
+                if value <= b:
+                    s[i] += 1
+            s[-2] += 1
+            s[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, s in sorted(self._series.items()):
+            for i, b in enumerate(self.buckets):
+                le = 'le="%s"' % b
+                lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, key, le)} {s[i]}")
+            inf = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, key, inf)} {s[-2]}")
+            lines.append(f"{self.name}_sum{_fmt_labels(self.labelnames, key)} {round(s[-1], 6)}")
+            lines.append(f"{self.name}_count{_fmt_labels(self.labelnames, key)} {s[-2]}")
+        return lines
+
+# -----------------------------------------------------------------------------
+# 레지스트리 & 기본 지표
+# -----------------------------------------------------------------------------
+_REGISTRY: List[Any] = []
+_CACHE_STATS: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+def _register(metric):
+    _REGISTRY.append(metric)
+    return metric
+
+STAGE_LATENCY = _register(Histogram(
+    "sasha_stage_latency_seconds", "Pipeline stage latency in seconds", ("stage",)))
+REQUEST_LATENCY = _register(Histogram(
+    "sasha_request_latency_seconds", "HTTP request latency in seconds", ("path", "status")))
+LLM_TOKENS = _register(Counter(
+    "sasha_llm_tokens_total", "LLM tokens by model and kind(prompt/completion/embedding)", ("model", "kind")))
+CACHE_REQUESTS = _register(Counter(
+    "sasha_cache_requests_total", "Cache lookups by cache name and result(hit/miss)", ("cache", "result")))
+LLM_ROUTES = _register(Counter(
+    "sasha_llm_route_total", "Responses by route and target(llm/template); template = avoided LLM call",
+    ("route", "target")))
+
+def register_cache_stats(name: str, stats_fn: Callable[[], Dict[str, Any]]):
+    """TTLCache.stats() 같은 콜백을 등록하면 /metrics에 크기/적중률 게이지로 노출."""
+    _CACHE_STATS[name] = stats_fn
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+def record_llm_usage(model: str, prompt_tokens: Optional[int] = None,
+                     completion_tokens: Optional[int] = None, embedding_tokens: Optional[int] = None):
+    if prompt_tokens:
+        LLM_TOKENS.inc(prompt_tokens, model=model, kind="prompt")
+    if completion_tokens:
+        LLM_TOKENS.inc(completion_tokens, model=model, kind="completion")
+    if embedding_tokens:
+        LLM_TOKENS.inc(embedding_tokens, model=model, kind="embedding")
+
+def record_llm_route(route: str, used_llm: bool):
+    LLM_ROUTES.inc(route=route, target="llm" if used_llm else "template")
+
+def render() -> str:
+    lines: List[str] = []
+    for m in _REGISTRY:
+        lines.extend(m.render())
+    if _CACHE_STATS:
+        lines += ["# HELP sasha_cache_size Entries held per cache", "# TYPE sasha_cache_size gauge"]
+        rates = ["# HELP sasha_cache_hit_ratio Hit ratio per cache", "# TYPE sasha_cache_hit_ratio gauge"]
+        for name, fn in sorted(_CACHE_STATS.items()):
+            try:
+                st = fn() or {}
+            except Exception:
+                continue
+            lines.append(f'sasha_cache_size{{cache="{name}"}} {st.get("size", 0)}')
+            rates.append(f'sasha_cache_hit_ratio{{cache="{name}"}} {st.get("hit_rate", 0.0)}')
+        lines += rates
+    return "\n".join(lines) + "\n"
+
+# -----------------------------------------------------------------------------
+# 요청별 단계 breakdown (contextvar → asyncio.to_thread에도 전파)
+# -----------------------------------------------------------------------------
+_breakdown: ContextVar[Optional[Dict[str, float]]] = ContextVar("stage_breakdown", default=None)
+
+def start_request():
+    return _breakdown.set({})
+
+def end_request(token) -> Dict[str, float]:
+    data = _breakdown.get() or {}
+    _breakdown.reset(token)
+    return data
+
+def current_breakdown() -> Dict[str, float]:
+    return dict(_breakdown.get() or {})
+
+@contextmanager
+def span(stage: str):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        dt = time.perf_counter() - t0
+        STAGE_LATENCY.observe(dt, stage=stage)
+        bd = _breakdown.get()
+        if bd is not None:
+            bd[stage] = bd.get(stage, 0.0) + dt
+
+def timed(stage: str):
+    def deco(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+def timed_node(name: str, node: Callable[[Dict], Any]) -> Callable[[Dict], Any]:
+    """LangGraph 노드(호출 가능 객체)를 감싸 node:<name> 구간으로 계측."""
+    def _node(state):
+        with span(f"node:{name}"):
+            return node(state)
+    _node.__name__ = name
+    return _node
+
+def server_timing(breakdown: Dict[str, float]) -> str:
+    """Server-Timing 헤더 값 (ms). 예: file_parse;dur=12.3, rag_search;dur=250.1"""
+    return ", ".join(f"{k.replace(':', '_')};dur={v * 1000:.1f}" for k, v in breakdown.items())
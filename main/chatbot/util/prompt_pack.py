@@ -0,0 +1,190 @@
+# chatbot/util/prompt_pack.py
+"""
+프롬프트 컨텍스트 패커
+- 섹션별 토큰 예산 강제 (rag / detail / cards 등)
+- 청크 간 겹침(_chunk overlap 150자) 및 완전 중복 제거
+- 예산 초과 시 점수 낮은 청크부터 제외, 마지막 청크는 문장 경계에서 절단
+- 오프라인 동작: tiktoken이 있으면 사용, 없으면 로컬 추정기로 계산
+"""
+import logging
+import math
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import tiktoken  # 선택 의존성 (없으면 추정기 사용)
+except ImportError:
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# 섹션별 기본 토큰 예산 (환경변수 PROMPT_BUDGET_<SECTION> 으로 덮어쓰기 가능)
+DEFAULT_BUDGETS: Dict[str, int] = {
+    "rag": 900,       # RAG 발췌 전체
+    "detail": 80,     # 설문 근접 문항 요약
+    "cards": 200,     # 카드 카테고리 합계
+}
+
+_HANGUL = re.compile(r"[가-힣ㄱ-ㆎ]")
+_SENT_END = re.compile(r"(?<=[\.\?\!。])\s+|\n+")
+_encoder = None
+
+def _get_encoder():
+    global _encoder
+    if _encoder is None and tiktoken is not None:
+        try:
+            _encoder = tiktoken.get_encoding("o200k_base")  # gpt-4o 계열
+        except Exception:
+            _encoder = False  # 인코딩 파일을 못 받는 오프라인 환경 → 추정기
+    return _encoder or None
+
+def estimate_tokens(text: str) -> int:
+    """토큰 수 계산. tiktoken이 없으면 한글 1자≈1토큰, 그 외 4자≈1토큰으로 추정."""
+    if not text:
+        return 0
+    enc = _get_encoder()
+    if enc is not None:
+        return len(enc.encode(text))
+    hangul = len(_HANGUL.findall(text))
+    others = len(re.sub(r"\s+", "", text)) - hangul
+    return hangul + math.ceil(max(others, 0) / 4)
+
+def budget_for(section: str) -> int:
+    env = os.getenv(f"PROMPT_BUDGET_{section.upper()}")
+    if env and env.isdigit():
+        return int(env)
+    return DEFAULT_BUDGETS.get(section, 500)
+
+def truncate_to_tokens(text: str, budget: int) -> str:
+    """예산 안으로 자르되, 가능하면 문장/줄 경계에서 끊는다."""
+    if budget <= 0:
+        return ""
+    if estimate_tokens(text) <= budget:
+        return text
+    # 이분 탐색으로 예산에 맞는 최대 길이 찾기
+    lo, hi = 0, len(text)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if estimate_tokens(text[:mid]) <= budget - 1:
+            lo = mid
+        else:
+            hi = mid - 1
+    cut = text[:lo]
+    # 절반 이상 남는 범위에서 마지막 문장 경계로 후퇴
+    bounds = [m.start() for m in _SENT_END.finditer(cut)]
+    if bounds and bounds[-1] >= len(cut) // 2:
+        cut = cut[:bounds[-1]]
+    return cut.rstrip() + "…"
+
+def _overlap_len(a: str, b: str, min_overlap: int = 20, max_overlap: int = 300) -> int:
+    """a의 꼬리와 b의 머리가 겹치는 최대 길이 (없으면 0)."""
+    upper = min(len(a), len(b), max_overlap)
+    for k in range(upper, min_overlap - 1, -1):
+        if a.endswith(b[:k]):
+            return k
+    return 0
+
+def dedupe_chunks(chunks: List[Dict[str, Any]], text_key: str = "text",
+                  group_key: str = "title") -> List[Dict[str, Any]]:
+    """
+    완전 중복 제거 + 같은 문서(title) 안에서 이웃 청크와 겹치는 앞/뒤 구간 제거.
+    입력 순서(점수 순)를 유지하며 원본 dict는 건드리지 않는다.
+    """
+    kept: List[Dict[str, Any]] = []
+    seen = set()
+    for ch in chunks:
+        text = str(ch.get(text_key, "")).strip()
+        norm = re.sub(r"\s+", " ", text)
+        if not norm or norm in seen:
+            continue
+        for prev in kept:
+            if prev.get(group_key) != ch.get(group_key):
+                continue
+            ptext = prev[text_key]
+            if text in ptext:
+                text = ""
+                break
+            k = _overlap_len(ptext, text)      # prev 꼬리 == cur 머리
+            if k:
+                text = text[k:].lstrip()
+            k = _overlap_len(text, ptext)      # cur 꼬리 == prev 머리
+            if k:
+                text = text[:-k].rstrip()
+        if len(text) < 20:  # 겹침 제거 후 남는 게 거의 없으면 버림
+            continue
+        seen.add(norm)
+        kept.append({**ch, text_key: text})
+    return kept
+
+@dataclass
+class PackStats:
+    section: str
+    tokens_before: int
+    tokens_after: int
+    dropped: int = 0
+
+    @property
+    def saved(self) -> int:
+        return max(self.tokens_before - self.tokens_after, 0)
+
+@dataclass
+class PromptPacker:
+    """요청 단위로 섹션을 패킹하고 절감량을 누적/로그한다."""
+    budgets: Dict[str, int] = field(default_factory=dict)
+    stats: List[PackStats] = field(default_factory=list)
+
+    def _budget(self, section: str) -> int:
+        return self.budgets.get(section) or budget_for(section)
+
+    def pack_chunks(
+        self,
+        section: str,
+        chunks: List[Dict[str, Any]],
+        fmt: Callable[[Dict[str, Any]], str],
+        score_key: str = "score",
+        sep: str = "\n\n",
+        budget: Optional[int] = None,
+    ) -> str:
+        budget = budget or self._budget(section)
+        before = estimate_tokens(sep.join(fmt(c) for c in chunks))
+        ranked = sorted(chunks, key=lambda c: c.get(score_key, 0.0), reverse=True)
+        ranked = dedupe_chunks(ranked)
+
+        parts: List[str] = []
+        used = 0
+        sep_tokens = estimate_tokens(sep) or 1
+        for ch in ranked:
+            piece = fmt(ch)
+            cost = estimate_tokens(piece) + (sep_tokens if parts else 0)
+            if used + cost <= budget:
+                parts.append(piece)
+                used += cost
+                continue
+            # 남은 예산이 충분하면 마지막 청크를 잘라서 넣고 종료 (나머지는 저점수라 제외)
+            remain = budget - used - (sep_tokens if parts else 0)
+            if remain >= 40:
+                parts.append(truncate_to_tokens(piece, remain))
+            break
+        out = sep.join(parts)
+        self.stats.append(PackStats(section, before, estimate_tokens(out), len(chunks) - len(parts)))
+        return out
+
+    def pack_text(self, section: str, text: str, budget: Optional[int] = None) -> str:
+        budget = budget or self._budget(section)
+        before = estimate_tokens(text)
+        out = truncate_to_tokens(text, budget)
+        self.stats.append(PackStats(section, before, estimate_tokens(out)))
+        return out
+
+    @property
+    def tokens_saved(self) -> int:
+        return sum(s.saved for s in self.stats)
+
+    def log(self, tag: str = "") -> Tuple[int, int]:
+        before = sum(s.tokens_before for s in self.stats)
+        after = sum(s.tokens_after for s in self.stats)
+        detail = ", ".join(f"{s.section}:{s.tokens_before}->{s.tokens_after}" for s in self.stats)
+        logger.info(f"[pack]{tag} tokens {before}->{after} (saved {before - after}) [{detail}]")
+        return before, after
@@ -1,21 +1,40 @@
 # chatbot/util/rag.py
+import logging
 import os
-from typing import List, Optional
+import re
+from typing import Dict, List, Optional, Tuple
 from langchain_community.document_loaders import DirectoryLoader, TextLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_community.vectorstores import FAISS
-from langchain_ollama import OllamaEmbeddings
+
+from .prompt_pack import PromptPacker
+from .metrics import record_cache, register_cache_stats, span
+from .lru import TTLCache
+from .embeddings import LangChainEmbeddings, get_embedding_provider
+from .kb_shared import SHARED_DIR, file_lock, source_fingerprint
+from .kb_registry import KBRegistry, tenant_dir
+
+logger = logging.getLogger(__name__)
 
 DEFAULT_PATH = os.path.abspath(
     os.path.join(os.path.dirname(__file__), "..", "rag_data")
 )
 
+# 저장된 FAISS 인덱스 경로: RAG_INDEX_PATH 또는 KB_SHARED_DIR/rag_faiss (둘 다 없으면 워커별 메모리 빌드)
+DEFAULT_INDEX_PATH = os.getenv("RAG_INDEX_PATH") or (os.path.join(SHARED_DIR, "rag_faiss") if SHARED_DIR else None)
+
 class RAGStore:
     def __init__(self, data_dir: str = DEFAULT_PATH, chunk_size=800, chunk_overlap=120):
         self.data_dir = os.path.abspath(data_dir)
+        self.chunk_params = [chunk_size, chunk_overlap]
         self.splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-        self.emb = OllamaEmbeddings(model="bge-m3")  # 임베딩 모델(로컬 올라마)
+        # 임베딩 모델: 기본 로컬 올라마 bge-m3 (RAG_EMBED_PROVIDER=openai|ollama|local 로 교체)
+        provider = get_embedding_provider(
+            os.getenv("RAG_EMBED_PROVIDER", "ollama"), model=os.getenv("RAG_EMBED_MODEL") or None)
+        self.emb = LangChainEmbeddings(provider)
+        self.emb_key = {"provider": os.getenv("RAG_EMBED_PROVIDER", "ollama"), "model": getattr(provider, "model", None)}
         self.vs = None
+        self.version: Optional[str] = None   # 인덱스 버전 (원본 지문) — 결과 캐시 키에 포함
 
     def build(self):
         loader = DirectoryLoader(
@@ -43,46 +62,181 @@ class RAGStore:
 
         splits = self.splitter.split_documents(docs)
         self.vs = FAISS.from_documents(splits, self.emb)
+        self.version = self._source_fingerprint()
         return self
 
+    def _source_fingerprint(self) -> str:
+        files = [os.path.join(root, fn) for root, _, fns in os.walk(self.data_dir) for fn in fns if fn.endswith(".md")]
+        return source_fingerprint(files, emb=self.emb_key, splitter=self.chunk_params)
+
     def load_or_build(self, index_path: str = None):
-        if index_path and os.path.exists(index_path):
-            self.vs = FAISS.load_local(index_path, self.emb, allow_dangerous_deserialization=True)
-        else:
-            self.build()
-            if index_path:
+        if not index_path:
+            return self.build()
+        # 여러 워커가 동시에 떠도 임베딩/빌드는 락을 잡은 워커 하나만, 나머지는 저장본을 로드
+        fp = self._source_fingerprint()
+        fp_path = os.path.join(index_path, "source.fp")
+        with file_lock(index_path.rstrip(os.sep) + ".lock"):
+            stored = None
+            if os.path.exists(fp_path):
+                with open(fp_path, encoding="utf-8") as f:
+                    stored = f.read().strip()
+            if stored == fp:
+                self.vs = FAISS.load_local(index_path, self.emb, allow_dangerous_deserialization=True)
+                self.version = fp
+            else:
+                self.build()
                 self.vs.save_local(index_path)
+                with open(fp_path, "w", encoding="utf-8") as f:
+                    f.write(fp)
+        self._mmap_index(index_path)
         return self
 
+    def _mmap_index(self, index_path: str):
+        """벡터 본체를 mmap으로 다시 붙여 워커 간 페이지 캐시 공유 (docstore 텍스트는 워커별)."""
+        try:
+            from .vector_index import read_faiss
+            self.vs.index = read_faiss(os.path.join(index_path, "index.faiss"))
+        except Exception as e:
+            # mmap 실패 시 load_local로 읽은 메모리 사본을 그대로 쓴다 (워커별 1벌)
+            logger.warning(f"[rag] mmap index load failed, using in-memory copy: {type(e).__name__}: {e}")
+
     def retriever(self, k: int = 4):
         if not self.vs:
             self.build()
         return self.vs.as_retriever(search_kwargs={"k": k})
 
-def rag_search(query: str, k: int = 4, data_dir: str = DEFAULT_PATH) -> str:
-    store = RAGStore(data_dir=data_dir).load_or_build()
+    @property
+    def nbytes(self) -> int:
+        """상주 벡터 크기 추정 (docstore 텍스트 제외) — 레지스트리 메모리 예산 계산용."""
+        index = getattr(self.vs, "index", None)
+        return int(index.ntotal * index.d * 4) if index is not None else 0
+
+# 테넌트별 원본: RAG_TENANTS_DIR/<tenant>/*.md (기본 rag_data_tenants)
+RAG_TENANTS_DIR = os.getenv("RAG_TENANTS_DIR", os.path.join(os.path.dirname(DEFAULT_PATH), "rag_data_tenants"))
+
+def _load_store(key: Tuple[str, Optional[str]]) -> RAGStore:
+    data_dir, index_path = key
+    if not os.path.isdir(data_dir):
+        raise KeyError(data_dir)
+    return RAGStore(data_dir=data_dir).load_or_build(index_path)
+
+# 프로세스 단위 스토어 캐시: (data_dir, index_path)별로 1회 빌드(또는 로드)해서 재사용,
+# RAG_STORE_BUDGET_MB(기본 0=무제한)를 넘으면 오래 안 쓴 테넌트 스토어부터 내림
+_STORES = KBRegistry("rag_store", _load_store, budget_mb=float(os.getenv("RAG_STORE_BUDGET_MB", "0")))
+
+def resolve_data_dir(data_dir: str = DEFAULT_PATH, tenant: Optional[str] = None) -> str:
+    return tenant_dir(RAG_TENANTS_DIR, tenant) if tenant else os.path.abspath(data_dir)
+
+def get_store(data_dir: str = DEFAULT_PATH, index_path: Optional[str] = None,
+              tenant: Optional[str] = None) -> RAGStore:
+    """data_dir(또는 tenant)별 RAGStore를 최초 1회 빌드(또는 로드)해서 재사용."""
+    key = resolve_data_dir(data_dir, tenant)
+    if index_path is None:
+        if key == DEFAULT_PATH:
+            index_path = DEFAULT_INDEX_PATH
+        elif SHARED_DIR:
+            index_path = os.path.join(SHARED_DIR, f"rag_faiss_{os.path.basename(key)}")
+    return _STORES.get((key, index_path))
+
+def invalidate_store(data_dir: str = DEFAULT_PATH, tenant: Optional[str] = None):
+    """원본 문서가 바뀐 뒤 호출: 스토어를 버리고 결과 캐시도 비운다 (다음 호출에서 재빌드)."""
+    key = resolve_data_dir(data_dir, tenant)
+    _STORES.invalidate(where=lambda k: k[0] == key)
+    _RESULTS.clear()
+
+# -----------------------------------------------------------------------------
+# 결과 캐시: (정규화 질의, persona, k, 인덱스 버전) → 검색 결과
+# -----------------------------------------------------------------------------
+# ReactNode 질의는 금액만 조금씩 다른 경우가 많아, 금액을 구간화한 키로 묶는다.
+# 금액으로 보는 것: 천 단위 구분기호가 있는 수, 또는 원/만/천/억이 붙은 수 ("120만원" = "1,200,000원")
+# 연도/나이/기간/금리("2024년", "만 34세", "12개월", "4.5%")는 그대로 둬서 다른 질의로 취급한다.
+# 캐시 미스일 때의 실제 검색은 원래 질의로 수행한다.
+# RAG_CACHE_MAX(512), RAG_CACHE_TTL_SEC(3600), RAG_CACHE_BUCKET=1(금액 구간화, 0이면 원문 키)
+_RESULTS: TTLCache = TTLCache(maxsize=int(os.getenv("RAG_CACHE_MAX", "512")),
+                              ttl=float(os.getenv("RAG_CACHE_TTL_SEC", "3600")))
+register_cache_stats("rag_result", _RESULTS.stats)
+
+_NUM = re.compile(r"(?<![\d.,])(\d{1,3}(?:,\d{3})+|\d+)(\.\d+)?(?:\s?(억|천만|백만|만|천))?(?:\s?(원))?")
+_UNITS = {None: 1, "천": 10 ** 3, "만": 10 ** 4, "백만": 10 ** 6, "천만": 10 ** 7, "억": 10 ** 8}
+
+def _bucket(m: "re.Match") -> str:
+    raw = m.group(0)
+    num, frac, unit, won = m.groups()
+    if "," not in num and not unit and not won:
+        return raw                                    # 단위 없는 맨 숫자: 금액이 아님
+    v = float(num.replace(",", "") + (frac or "")) * _UNITS[unit]
+    if v < 10:
+        return raw
+    mag = 10 ** (len(str(int(v))) - 2)                # 유효숫자 2자리
+    return f"{int(round(v / mag) * mag):,}원"
+
+def normalize_query(query: str) -> str:
+    q = " ".join(query.split())
+    if os.getenv("RAG_CACHE_BUCKET", "1") == "0":
+        return q
+    return _NUM.sub(_bucket, q)
+
+def _cache_key(kind: str, query: str, persona: Optional[str], k: int, store: RAGStore) -> Tuple:
+    return (kind, normalize_query(query), (persona or "").upper(), k, store.data_dir, store.version)
+
+def rag_search(query: str, k: int = 4, data_dir: str = DEFAULT_PATH, tenant: Optional[str] = None) -> str:
+    store = get_store(data_dir, tenant=tenant)
+    key = _cache_key("search", query, None, k, store)
+    cached = _RESULTS.get(key)
+    record_cache("rag_result", cached is not None)
+    if cached is not None:
+        return cached
     retriever = store.vs.as_retriever(search_kwargs={"k": k})
-    docs = retriever.invoke(query)
+    with span("rag_similarity_search"):
+        docs = retriever.invoke(query)
     # ✅ 원문 대신 '제목/요지'만
     lines = []
     for i, d in enumerate(docs, 1):
         title = d.metadata.get("source", "").split(os.sep)[-1]
         snippet = (d.page_content[:200] + "…") if len(d.page_content) > 200 else d.page_content
         lines.append(f"[{i}] {title} :: {snippet}")
-    return "RAG hits:\n" + "\n\n".join(lines)
+    out = "RAG hits:\n" + "\n\n".join(lines)
+    _RESULTS.set(key, out)
+    return out
 
-# ✅ LLM 컨텍스트용: 성향(persona) 필터 + 본문 합성
-def rag_context(query: str, persona: Optional[str] = None, k: int = 6, data_dir: str = DEFAULT_PATH) -> str:
-    store = RAGStore(data_dir=data_dir).load_or_build()
+def rag_hits(query: str, persona: Optional[str] = None, k: int = 6, data_dir: str = DEFAULT_PATH,
+             tenant: Optional[str] = None) -> List[Dict]:
+    """성향 필터를 적용한 상위 k개 청크를 {title, text, score, persona}로 반환 (score: 클수록 유사)."""
+    store = get_store(data_dir, tenant=tenant)
+    key = _cache_key("hits", query, persona, k, store)
+    cached = _RESULTS.get(key)
+    record_cache("rag_result", cached is not None)
+    if cached is not None:
+        return [dict(h) for h in cached]   # 호출 측(패커 등)이 수정해도 캐시는 그대로
     # top-많이 가져와서 간단히 필터링 (FAISS 기본 메타필터가 없어 post-filter)
-    docs = store.vs.similarity_search(query, k=16)
+    with span("rag_similarity_search"):
+        pairs = store.vs.similarity_search_with_score(query, k=16)
     if persona:
         persona = persona.upper()
-        docs = [d for d in docs if d.metadata.get("persona") in (persona, "NEUTRAL")]
-    docs = docs[:k]
-
-    parts = []
-    for d in docs:
-        src = os.path.basename(d.metadata.get("source", ""))
-        parts.append(f"[{src}] {d.page_content.strip()}")
-    return "\n\n".join(parts) if parts else "기본 가이드: 비상자금·세액공제·분산투자 원칙."
\ No newline at end of file
+        pairs = [(d, dist) for d, dist in pairs if d.metadata.get("persona") in (persona, "NEUTRAL")]
+    hits = []
+    for d, dist in pairs[:k]:
+        hits.append({
+            "title": os.path.basename(d.metadata.get("source", "")),
+            "text": d.page_content.strip(),
+            "score": 1.0 / (1.0 + float(dist)),   # L2 거리 → 유사도
+            "persona": d.metadata.get("persona"),
+        })
+    _RESULTS.set(key, [dict(h) for h in hits])
+    return hits
+
+# ✅ LLM 컨텍스트용: 성향(persona) 필터 + 본문 합성
+def rag_context(
+    query: str,
+    persona: Optional[str] = None,
+    k: int = 6,
+    data_dir: str = DEFAULT_PATH,
+    packer: Optional[PromptPacker] = None,
+    tenant: Optional[str] = None,
+) -> str:
+    hits = rag_hits(query, persona=persona, k=k, data_dir=data_dir, tenant=tenant)
+    if not hits:
+        return "기본 가이드: 비상자금·세액공제·분산투자 원칙."
+    # 토큰 예산 내로 패킹 (겹침 제거 + 저점수 우선 제외)
+    packer = packer or PromptPacker()
+    return packer.pack_chunks("rag", hits, fmt=lambda h: f"[{h['title']}] {h['text']}")
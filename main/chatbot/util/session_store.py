@@ -0,0 +1,155 @@
+# chatbot/util/session_store.py
+"""
+SessionState 서버 저장소 (session_id 키)
+- MemorySessionStore: 프로세스 내 LRU + TTL (기본)
+- PostgresSessionStore: db_util 엔진 위의 chat_sessions 테이블 (선택)
+- TieredSessionStore: 메모리 우선 조회, 미스 시 Postgres에서 끌어올림 (write-through)
+
+환경변수
+- SESSION_STORE=memory|postgres (기본 memory)
+- SESSION_TTL_SEC (기본 3600), SESSION_MAX (기본 10000)
+
+on_session_end(fn): 메모리 전용 저장소에서 세션이 LRU로 밀려나 사라질 때 fn(session_id) 호출
+(세션별 파생 집계 정리용. Tiered에선 Postgres에 남아 있으므로 호출하지 않음)
+"""
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+
+from state.schema import SessionState
+from node.egen_teto_classifier import QUESTIONS, normalize_answers
+from .lru import TTLCache
+
+
+_end_listeners: List[Callable[[str], None]] = []
+
+def on_session_end(fn: Callable[[str], None]) -> Callable[[str], None]:
+    _end_listeners.append(fn)
+    return fn
+
+def _session_ended(session_id: str, _sess: SessionState):
+    for fn in _end_listeners:
+        fn(session_id)
+
+
+class MemorySessionStore:
+    def __init__(self, maxsize: int = 10000, ttl: Optional[float] = 3600,
+                 on_evict: Optional[Callable[[str, SessionState], None]] = None):
+        self.cache: TTLCache[SessionState] = TTLCache(maxsize=maxsize, ttl=ttl, on_evict=on_evict)
+
+    def get(self, session_id: str) -> Optional[SessionState]:
+        return self.cache.get(session_id)
+
+    def put(self, sess: SessionState):
+        self.cache.set(sess.session_id, sess)
+
+    def delete(self, session_id: str):
+        self.cache.pop(session_id)
+
+    def stats(self) -> Dict:
+        return self.cache.stats()
+
+
+class PostgresSessionStore:
+    """pgvector Postgres(db_util.engine)에 세션을 JSON으로 보관. TTL은 updated_at 기준."""
+    def __init__(self, ttl: Optional[float] = 3600):
+        # 선택 의존성: Postgres 티어를 켤 때만 엔진/드라이버를 불러온다
+        from sqlalchemy import Column, DateTime, String, Text
+        from util.db_util import Base, SessionLocal, engine
+
+        class ChatSession(Base):
+            __tablename__ = "chat_sessions"
+            __table_args__ = {"extend_existing": True}
+
+            session_id = Column(String, primary_key=True)
+            payload = Column(Text, nullable=False)
+            updated_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+        self.ttl = ttl
+        self.model = ChatSession
+        self.SessionLocal = SessionLocal
+        ChatSession.__table__.create(bind=engine, checkfirst=True)
+
+    def get(self, session_id: str) -> Optional[SessionState]:
+        with self.SessionLocal() as db:
+            row = db.get(self.model, session_id)
+            if row is None:
+                return None
+            if self.ttl is not None:
+                updated = row.updated_at
+                if updated.tzinfo is None:
+                    updated = updated.replace(tzinfo=timezone.utc)
+                if datetime.now(timezone.utc) - updated > timedelta(seconds=self.ttl):
+                    db.delete(row)
+                    db.commit()
+                    return None
+            return SessionState.model_validate_json(row.payload)
+
+    def put(self, sess: SessionState):
+        with self.SessionLocal() as db:
+            db.merge(self.model(
+                session_id=sess.session_id,
+                payload=sess.model_dump_json(),
+                updated_at=datetime.now(timezone.utc),
+            ))
+            db.commit()
+
+    def delete(self, session_id: str):
+        with self.SessionLocal() as db:
+            row = db.get(self.model, session_id)
+            if row is not None:
+                db.delete(row)
+                db.commit()
+
+
+class TieredSessionStore:
+    def __init__(self, memory: MemorySessionStore, backing: PostgresSessionStore):
+        self.memory = memory
+        self.backing = backing
+
+    def get(self, session_id: str) -> Optional[SessionState]:
+        sess = self.memory.get(session_id)
+        if sess is None:
+            sess = self.backing.get(session_id)
+            if sess is not None:
+                self.memory.put(sess)
+        return sess
+
+    def put(self, sess: SessionState):
+        self.memory.put(sess)
+        self.backing.put(sess)
+
+    def delete(self, session_id: str):
+        self.memory.delete(session_id)
+        self.backing.delete(session_id)
+
+    def stats(self) -> Dict:
+        return self.memory.stats()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_session_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                ttl = float(os.getenv("SESSION_TTL_SEC", "3600"))
+                maxsize = int(os.getenv("SESSION_MAX", "10000"))
+                if os.getenv("SESSION_STORE", "memory") == "postgres":
+                    _store = TieredSessionStore(MemorySessionStore(maxsize=maxsize, ttl=ttl),
+                                                PostgresSessionStore(ttl=ttl))
+                else:
+                    _store = MemorySessionStore(maxsize=maxsize, ttl=ttl, on_evict=_session_ended)
+    return _store
+
+
+def apply_answer_delta(sess: SessionState, delta: Dict) -> SessionState:
+    """이번 요청에서 온 답변만 정규화해서 누적 (이미 저장된 답변은 다시 변환하지 않음)."""
+    for qid, ans in normalize_answers(delta).items():
+        if qid in QUESTIONS:
+            sess.survey_answers[qid] = ans
+    sess.survey_done = all(q in sess.survey_answers for q in QUESTIONS)
+    return sess
@@ -0,0 +1,54 @@
+# chatbot/util/singleflight.py
+"""
+동일 요청 합치기 (single-flight)
+- 같은 키로 진행 중인 작업이 있으면 새로 실행하지 않고 그 결과를 같이 기다린다
+- 작업은 별도 Task로 돌려서, 먼저 온 클라이언트가 연결을 끊어도 나머지 대기자는 결과를 받는다
+- 완료(성공/예외) 즉시 키를 비우므로 결과를 오래 캐시하지 않는다
+"""
+import asyncio
+import hashlib
+import json
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+from .metrics import record_cache
+
+T = TypeVar("T")
+
+class SingleFlight:
+    def __init__(self, name: str = "singleflight"):
+        self.name = name
+        self._inflight: Dict[str, "asyncio.Task"] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """(결과, 합쳐졌는지). 같은 이벤트 루프 안에서만 합쳐진다 (워커 프로세스 간 X)."""
+        task = self._inflight.get(key)
+        shared = task is not None
+        if shared:
+            self.followers += 1
+        else:
+            self.leaders += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, k=key: self._inflight.pop(k, None) if self._inflight.get(k) is t else None)
+        record_cache(self.name, shared)
+        return await asyncio.shield(task), shared
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.leaders + self.followers
+        return {
+            "size": len(self._inflight),
+            "hits": self.followers,
+            "misses": self.leaders,
+            "hit_rate": round(self.followers / total, 4) if total else 0.0,
+        }
+
+def request_key(*parts: Any, blobs: Optional[Dict[str, bytes]] = None) -> str:
+    """입력을 정규화(JSON 키 정렬)해 sha256. 파일 등 바이트는 해시만 섞는다."""
+    h = hashlib.sha256()
+    h.update(json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8"))
+    for name, blob in sorted((blobs or {}).items()):
+        h.update(name.encode("utf-8"))
+        h.update(hashlib.sha256(blob or b"").digest())
+    return h.hexdigest()
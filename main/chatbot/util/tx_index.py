@@ -0,0 +1,206 @@
+# chatbot/util/tx_index.py
+"""
+날짜 정렬 거래 인덱스 (정수 날짜 키 + 이진 탐색 구간 조회)
+- 날짜를 한 번만 파싱해 YYYYMMDD 정수 키로 만들고 키 순으로 정렬해 보관
+- 월/임의 기간 [start, end) 은 bisect 두 번으로 행 범위를 찾는다 → 나머지 이력은 보지 않음
+- 합계(지출/환불/지출 건수)는 누적합 배열로 O(log n), 가맹점/카테고리/월 분해는 구간 안 행만 순회
+- analysis(salary, start, end): AnalysisNode와 같은 analysis_result 구조
+  (날짜 파싱 실패 행은 AnalysisNode처럼 기간 필터에서 빠지지 않으므로 include_undated로 포함)
+- 같은 금액 순위는 원래 입력 순서(처음 나온 위치)로 정렬 → AnalysisNode 결과와 동일
+
+사용 예:
+    idx = TxIndex.from_history(card_history)
+    idx.analysis(salary, *month_range(2025, 10))
+    idx.totals(*last_months(3))
+"""
+from array import array
+from bisect import bisect_left
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from node.analysis import _infer_category, _parse_date, _safe_int
+
+def date_key(d) -> int:
+    """date/datetime/"YYYY-MM-DD" → 20251019."""
+    if isinstance(d, str):
+        return int(d[:4]) * 10000 + int(d[5:7]) * 100 + int(d[8:10])
+    return d.year * 10000 + d.month * 100 + d.day
+
+def month_range(year: int, month: int) -> Tuple[int, int]:
+    """그 달의 [start, end) 키."""
+    ny, nm = (year + 1, 1) if month == 12 else (year, month + 1)
+    return year * 10000 + month * 100 + 1, ny * 10000 + nm * 100 + 1
+
+def last_months(n: int, ref: Optional[date] = None) -> Tuple[int, int]:
+    """이번 달 포함 최근 n개월 [start, end)."""
+    ref = ref or date.today()
+    y, m = ref.year, ref.month - (n - 1)
+    while m < 1:
+        y, m = y - 1, m + 12
+    return month_range(y, m)[0], month_range(ref.year, ref.month)[1]
+
+def window(month: Optional[str] = None, start: Optional[str] = None, end: Optional[str] = None,
+           last: Optional[int] = None) -> Tuple[Optional[int], Optional[int]]:
+    """API 파라미터 → [start, end) 키. month="2025-10"|"this", last=최근 n개월, start/end="YYYY-MM-DD"(end 미포함).
+    형식이 틀리면 ValueError."""
+    if month:
+        if month in ("this", "current"):
+            today = date.today()
+            return month_range(today.year, today.month)
+        y, m = month.split("-")
+        if not 1 <= int(m) <= 12:
+            raise ValueError(f"invalid month: {month}")
+        return month_range(int(y), int(m))
+    if last:
+        if last < 1:
+            raise ValueError(f"invalid last: {last}")
+        return last_months(last)
+    lo = date_key(date.fromisoformat(start)) if start else None
+    hi = date_key(date.fromisoformat(end)) if end else None
+    return lo, hi
+
+def _key_of(raw) -> Optional[int]:
+    # 정규화된 "YYYY-MM-DD"는 문자열 슬라이스로, 그 외 표기는 AnalysisNode와 같은 파서로
+    s = str(raw).strip() if raw is not None else ""
+    if len(s) == 10 and s[4] == "-" and s[7] == "-" and s[:4].isdigit() and s[5:7].isdigit() and s[8:].isdigit():
+        try:
+            datetime(int(s[:4]), int(s[5:7]), int(s[8:]))
+            return int(s[:4] + s[5:7] + s[8:])
+        except ValueError:
+            pass
+    dt = _parse_date(s)
+    return date_key(dt) if dt else None
+
+class TxIndex:
+    def __init__(self, rows: List[Tuple[Optional[int], int, str, int]]):
+        """rows: (date_key|None, 원래 위치, 가맹점, 금액)."""
+        dated = sorted((r for r in rows if r[0] is not None), key=lambda r: (r[0], r[1]))
+        self.undated = [r for r in rows if r[0] is None]
+        self.keys = array("i", (r[0] for r in dated))
+        self.pos = array("i", (r[1] for r in dated))
+        self.amounts = array("q", (r[3] for r in dated))
+        self.merchants: List[str] = [r[2] for r in dated]
+        cat_of: Dict[str, str] = {}
+        self.categories: List[str] = [cat_of.get(m) or cat_of.setdefault(m, _infer_category(m))
+                                      for m in self.merchants]
+        # 누적합: [0, i) 구간의 지출 합 / 환불 합 / 지출 건수
+        self._spent = array("q", [0])
+        self._refund = array("q", [0])
+        self._n_exp = array("i", [0])
+        s = r = c = 0
+        for a in self.amounts:
+            if a > 0:
+                s += a
+                c += 1
+            elif a < 0:
+                r -= a
+            self._spent.append(s)
+            self._refund.append(r)
+            self._n_exp.append(c)
+
+    @classmethod
+    def from_history(cls, card_history: Iterable[Any]) -> "TxIndex":
+        """[{date, merchant, amount}] 또는 CardTx 목록."""
+        rows = []
+        for i, tx in enumerate(card_history):
+            if not isinstance(tx, dict):
+                tx = {"date": tx.date, "merchant": tx.merchant, "amount": tx.amount}
+            m = str(tx.get("merchant", "")).strip() or "미상"
+            rows.append((_key_of(tx.get("date")), i, m, _safe_int(tx.get("amount", 0))))
+        return cls(rows)
+
+    def __len__(self) -> int:
+        return len(self.keys) + len(self.undated)
+
+    def span(self, start: Optional[int] = None, end: Optional[int] = None) -> Tuple[int, int]:
+        """[start, end) 키 구간의 행 범위 (lo, hi)."""
+        lo = 0 if start is None else bisect_left(self.keys, start)
+        hi = len(self.keys) if end is None else bisect_left(self.keys, end)
+        return lo, max(lo, hi)
+
+    def totals(self, start: Optional[int] = None, end: Optional[int] = None) -> Dict[str, int]:
+        """지출/환불/지출 건수 (누적합 차이, 행 순회 없음)."""
+        lo, hi = self.span(start, end)
+        return {
+            "total_spent": self._spent[hi] - self._spent[lo],
+            "total_refund": self._refund[hi] - self._refund[lo],
+            "tx_count": self._n_exp[hi] - self._n_exp[lo],
+        }
+
+    def by_month(self, start: Optional[int] = None, end: Optional[int] = None) -> Dict[str, int]:
+        """월별 지출 합계: 월 경계마다 bisect + 누적합."""
+        lo, hi = self.span(start, end)
+        out: Dict[str, int] = {}
+        while lo < hi:
+            k = self.keys[lo]
+            y, m = k // 10000, k // 100 % 100
+            nxt = min(bisect_left(self.keys, month_range(y, m)[1], lo, hi), hi)
+            spent = self._spent[nxt] - self._spent[lo]
+            if spent:
+                out[f"{y:04d}-{m:02d}"] = spent
+            lo = nxt
+        return out
+
+    def analysis(self, salary: int, start: Optional[int] = None, end: Optional[int] = None,
+                 include_undated: bool = True, only_current_month: bool = False) -> Dict[str, Any]:
+        """AnalysisNode.analysis_result와 같은 구조로 [start, end) 구간 분석."""
+        lo, hi = self.span(start, end)
+        tot = self.totals(start, end)
+        merch: Dict[str, List[int]] = {}     # 가맹점 → [합계, 처음 나온 위치]
+        cats: Dict[str, List[int]] = {}
+        for i in range(lo, hi):
+            a = self.amounts[i]
+            if a <= 0:
+                continue
+            p = self.pos[i]
+            for d, k in ((merch, self.merchants[i]), (cats, self.categories[i])):
+                e = d.get(k)
+                if e is None:
+                    d[k] = [a, p]
+                else:
+                    e[0] += a
+                    if p < e[1]:
+                        e[1] = p
+        by_month = self.by_month(start, end)
+        if include_undated:
+            for _, p, m, a in self.undated:
+                if a > 0:
+                    tot["total_spent"] += a
+                    tot["tx_count"] += 1
+                    by_month["unknown"] = by_month.get("unknown", 0) + a
+                    for d, k in ((merch, m), (cats, _infer_category(m))):
+                        e = d.setdefault(k, [0, p])
+                        e[0] += a
+                        e[1] = min(e[1], p)
+                elif a < 0:
+                    tot["total_refund"] -= a
+        rank = lambda d: [(k, v[0]) for k, v in sorted(d.items(), key=lambda kv: (-kv[1][0], kv[1][1]))]
+        cat_rank = rank(cats)
+        spent, n = tot["total_spent"], tot["tx_count"]
+        return {
+            "salary": salary,
+            "total_spent": spent,
+            "total_refund": tot["total_refund"],
+            "spend_ratio": round((spent / salary) * 100, 2) if salary > 0 else 0.0,
+            "tx_count": n,
+            "avg_tx": round(spent / n, 2) if n else 0.0,
+            "top_merchants": rank(merch)[:3],
+            "category_sum": {k: v[0] for k, v in sorted(cats.items(), key=lambda kv: kv[1][1])},
+            "category_rank": cat_rank,
+            "by_month": by_month,
+            "only_current_month": only_current_month,
+        }
+
+    def month_over_month(self, ref: Optional[date] = None) -> Dict[str, Any]:
+        """이번 달 vs 지난달 합계."""
+        ref = ref or date.today()
+        cur = self.totals(*month_range(ref.year, ref.month))
+        py, pm = (ref.year - 1, 12) if ref.month == 1 else (ref.year, ref.month - 1)
+        prev = self.totals(*month_range(py, pm))
+        diff = cur["total_spent"] - prev["total_spent"]
+        return {
+            "current": cur,
+            "previous": prev,
+            "diff": diff,
+            "diff_pct": round(diff / prev["total_spent"] * 100, 2) if prev["total_spent"] else None,
+        }
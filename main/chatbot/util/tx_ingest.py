@@ -0,0 +1,163 @@
+# chatbot/util/tx_ingest.py
+"""
+카드 거래 증분 적재 (겹치는 명세서 재업로드 중복 제거)
+- 정규화된 행마다 (date, merchant, amount, occurrence) 지문을 만든다
+  occurrence: 같은 파일 안에서 동일 (date, merchant, amount)가 몇 번째인지 → 같은 날 같은 금액 2건도 보존
+- 사용자(세션)별 지문 집합에 없는 행만 추가하고, 집계(합계/월별/가맹점/카테고리)도 새 행만큼만 갱신
+- 재업로드 비용 = 파일 행 해싱 O(파일) + 새 행 처리 O(새 행). 기존 거래는 다시 훑지 않는다
+- 원장은 SessionState.cards / tx_fingerprints 에 보관(세션 저장소로 영속), 집합/집계는 프로세스 캐시
+"""
+import hashlib
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from state.schema import CardTx, SessionState
+from node.analysis import _infer_category
+from .lru import TTLCache
+from .metrics import record_cache, register_cache_stats
+
+_WS = re.compile(r"\s+")
+
+def _merchant_key(m: str) -> str:
+    return _WS.sub(" ", str(m or "")).strip().casefold()
+
+def tx_fingerprints(records: Sequence[Any]) -> List[str]:
+    """records: CardTx 또는 {date, merchant, amount} dict. 파일 내 순서대로 occurrence를 매긴다."""
+    seen: Dict[Tuple[str, str, int], int] = {}
+    out: List[str] = []
+    for r in records:
+        d, m, a = (r.date, r.merchant, r.amount) if isinstance(r, CardTx) else (r["date"], r["merchant"], r["amount"])
+        base = (str(d)[:10], _merchant_key(m), int(a))
+        occ = seen.get(base, 0)
+        seen[base] = occ + 1
+        out.append(hashlib.blake2b(f"{base[0]}|{base[1]}|{base[2]}|{occ}".encode("utf-8"), digest_size=12).hexdigest())
+    return out
+
+@dataclass
+class IngestResult:
+    added: int
+    duplicates: int
+    total: int
+    new: List[CardTx] = field(default_factory=list, repr=False)   # 이번에 추가된 거래 (집계 증분용)
+
+    def to_dict(self) -> Dict[str, int]:
+        return {"added": self.added, "duplicates": self.duplicates, "total": self.total}
+
+class TxLedger:
+    """세션 하나의 지문 집합 + 증분 집계. AnalysisNode / quick_analysis 와 같은 결과를 낸다."""
+    def __init__(self, sess: SessionState):
+        self.sess = sess
+        self.seen = set(sess.tx_fingerprints)
+        self._lock = threading.Lock()
+        self.all_sum = 0            # quick_analysis: 환불 포함 합계 / 건수
+        self.all_count = 0
+        self.spent = 0              # AnalysisNode: 지출(+)만
+        self.refund = 0
+        self.expense_count = 0
+        self.by_merchant: Dict[str, int] = {}
+        self.by_category: Dict[str, int] = {}
+        self.by_month: Dict[str, int] = {}
+        self._index = None          # 날짜 정렬 인덱스 (기간 조회 시 생성, 새 거래가 들어오면 다시)
+        for tx in sess.cards:
+            self._add(tx)
+
+    def _add(self, tx: CardTx):
+        a = int(tx.amount)
+        self.all_sum += a
+        self.all_count += 1
+        if a < 0:
+            self.refund += -a
+            return
+        if a == 0:
+            return
+        self.spent += a
+        self.expense_count += 1
+        m = tx.merchant.strip() or "미상"
+        self.by_merchant[m] = self.by_merchant.get(m, 0) + a
+        cat = _infer_category(m)
+        self.by_category[cat] = self.by_category.get(cat, 0) + a
+        month = tx.date[:7] if len(tx.date) >= 7 else "unknown"
+        self.by_month[month] = self.by_month.get(month, 0) + a
+
+    def ingest(self, records: Sequence[CardTx]) -> IngestResult:
+        fps = tx_fingerprints(records)
+        new: List[CardTx] = []
+        with self._lock:
+            for fp, tx in zip(fps, records):
+                if fp in self.seen:
+                    continue
+                self.seen.add(fp)
+                self.sess.tx_fingerprints.append(fp)
+                self.sess.cards.append(tx)
+                self._add(tx)
+                new.append(tx)
+            if new:
+                self._index = None
+        return IngestResult(added=len(new), duplicates=len(records) - len(new), total=len(self.sess.cards), new=new)
+
+    def tx_index(self):
+        """월/기간 구간 조회용 TxIndex (util/tx_index). 원장이 바뀌기 전까지 재사용."""
+        idx = self._index
+        if idx is None:
+            from .tx_index import TxIndex
+            idx = self._index = TxIndex.from_history(self.sess.cards)
+        return idx
+
+    def amounts(self) -> List[float]:
+        return [float(tx.amount) for tx in self.sess.cards]
+
+    def quick_stats(self, monthly_salary: Optional[float]) -> Dict[str, Any]:
+        """main.quick_analysis 와 같은 키/의미."""
+        mean_tx = self.all_sum / self.all_count if self.all_count else 0.0
+        rate = round(self.all_sum / monthly_salary * 100, 2) if monthly_salary and monthly_salary > 0 else None
+        return {
+            "total_spend": round(float(self.all_sum), 2),
+            "tx_count": self.all_count,
+            "mean_tx": round(mean_tx, 2),
+            "spending_rate": rate,
+        }
+
+    def analysis(self, salary: int) -> Dict[str, Any]:
+        """AnalysisNode(only_current_month=False)의 analysis_result 와 같은 구조."""
+        cat_rank = sorted(self.by_category.items(), key=lambda x: x[1], reverse=True)
+        return {
+            "salary": salary,
+            "total_spent": self.spent,
+            "total_refund": self.refund,
+            "spend_ratio": round(self.spent / salary * 100, 2) if salary > 0 else 0.0,
+            "tx_count": self.expense_count,
+            "avg_tx": round(self.spent / self.expense_count, 2) if self.expense_count else 0.0,
+            "top_merchants": sorted(self.by_merchant.items(), key=lambda x: x[1], reverse=True)[:3],
+            "category_sum": dict(self.by_category),
+            "category_rank": cat_rank,
+            "by_month": dict(self.by_month),
+            "only_current_month": False,
+        }
+
+# 세션별 원장 캐시: 미스면 세션의 cards/tx_fingerprints로 한 번 재구성
+_LEDGERS: TTLCache = TTLCache(maxsize=int(os.getenv("TX_LEDGER_MAX", "2000")),
+                              ttl=float(os.getenv("SESSION_TTL_SEC", "3600")))
+register_cache_stats("tx_ledger", _LEDGERS.stats)
+
+def ledger_for(sess: SessionState) -> TxLedger:
+    led = _LEDGERS.get(sess.session_id)
+    hit = led is not None and led.sess is sess
+    record_cache("tx_ledger", hit)
+    if not hit:
+        # 다른 워커/저장소에서 복원된 세션 객체면 그 내용으로 다시 만든다
+        led = TxLedger(sess)
+        _LEDGERS.set(sess.session_id, led)
+    return led
+
+def ingest(sess: SessionState, records: Sequence[CardTx]) -> Tuple[TxLedger, IngestResult]:
+    led = ledger_for(sess)
+    return led, led.ingest(records)
+
+def reset(sess: SessionState):
+    """원장을 비운다 (금액 열만 있는 파일로 교체 업로드한 경우 등)."""
+    sess.cards = []
+    sess.tx_fingerprints = []
+    _LEDGERS.pop(sess.session_id)
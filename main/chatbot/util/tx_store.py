@@ -0,0 +1,194 @@
+# chatbot/util/tx_store.py
+"""
+정규화된 카드 거래 / 분석 결과 저장소 (pgvector Postgres, 비동기)
+- 엔진: db_util.get_async_engine() (asyncpg + 튜닝된 풀, echo는 DB_ECHO)
+- 적재: 행 단위 ORM INSERT 대신 COPY로 임시 스테이징 테이블에 밀어 넣고
+        INSERT ... SELECT ... ON CONFLICT (user_id, fingerprint) DO NOTHING 한 번으로 반영
+        → 겹치는 명세서를 다시 올려도 새 거래만 들어감 (지문은 util/tx_ingest와 동일)
+- 인덱스: (user_id, tx_date) 기간 조회, (user_id, category) 카테고리 집계, (user_id, fingerprint) 유니크
+- analysis_results: AnalysisNode 결과(JSONB)를 사용자/기간별로 보관
+- cohort_*: 코호트 사전 집계 셀과 사용자별 기여분 (util/cohort.PgCohortStore가 증분 갱신)
+
+사용 예 (이벤트 루프 안):
+    await create_tables()
+    added = await copy_transactions("user-1", records)
+    rows = await category_totals("user-1", date(2025, 1, 1), date(2025, 2, 1))
+"""
+import json
+import logging
+from datetime import date
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import (
+    BigInteger, Column, Date, DateTime, Float, Index, Integer, PrimaryKeyConstraint, String, Table,
+    UniqueConstraint, func, select,
+)
+from sqlalchemy.dialects.postgresql import JSONB
+
+from .db_util import Base, get_async_engine
+from .metrics import span
+from .tx_ingest import tx_fingerprints
+from node.analysis import _infer_category
+from state.schema import CardTx
+
+logger = logging.getLogger(__name__)
+
+card_transactions = Table(
+    "card_transactions", Base.metadata,
+    Column("id", BigInteger, primary_key=True, autoincrement=True),
+    Column("user_id", String(64), nullable=False),
+    Column("tx_date", Date, nullable=False),
+    Column("merchant", String(200), nullable=False),
+    Column("amount", BigInteger, nullable=False),          # 원 단위(+지출, -환불)
+    Column("category", String(32), nullable=False),
+    Column("fingerprint", String(32), nullable=False),
+    UniqueConstraint("user_id", "fingerprint", name="uq_card_tx_user_fp"),
+    Index("ix_card_tx_user_date", "user_id", "tx_date"),
+    Index("ix_card_tx_user_category", "user_id", "category"),
+    extend_existing=True,
+)
+
+analysis_results = Table(
+    "analysis_results", Base.metadata,
+    Column("id", BigInteger, primary_key=True, autoincrement=True),
+    Column("user_id", String(64), nullable=False),
+    Column("period", String(16), nullable=False, server_default="all"),   # "all" | "YYYY-MM"
+    Column("result", JSONB, nullable=False),
+    Column("created_at", DateTime(timezone=True), nullable=False, server_default=func.now()),
+    Index("ix_analysis_user_created", "user_id", "created_at"),
+    extend_existing=True,
+)
+
+# 코호트 셀: (성향, 연령대, 월) 단위 사용자 수/지출 합계 + 카테고리별 합계/비중 합
+cohort_cells = Table(
+    "cohort_cells", Base.metadata,
+    Column("persona", String(16), nullable=False),
+    Column("age_band", String(16), nullable=False),
+    Column("month", String(7), nullable=False),
+    Column("users", Integer, nullable=False),          # (사용자, 월) 표본 수
+    Column("spent", BigInteger, nullable=False),
+    PrimaryKeyConstraint("persona", "age_band", "month", name="pk_cohort_cells"),
+    extend_existing=True,
+)
+
+cohort_cell_categories = Table(
+    "cohort_cell_categories", Base.metadata,
+    Column("persona", String(16), nullable=False),
+    Column("age_band", String(16), nullable=False),
+    Column("month", String(7), nullable=False),
+    Column("category", String(32), nullable=False),
+    Column("total", BigInteger, nullable=False),
+    Column("share_sum", Float, nullable=False),
+    PrimaryKeyConstraint("persona", "age_band", "month", "category", name="pk_cohort_cell_cats"),
+    extend_existing=True,
+)
+
+# 사용자(세션)별 프로필과 월×카테고리 기여분: 프로필 변경/세션 만료 시 셀에서 정확히 빼기 위해 보관
+cohort_users = Table(
+    "cohort_users", Base.metadata,
+    Column("user_id", String(64), primary_key=True),
+    Column("persona", String(16), nullable=False),
+    Column("age_band", String(16), nullable=False),
+    Column("expires_at", DateTime(timezone=True), nullable=False, index=True),
+    extend_existing=True,
+)
+
+cohort_user_months = Table(
+    "cohort_user_months", Base.metadata,
+    Column("user_id", String(64), nullable=False),
+    Column("month", String(7), nullable=False),
+    Column("category", String(32), nullable=False),
+    Column("amount", BigInteger, nullable=False),
+    PrimaryKeyConstraint("user_id", "month", "category", name="pk_cohort_user_months"),
+    extend_existing=True,
+)
+
+COHORT_TABLES = (cohort_cells, cohort_cell_categories, cohort_users, cohort_user_months)
+
+_COPY_COLS = ["user_id", "tx_date", "merchant", "amount", "category", "fingerprint"]
+_STAGE = "_card_tx_stage"
+
+async def create_tables():
+    async with get_async_engine().begin() as conn:
+        await conn.run_sync(lambda c: Base.metadata.create_all(
+            c, tables=[card_transactions, analysis_results, *COHORT_TABLES]))
+
+def _copy_rows(user_id: str, records: Sequence[CardTx]) -> List[tuple]:
+    fps = tx_fingerprints(records)
+    cats: Dict[str, str] = {}   # 가맹점 → 카테고리 (명세서엔 같은 가맹점이 반복됨)
+    rows = []
+    for fp, tx in zip(fps, records):
+        cat = cats.get(tx.merchant)
+        if cat is None:
+            cat = cats[tx.merchant] = _infer_category(tx.merchant)
+        rows.append((user_id, date.fromisoformat(tx.date), tx.merchant, int(tx.amount), cat, fp))
+    return rows
+
+async def copy_transactions(user_id: str, records: Sequence[CardTx]) -> int:
+    """COPY → 스테이징 → 중복 제외 반영. 새로 들어간 행 수 반환."""
+    if not records:
+        return 0
+    rows = _copy_rows(user_id, records)
+    async with get_async_engine().connect() as conn:
+        raw = await conn.get_raw_connection()
+        apg = raw.driver_connection            # asyncpg.Connection
+        # SQLAlchemy 어댑터는 자기 문장을 실행할 때만 트랜잭션을 열어서, 드라이버 연결에 직접 보낸 문장은
+        # 각각 autocommit 된다 → 생성/COPY/반영을 asyncpg 트랜잭션 하나로 묶는다 (스테이징은 커밋 시 삭제)
+        async with apg.transaction():
+            await apg.execute(
+                f"CREATE TEMP TABLE {_STAGE} "
+                "(user_id varchar(64), tx_date date, merchant varchar(200), amount bigint, "
+                "category varchar(32), fingerprint varchar(32)) ON COMMIT DROP")
+            with span("tx_copy"):
+                await apg.copy_records_to_table(_STAGE, records=rows, columns=_COPY_COLS)
+            with span("tx_merge"):
+                status = await apg.execute(
+                    f"INSERT INTO card_transactions ({', '.join(_COPY_COLS)}) "
+                    f"SELECT {', '.join(_COPY_COLS)} FROM {_STAGE} "
+                    "ON CONFLICT (user_id, fingerprint) DO NOTHING")
+    added = int(status.rsplit(" ", 1)[-1])    # "INSERT 0 <n>"
+    logger.info(f"[tx_store] {user_id}: copied {len(rows)} rows, added {added}")
+    return added
+
+async def transactions(user_id: str, start: Optional[date] = None, end: Optional[date] = None) -> List[Dict[str, Any]]:
+    """[start, end) 기간 거래 (ix_card_tx_user_date)."""
+    t = card_transactions.c
+    q = select(t.tx_date, t.merchant, t.amount, t.category).where(t.user_id == user_id)
+    if start is not None:
+        q = q.where(t.tx_date >= start)
+    if end is not None:
+        q = q.where(t.tx_date < end)
+    async with get_async_engine().connect() as conn:
+        res = await conn.execute(q.order_by(t.tx_date))
+        return [{"date": r.tx_date.isoformat(), "merchant": r.merchant, "amount": r.amount, "category": r.category}
+                for r in res]
+
+async def category_totals(user_id: str, start: Optional[date] = None, end: Optional[date] = None) -> Dict[str, int]:
+    """카테고리별 지출 합계 (환불 제외)."""
+    t = card_transactions.c
+    q = (select(t.category, func.sum(t.amount)).where(t.user_id == user_id, t.amount > 0)
+         .group_by(t.category))
+    if start is not None:
+        q = q.where(t.tx_date >= start)
+    if end is not None:
+        q = q.where(t.tx_date < end)
+    async with get_async_engine().connect() as conn:
+        res = await conn.execute(q)
+        return {cat: int(total) for cat, total in res}
+
+async def save_analysis(user_id: str, result: Dict[str, Any], period: str = "all") -> None:
+    async with get_async_engine().begin() as conn:
+        await conn.execute(analysis_results.insert().values(
+            user_id=user_id, period=period, result=json.loads(json.dumps(result, ensure_ascii=False, default=str))))
+
+async def latest_analysis(user_id: str, period: str = "all") -> Optional[Dict[str, Any]]:
+    t = analysis_results.c
+    q = (select(t.result).where(t.user_id == user_id, t.period == period)
+         .order_by(t.created_at.desc()).limit(1))
+    async with get_async_engine().connect() as conn:
+        return (await conn.execute(q)).scalar_one_or_none()
+
+async def delete_user(user_id: str) -> None:
+    async with get_async_engine().begin() as conn:
+        await conn.execute(card_transactions.delete().where(card_transactions.c.user_id == user_id))
+        await conn.execute(analysis_results.delete().where(analysis_results.c.user_id == user_id))
@@ -0,0 +1,201 @@
+# chatbot/util/upload_cache.py
+"""
+업로드 파일 파싱 결과 디스크 캐시 (sha256(원본 바이트) + 확장자 + 파서 버전 → Arrow IPC 파일)
+- 설문/월급만 바꿔 같은 명세서를 다시 올리면 CSV/XLSX를 다시 파싱하지 않고
+  정규화된 거래를 pyarrow.memory_map으로 바로 읽어 분석 단계로 넘어간다
+- 형식: Arrow IPC(Feather v2, 비압축) — Parquet과 달리 디코딩 없이 mmap으로 열림
+- kind별로 따로 저장: "cards"(normalize_cards 결과: date/merchant/amount), "amount"(parse_card_file의 AMOUNT 열)
+  필수 열이 없어 normalize_cards가 실패한 파일은 오류 메시지만 표시한 빈 파일로 기억 (다시 시도 X)
+- 크기 상한 UPLOAD_CACHE_MB(기본 512)를 넘으면 가장 오래 안 쓴(mtime) 파일부터 삭제. 적중 시 mtime 갱신
+- 여러 워커가 같은 디렉터리를 써도 됨: 임시 파일 → os.replace 로 원자적 교체
+- 키에 확장자를 넣는 이유: 파서가 확장자로 CSV/XLSX를 고르므로 같은 바이트라도 이름에 따라 결과가 다르다.
+  파싱/정규화 규칙을 바꾸면 PARSER_VERSION을 올려 옛 결과를 무효화 (옛 파일은 LRU로 정리됨)
+- 업로드 내용(거래 내역)이 담기므로 디렉터리는 앱 소유 0700. 다른 사용자 소유면 캐시를 끈다
+
+환경변수: UPLOAD_CACHE=0 이면 끔, UPLOAD_CACHE_DIR (기본 KB_SHARED_DIR/upload_cache 또는 $XDG_CACHE_HOME/sasha/upload_cache)
+pyarrow가 없으면 캐시 없이 매번 파싱한다.
+"""
+import hashlib
+import logging
+import os
+import threading
+from typing import Callable, List, Optional
+
+from .kb_shared import SHARED_DIR
+from .metrics import record_cache, register_cache_stats, span
+from state.schema import CardTx
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+except ImportError:  # 선택 의존성
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("UPLOAD_CACHE", "1") != "0" and pa is not None
+# 공용 /tmp 대신 앱 소유 디렉터리 (업로드한 거래 내역이 들어 있음)
+_APP_CACHE = os.path.join(os.getenv("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "sasha")
+CACHE_DIR = os.getenv("UPLOAD_CACHE_DIR") or os.path.join(SHARED_DIR or _APP_CACHE, "upload_cache")
+PARSER_VERSION = 1   # normalize_cards/parse_card_file 결과가 바뀌면 올린다
+MAX_BYTES = int(float(os.getenv("UPLOAD_CACHE_MB", "512")) * 1024 * 1024)
+_ERROR_KEY = b"error"
+
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "evictions": 0}
+_dir_ok: Optional[bool] = None
+
+def digest(raw: bytes, filename: Optional[str] = None) -> str:
+    """캐시 키: sha256(바이트).확장자.v파서버전"""
+    ext = os.path.splitext(filename or "")[1].lower().lstrip(".") or "noext"
+    return f"{hashlib.sha256(raw).hexdigest()}.{ext}.v{PARSER_VERSION}"
+
+def _ensure_dir() -> bool:
+    """캐시 디렉터리를 0700으로 준비. 다른 사용자 소유 디렉터리면 False (캐시 끔)."""
+    global _dir_ok
+    if _dir_ok is None:
+        try:
+            os.makedirs(CACHE_DIR, mode=0o700, exist_ok=True)
+            st = os.stat(CACHE_DIR)
+            if hasattr(os, "getuid") and st.st_uid != os.getuid():
+                logger.warning(f"[upload_cache] {CACHE_DIR} is owned by another user; cache disabled")
+                _dir_ok = False
+            else:
+                if st.st_mode & 0o077:
+                    os.chmod(CACHE_DIR, 0o700)   # umask/기존 디렉터리로 느슨해진 권한 조이기
+                _dir_ok = True
+        except OSError as e:
+            logger.warning(f"[upload_cache] cannot prepare {CACHE_DIR}: {e}; cache disabled")
+            _dir_ok = False
+    return _dir_ok
+
+def _path(key: str, kind: str) -> str:
+    return os.path.join(CACHE_DIR, f"{key}.{kind}.arrow")
+
+def get(key: str, kind: str) -> Optional["pa.Table"]:
+    """캐시된 테이블 (mmap, 복사 없음) 또는 None."""
+    if not ENABLED or not _ensure_dir():
+        return None
+    path = _path(key, kind)
+    try:
+        with span("upload_cache_read"):
+            table = pa_ipc.open_file(pa.memory_map(path, "r")).read_all()
+        os.utime(path)   # LRU: 최근 사용 표시
+    except (FileNotFoundError, pa.ArrowInvalid, OSError):
+        table = None
+    hit = table is not None
+    with _lock:
+        _stats["hits" if hit else "misses"] += 1
+    record_cache("upload_cache", hit)
+    return table
+
+def put(key: str, kind: str, table: "pa.Table") -> None:
+    if not ENABLED or not _ensure_dir():
+        return
+    path = _path(key, kind)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with pa.OSFile(tmp, "wb") as sink, pa_ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp, path)
+    except OSError as e:
+        logger.warning(f"[upload_cache] write failed: {e}")
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        return
+    _evict()
+
+def _evict() -> None:
+    """총 크기가 MAX_BYTES를 넘으면 mtime 오래된 순으로 삭제."""
+    entries = []
+    total = 0
+    with os.scandir(CACHE_DIR) as it:
+        for e in it:
+            if not e.name.endswith(".arrow"):
+                continue
+            try:
+                st = e.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, e.path))
+            total += st.st_size
+    if total <= MAX_BYTES:
+        return
+    for _, size, path in sorted(entries):
+        if total <= MAX_BYTES:
+            break
+        try:
+            os.remove(path)
+            total -= size
+            with _lock:
+                _stats["evictions"] += 1
+        except FileNotFoundError:
+            pass
+
+def stats() -> dict:
+    with _lock:
+        s = dict(_stats)
+    total = s["hits"] + s["misses"]
+    try:
+        files = [e for e in os.scandir(CACHE_DIR) if e.name.endswith(".arrow")]
+    except FileNotFoundError:
+        files = []
+    return {
+        **s,
+        "size": len(files),
+        "bytes": sum(e.stat().st_size for e in files),
+        "max_bytes": MAX_BYTES,
+        "hit_rate": round(s["hits"] / total, 4) if total else 0.0,
+    }
+
+register_cache_stats("upload_cache", stats)
+
+# -----------------------------------------------------------------------------
+# 파서 래퍼
+# -----------------------------------------------------------------------------
+def _error_table(msg: str) -> "pa.Table":
+    schema = pa.schema([("date", pa.string())], metadata={_ERROR_KEY: msg.encode("utf-8")})
+    return pa.table({"date": pa.array([], pa.string())}, schema=schema)
+
+def normalize_cards_cached(raw: bytes, filename: str, key: Optional[str] = None) -> List[CardTx]:
+    """normalize_cards와 같은 결과. 같은 바이트를 다시 받으면 디스크 캐시에서 읽는다 (ValueError도 재현)."""
+    from node.get_user_data import normalize_cards
+
+    if not ENABLED:
+        return normalize_cards(raw, filename)
+    key = key or digest(raw, filename)
+    table = get(key, "cards")
+    if table is not None:
+        meta = table.schema.metadata or {}
+        if _ERROR_KEY in meta:
+            raise ValueError(meta[_ERROR_KEY].decode("utf-8"))
+        # 캐시에 넣을 때 이미 검증된 값 → 재검증 없이 생성
+        return [CardTx.model_construct(date=d, merchant=m, amount=a) for d, m, a in zip(
+            table.column("date").to_pylist(), table.column("merchant").to_pylist(),
+            table.column("amount").to_pylist())]
+    try:
+        records = normalize_cards(raw, filename)
+    except ValueError as e:   # 필수 열 누락: 파일이 같으면 결과도 같으므로 기억
+        put(key, "cards", _error_table(str(e)))
+        raise
+    put(key, "cards", pa.table({
+        "date": pa.array([r.date for r in records], pa.string()),
+        "merchant": pa.array([r.merchant for r in records], pa.string()),
+        "amount": pa.array([r.amount for r in records], pa.int64()),
+    }))
+    return records
+
+def amounts_cached(raw: bytes, filename: str, parse: Callable[[bytes, str], "object"],
+                   key: Optional[str] = None) -> List[float]:
+    """parse(raw, filename) → AMOUNT 열이 있는 DataFrame. 금액 목록만 캐시한다."""
+    if not ENABLED:
+        return parse(raw, filename)["AMOUNT"].astype(float).tolist()
+    key = key or digest(raw, filename)
+    table = get(key, "amount")
+    if table is not None:
+        return table.column("AMOUNT").to_pylist()
+    amounts = parse(raw, filename)["AMOUNT"].astype(float).tolist()
+    put(key, "amount", pa.table({"AMOUNT": pa.array(amounts, pa.float64())}))
+    return amounts
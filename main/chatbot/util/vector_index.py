@@ -0,0 +1,287 @@
+# chatbot/util/vector_index.py
+"""
+main.py KB용 벡터 인덱스 (코사인 = 정규화 후 내적)
+- ExactIndex : numpy 행렬곱 전수 검색 (기본, recall 100%)
+- HNSWIndex  : faiss IndexHNSWFlat  (M / ef_construction / ef_search)
+- IVFIndex   : faiss IndexIVFFlat   (nlist / nprobe)
+- load_or_build_index: (hnsw/ivf) 임베딩 지문이 같으면 디스크에서 로드, 다르면 새로 빌드 후 저장. exact는 매번 메모리에서 빌드
+
+환경변수 (main.py)
+- KB_INDEX=exact|hnsw|ivf, KB_INDEX_PATH=<저장 경로, 비우면 메모리만>
+- KB_STORAGE=float32|float16|int8, KB_TRUNCATE_DIM(0=끔), KB_RESCORE(0=끔, n이면 k*n 후보 정확 재채점) — exact 전용
+- KB_HNSW_M(32), KB_HNSW_EF_CONSTRUCTION(200), KB_HNSW_EF_SEARCH(64)
+- KB_IVF_NLIST(0=자동 4√n), KB_IVF_NPROBE(8)
+- KB_INDEX_MMAP(1): 저장된 faiss 인덱스를 mmap으로 로드 (워커 간 공유)
+"""
+import hashlib
+import json
+import os
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+try:
+    import faiss  # env/requirements.txt의 faiss-cpu (util/rag FAISS 스토어와 공용). 없으면 exact만 사용 가능
+except ImportError:
+    faiss = None
+
+
+def as_matrix(embs) -> np.ndarray:
+    """List[List[float]] 또는 ndarray → L2 정규화된 C-연속 float32 행렬."""
+    m = np.ascontiguousarray(np.asarray(embs, dtype=np.float32))
+    if m.ndim == 1:
+        m = m[None, :]
+    norms = np.linalg.norm(m, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return m / norms
+
+def fingerprint(embs: np.ndarray) -> str:
+    h = hashlib.sha1()
+    h.update(str(embs.shape).encode())
+    h.update(np.ascontiguousarray(embs).tobytes())
+    return h.hexdigest()
+
+def _topk(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """scores: (m, n) → 행별 상위 k (점수 내림차순)."""
+    k = min(k, scores.shape[1])
+    idx = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    part = np.take_along_axis(scores, idx, axis=1)
+    order = np.argsort(-part, axis=1)
+    return np.take_along_axis(part, order, axis=1), np.take_along_axis(idx, order, axis=1)
+
+
+class ExactIndex:
+    """
+    전수 검색. storage로 상주 메모리를 줄일 수 있다.
+    - storage: float32(기본) | float16 | int8(차원별 대칭 스칼라 양자화)
+    - truncate_dim: 앞쪽 d차원만 남기고 재정규화 (text-embedding-3 계열은 앞 차원에 정보가 몰려 있음)
+    - rescore: >0이면 압축 표현으로 k*rescore개 후보를 뽑고 full(float32, np.memmap 가능)로 정확 재채점
+    """
+    kind = "exact"
+    BLOCK = 16384   # 압축 표현을 float32로 올려 계산할 때의 행 블록 (임시 메모리 상한)
+
+    def __init__(self, embs: np.ndarray, storage: str = "float32", truncate_dim: Optional[int] = None,
+                 rescore: int = 0, full: Optional[np.ndarray] = None):
+        storage = (storage or "float32").lower()
+        if storage not in ("float32", "float16", "int8"):
+            raise ValueError(f"알 수 없는 저장 형식: {storage} (float32|float16|int8)")
+        base = embs
+        if truncate_dim and truncate_dim < embs.shape[1]:
+            base = as_matrix(embs[:, :truncate_dim])
+        else:
+            truncate_dim = None
+        self.storage = storage
+        self.truncate_dim = truncate_dim
+        self.rescore = int(rescore or 0)
+        self.full = (full if full is not None else embs) if self.rescore else None
+        self.scale: Optional[np.ndarray] = None
+        if storage == "float32":
+            self.codes = base
+        elif storage == "float16":
+            self.codes = base.astype(np.float16)
+        else:
+            scale = np.abs(base).max(axis=0) / 127.0
+            scale[scale == 0] = 1.0
+            self.scale = scale.astype(np.float32)
+            self.codes = np.clip(np.rint(base / self.scale), -127, 127).astype(np.int8)
+        self.params: Dict[str, Any] = {"storage": storage, "truncate_dim": truncate_dim, "rescore": self.rescore}
+
+    @property
+    def embs(self) -> np.ndarray:
+        return self.codes
+
+    def __len__(self):
+        return self.codes.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        """상주 메모리 (memmap으로 붙인 full은 페이지 캐시라 제외)."""
+        n = self.codes.nbytes + (self.scale.nbytes if self.scale is not None else 0)
+        if self.full is not None and not isinstance(self.full, np.memmap) and self.full is not self.codes:
+            n += self.full.nbytes
+        return int(n)
+
+    def _coarse(self, qm: np.ndarray) -> np.ndarray:
+        if self.truncate_dim:
+            qm = as_matrix(qm[:, :self.truncate_dim])
+        if self.storage == "float32":
+            return qm @ self.codes.T
+        qs = qm * self.scale if self.scale is not None else qm
+        n = self.codes.shape[0]
+        out = np.empty((qm.shape[0], n), dtype=np.float32)
+        for s in range(0, n, self.BLOCK):
+            out[:, s:s + self.BLOCK] = qs @ self.codes[s:s + self.BLOCK].astype(np.float32).T
+        return out
+
+    def search(self, q, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """q: (dim,) 또는 (m, dim). 반환 (scores, ids) — 단건이면 1차원."""
+        qm = as_matrix(q)
+        if self.codes.size == 0:                              # 빈 KB: 결과 없음
+            empty = np.empty((qm.shape[0], 0), dtype=np.float32)
+            return (empty[0], empty[0].astype(np.int64)) if np.ndim(q) == 1 else (empty, empty.astype(np.int64))
+        coarse = self._coarse(qm)
+        if not self.rescore:
+            scores, ids = _topk(coarse, k)
+        else:
+            _, cand = _topk(coarse, k * self.rescore)
+            scores = np.empty((qm.shape[0], min(k, cand.shape[1])), dtype=np.float32)
+            ids = np.empty_like(scores, dtype=np.int64)
+            for i in range(qm.shape[0]):
+                rows = np.sort(cand[i])                       # memmap 순차 접근
+                exact = np.asarray(self.full[rows], dtype=np.float32) @ qm[i]
+                order = np.argsort(-exact)[:scores.shape[1]]
+                scores[i], ids[i] = exact[order], rows[order]
+        return (scores[0], ids[0]) if np.ndim(q) == 1 else (scores, ids)
+
+
+def read_faiss(path: str):
+    """
+    가능하면 mmap으로 읽어 워커 간 페이지 캐시를 공유 (faiss 버전별 지원 플래그가 달라 순서대로 시도).
+    KB_INDEX_MMAP=0 이면 일반 로드.
+    """
+    if os.getenv("KB_INDEX_MMAP", "1") != "0":
+        for flag in ("IO_FLAG_MMAP_IFC", "IO_FLAG_MMAP"):
+            if hasattr(faiss, flag):
+                try:
+                    return faiss.read_index(path, getattr(faiss, flag) | getattr(faiss, "IO_FLAG_READ_ONLY", 0))
+                except RuntimeError:
+                    continue
+    return faiss.read_index(path)
+
+
+class _FaissIndex:
+    kind = "faiss"
+
+    def __init__(self, index, params: Dict[str, Any]):
+        self.index = index
+        self.params = params
+        self._apply_search_params()
+
+    def __len__(self):
+        return self.index.ntotal
+
+    @property
+    def nbytes(self) -> int:
+        return int(faiss.serialize_index(self.index).nbytes)
+
+    def _apply_search_params(self):
+        pass
+
+    def search(self, q, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        qm = as_matrix(q)
+        scores, ids = self.index.search(qm, min(k, len(self)))
+        return (scores[0], ids[0]) if np.ndim(q) == 1 else (scores, ids)
+
+    def save(self, path: str):
+        faiss.write_index(self.index, path)
+
+    @classmethod
+    def load(cls, path: str, **params):
+        return cls(read_faiss(path), params)
+
+
+class HNSWIndex(_FaissIndex):
+    kind = "hnsw"
+
+    @classmethod
+    def build(cls, embs: np.ndarray, m: int = 32, ef_construction: int = 200, ef_search: int = 64):
+        index = faiss.IndexHNSWFlat(embs.shape[1], m, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = ef_construction
+        index.add(embs)
+        return cls(index, {"m": m, "ef_construction": ef_construction, "ef_search": ef_search})
+
+    def _apply_search_params(self):
+        self.index.hnsw.efSearch = int(self.params.get("ef_search", 64))
+
+    def set_ef_search(self, ef: int):
+        self.params["ef_search"] = ef
+        self._apply_search_params()
+
+
+class IVFIndex(_FaissIndex):
+    kind = "ivf"
+
+    @classmethod
+    def build(cls, embs: np.ndarray, nlist: int = 0, nprobe: int = 8):
+        n, dim = embs.shape
+        nlist = nlist or max(1, min(int(4 * np.sqrt(n)), n // 39 or 1))  # faiss 권장: 센트로이드당 39개 이상 학습 표본
+        quantizer = faiss.IndexFlatIP(dim)
+        index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+        index.train(embs)
+        index.add(embs)
+        return cls(index, {"nlist": nlist, "nprobe": nprobe})
+
+    def _apply_search_params(self):
+        self.index.nprobe = int(self.params.get("nprobe", 8))
+
+    def set_nprobe(self, nprobe: int):
+        self.params["nprobe"] = nprobe
+        self._apply_search_params()
+
+
+_KINDS = {"exact": ExactIndex, "hnsw": HNSWIndex, "ivf": IVFIndex}
+
+def build_index(kind: str, embs: np.ndarray, **params):
+    kind = (kind or "exact").lower()
+    if kind not in _KINDS:
+        raise ValueError(f"알 수 없는 인덱스 종류: {kind} (exact|hnsw|ivf)")
+    if kind == "exact":
+        return ExactIndex(embs, **params)
+    if faiss is None:
+        raise RuntimeError("faiss가 없습니다. `pip install faiss-cpu` 후 다시 실행하세요.")
+    return _KINDS[kind].build(embs, **params)
+
+def load_or_build_index(kind: str, embs: np.ndarray, path: Optional[str] = None, **params):
+    """
+    path가 있으면 <path>.meta.json의 지문(임베딩 해시 + 빌드 파라미터)을 비교해
+    같으면 디스크 인덱스를 로드, 다르면 새로 빌드해 저장. 검색 파라미터(ef_search/nprobe)는 지문에서 제외.
+    """
+    kind = (kind or "exact").lower()
+    if kind == "exact":
+        # 재채점용 float32 원본은 디스크에 두고 memmap으로 필요한 행만 읽는다
+        if isinstance(embs, np.memmap) and params.get("rescore"):
+            params["full"] = embs          # 이미 공유 memmap(util/kb_shared)이면 그대로 사용
+        elif path and params.get("rescore"):
+            full_path = path + ".full.npy"
+            os.makedirs(os.path.dirname(os.path.abspath(full_path)), exist_ok=True)
+            np.save(full_path, embs)
+            params["full"] = np.load(full_path, mmap_mode="r")
+        return build_index(kind, embs, **params)
+    if not path:
+        return build_index(kind, embs, **params)
+    search_keys = {"ef_search", "nprobe"}
+    build_params = {k: v for k, v in params.items() if k not in search_keys}
+    fp = {"kind": kind, "embs": fingerprint(embs), "params": build_params}
+    meta_path = path + ".meta.json"
+    if os.path.exists(path) and os.path.exists(meta_path):
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("fingerprint") == fp:
+            return _KINDS[kind].load(path, **{**meta.get("params", {}), **params})
+    index = build_index(kind, embs, **params)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    index.save(path)
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump({"fingerprint": fp, "params": index.params}, f, ensure_ascii=False)
+    return index
+
+def index_params_from_env(kind: str) -> Dict[str, Any]:
+    kind = (kind or "exact").lower()
+    if kind == "exact":
+        return {
+            "storage": os.getenv("KB_STORAGE", "float32"),
+            "truncate_dim": int(os.getenv("KB_TRUNCATE_DIM", "0")) or None,
+            "rescore": int(os.getenv("KB_RESCORE", "0")),
+        }
+    if kind == "hnsw":
+        return {
+            "m": int(os.getenv("KB_HNSW_M", "32")),
+            "ef_construction": int(os.getenv("KB_HNSW_EF_CONSTRUCTION", "200")),
+            "ef_search": int(os.getenv("KB_HNSW_EF_SEARCH", "64")),
+        }
+    if kind == "ivf":
+        return {
+            "nlist": int(os.getenv("KB_IVF_NLIST", "0")),
+            "nprobe": int(os.getenv("KB_IVF_NPROBE", "8")),
+        }
+    return {}